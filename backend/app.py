@@ -1,45 +1,152 @@
 import os
 import logging
 import shutil
-from flask import Flask, request, jsonify, send_file
+import time
+import queue
+import threading
+import tempfile
+from datetime import datetime
+from flask import Flask, Request, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
 # Import Config
-from config import UPLOAD_FOLDER, CLIP_FOLDER, ALLOWED_EXTENSIONS
+from config import (
+    UPLOAD_FOLDER, CLIP_FOLDER, ALLOWED_EXTENSIONS, MAX_UPLOAD_BYTES, QUERY_BATCH_MAX, QUERY_MODE,
+    PROJECTS_PAGE_SIZE, PROJECTS_PAGE_MAX, QUERY_TOP_K, QUERY_TOP_K_MAX, QUERY_CANDIDATES_PER_RESULT,
+    MERGE_GAP_SECS, MMR_DIVERSITY, QUERY_MODES, CLIP_MODES, LIGHT_WORKER, SERVICE_WARMUP,
+    REEMBED_ON_START, EVENTS_HEARTBEAT_SECS
+)
 
 # Load env variables
 load_dotenv()
 
 # Import Services
 from services.video_processor import VideoProcessor
-from services.ai_engine import AIEngine
 from services.storage import StorageService
+from services.lazy import LazyService
+from services.thumbnails import ThumbnailStore
+from services.ingest import IngestPipeline
+from services.jobs import JobQueue
+from services.uploads import UploadManager, OffsetMismatch, UploadTooLarge
+from services.media_index import media_index_path
+from services.hls import hls_dir, parse_playlist, window_playlist, PLAYLIST_NAME, HLS_FILE_RE
+from services.timecode import parse_time, format_time
+from services.ranking import rerank
+from services.events import EventBus, sse_message
+from services.metrics import registry, QUERY_STAGE_SECONDS, HTTP_REQUEST_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logging.getLogger('httpx').setLevel(logging.WARNING) # Suppress noisy HTTP logs
 logger = logging.getLogger(__name__)
 
+class SpooledUploadRequest(Request):
+    """Spools multipart file parts straight into UPLOAD_FOLDER so /upload can move them instead of copying."""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.NamedTemporaryFile('wb+', dir=UPLOAD_FOLDER, suffix='.part', delete=False)
+
 app = Flask(__name__)
-CORS(app)
+app.request_class = SpooledUploadRequest
+CORS(app, expose_headers=['Upload-Offset', 'Upload-Length', 'X-Total-Count'])
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['CLIP_FOLDER'] = CLIP_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 # Initialize Services
+# Cheap services are built now. Storage, the AI engine (Gemini client, embedding model) and the
+# ingest queue are built on first use, so light workers (WORKER_MODE=light) never load the model.
 video_processor = VideoProcessor()
-try:
-    storage_service = StorageService()
-except Exception as e:
-    logger.error(f"Failed to initialize storage service: {e}")
-    storage_service = None
-try:
-    ai_engine = AIEngine()
-except Exception as e:
-    logger.error(f"Failed to initialize AI engine: {e}")
-    ai_engine = None
+thumbnail_store = ThumbnailStore()
+upload_manager = UploadManager(video_processor, MAX_UPLOAD_BYTES)
+event_bus = EventBus()
+
+def build_ai_engine():
+    from services.ai_engine import AIEngine
+    return AIEngine()
+
+def build_job_queue():
+    ai_engine = lazy_ai_engine.get()
+    storage_service = lazy_storage.get()
+    if not (ai_engine and storage_service):
+        return None
+    job_queue = JobQueue(IngestPipeline(video_processor, ai_engine, storage_service, thumbnail_store).run, events=event_bus)
+    # Resume persisted jobs from the serving process only (not the reloader parent).
+    job_queue.start()
+    return job_queue
+
+def build_reembed_migration():
+    from services.reembed import ReembedMigration
+    ai_engine = lazy_ai_engine.get()
+    storage_service = lazy_storage.get()
+    return ReembedMigration(storage_service, ai_engine) if ai_engine and storage_service else None
+
+lazy_storage = LazyService('storage service', StorageService)
+lazy_ai_engine = LazyService('AI engine', build_ai_engine, enabled=not LIGHT_WORKER)
+lazy_job_queue = LazyService('ingest job queue', build_job_queue, enabled=not LIGHT_WORKER)
+lazy_reembed = LazyService('re-embedding migration', build_reembed_migration, enabled=not LIGHT_WORKER)
+
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+def warm_up_services():
+    storage_service = lazy_storage.get()
+    if storage_service:
+        storage_service.client
+    lazy_job_queue.get()
+    # Bring indexes built by an older embedding model up to date; queries keep working meanwhile.
+    migration = lazy_reembed.get() if REEMBED_ON_START else None
+    if migration:
+        try:
+            migration.run()
+        except Exception as e:
+            logger.error(f"Re-embedding migration failed: {e}")
+
+@app.before_request
+def start_warmup():
+    # On the first request, load the heavy services in the background instead of on this request's path.
+    global _warmup_started
+    if not SERVICE_WARMUP or _warmup_started:
+        return
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=warm_up_services, name='warmup', daemon=True).start()
+
+# Scrape-time metrics: read from the services' own counters, no hot-path cost.
+def _cache_stats():
+    caches = {'clip': video_processor.clip_cache.stats()}
+    if lazy_ai_engine.loaded:
+        caches['query'] = lazy_ai_engine.get().query_cache.stats()
+    return caches
+
+registry.callback('counter', 'cache_hits_total', 'Cache hits by cache.',
+                  lambda: {name: stats['hits'] for name, stats in _cache_stats().items()}, ['cache'])
+registry.callback('counter', 'cache_misses_total', 'Cache misses by cache.',
+                  lambda: {name: stats['misses'] for name, stats in _cache_stats().items()}, ['cache'])
+registry.callback('gauge', 'clip_cache_bytes', 'Bytes of clips on disk.',
+                  lambda: video_processor.clip_cache.stats()['size_bytes'])
+registry.callback('gauge', 'ingest_jobs', 'Ingest jobs by status (queue depth).',
+                  lambda: lazy_job_queue.get().counts() if lazy_job_queue.loaded else None, ['status'])
+registry.callback('gauge', 'event_subscribers', 'Open /projects/<id>/events streams.',
+                  lambda: event_bus.stats()['subscribers'])
+
+if registry.enabled:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.labels(request.endpoint or 'unknown', response.status_code).observe(
+                time.perf_counter() - started
+            )
+        return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -49,6 +156,22 @@ def get_project_upload_dir(project_id):
     os.makedirs(project_dir, exist_ok=True)
     return project_dir
 
+def find_project_video(project):
+    """Absolute path of the project's source video on disk, or None."""
+    video_filename = project.get('video_filename')
+    if not video_filename:
+        return None
+
+    candidate_paths = []
+    if os.path.isabs(video_filename):
+        candidate_paths.append(video_filename)
+    else:
+        base_name = os.path.basename(video_filename)
+        candidate_paths.append(os.path.join(app.config['UPLOAD_FOLDER'], project['id'], base_name))
+        candidate_paths.append(os.path.join(app.config['UPLOAD_FOLDER'], base_name))
+
+    return next((os.path.abspath(path) for path in candidate_paths if os.path.exists(path)), None)
+
 def remove_file_if_exists(path):
     try:
         if os.path.isfile(path):
@@ -75,6 +198,7 @@ def cleanup_project_media(project_id, project):
         abs_path = os.path.abspath(path)
         if remove_file_if_exists(abs_path):
             removed_video_paths.append(abs_path)
+        remove_file_if_exists(media_index_path(abs_path))
 
     # Ensure all project-local uploads/proxies are removed.
     project_dir = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], project_id))
@@ -102,25 +226,87 @@ def cleanup_project_media(project_id, project):
             legacy_clip = any(clip_name.endswith(f"_{base_name}") for base_name in safe_basenames)
 
             if scoped_clip or legacy_clip:
-                remove_file_if_exists(clip_path)
+                video_processor.clip_cache.remove(clip_name)
 
 @app.route('/projects', methods=['GET'])
 def list_projects():
+    storage_service = lazy_storage.get()
     if not storage_service:
         return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
-    return jsonify(storage_service.list_projects()), 200
+
+    limit = min(max(request.args.get('limit', PROJECTS_PAGE_SIZE, type=int), 1), PROJECTS_PAGE_MAX)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    status = request.args.get('status')
+
+    response = jsonify(storage_service.list_projects(limit=limit, offset=offset, status=status))
+    response.headers['X-Total-Count'] = str(storage_service.count_projects(status=status))
+    return response, 200
 
 @app.route('/projects/<project_id>', methods=['GET'])
 def get_project(project_id):
+    storage_service = lazy_storage.get()
     if not storage_service:
         return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
     project = storage_service.get_project(project_id)
     if not project:
         return jsonify({'error': 'Project not found'}), 404
+    video_path = find_project_video(project)
+    if video_path and os.path.exists(os.path.join(hls_dir(video_path), PLAYLIST_NAME)):
+        project['hls_url'] = f"/projects/{project_id}/hls.m3u8"
     return jsonify(project), 200
 
+@app.route('/projects/<project_id>/events', methods=['GET'])
+def project_events(project_id):
+    """
+    Server-Sent Events of the project's ingest: `stage` transitions, `progress` (bytes, seconds,
+    phases, thumbnails or windows done of total) and a final `job` event with status done/failed.
+    """
+    storage_service = lazy_storage.get()
+    if not storage_service:
+        return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+
+    # Subscribe before reading the status so a job finishing in between is not missed.
+    subscriber, snapshot = event_bus.subscribe(project_id)
+    if not storage_service.get_project(project_id):
+        event_bus.unsubscribe(project_id, subscriber)
+        return jsonify({'error': 'Project not found'}), 404
+
+    def finished():
+        # Also covers ingests running in another worker process, which this bus never sees.
+        status = (storage_service.get_project(project_id) or {}).get('status', 'failed')
+        if status in ('ready', 'failed'):
+            return {'event': 'job', 'data': {'status': 'done' if status == 'ready' else 'failed'}}
+        return None
+
+    def stream():
+        try:
+            final = finished()
+            if final:
+                yield sse_message(final)
+                return
+            for message in snapshot:
+                yield sse_message(message)
+            while True:
+                try:
+                    message = subscriber.get(timeout=EVENTS_HEARTBEAT_SECS)
+                except queue.Empty:
+                    final = finished()
+                    if final:
+                        yield sse_message(final)
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_message(message)
+                if message['event'] == 'job' and message['data']['status'] in ('done', 'failed'):
+                    return
+        finally:
+            event_bus.unsubscribe(project_id, subscriber)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/projects/<project_id>', methods=['DELETE'])
 def delete_project(project_id):
+    storage_service = lazy_storage.get()
     if not storage_service:
         return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
     project = storage_service.get_project(project_id)
@@ -133,71 +319,28 @@ def delete_project(project_id):
 
 @app.route('/process', methods=['POST'])
 def process_video():
-    if not ai_engine:
-        return jsonify({'error': 'Server misconfiguration: AI Engine not loaded'}), 500
-    if not storage_service:
-        return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+    storage_service = lazy_storage.get()
+    job_queue = lazy_job_queue.get()
+    if not job_queue:
+        return jsonify({'error': 'Server misconfiguration: Ingest queue not loaded'}), 500
 
     data = request.json
     if not data or 'url' not in data:
         return jsonify({'error': 'No URL provided'}), 400
 
-    url = data['url']
-    project_id = None
-    filename = None
-    proxy_path = None
-
-    try:
-        # 1. Create project + dedicated media directory
-        project_id = storage_service.create_project("Processing video")
-        project_dir = get_project_upload_dir(project_id)
-
-        # 2. Download full-res into project directory
-        filename = os.path.abspath(video_processor.download_video(url, output_dir=project_dir))
-        storage_service.update_project_media(
-            project_id,
-            name=os.path.basename(filename),
-            video_filename=filename
-        )
+    # Create project + dedicated media directory, then hand off to the worker pool
+    project_id = storage_service.create_project("Processing video")
+    get_project_upload_dir(project_id)
+    job_id = job_queue.submit(project_id, 'url', data['url'])
 
-        # 3. Create low-res proxy for AI
-        proxy_path = video_processor.get_ai_proxy(filename)
-
-        # 4. Analyze using proxy (much faster upload)
-        segments = ai_engine.analyze_video(proxy_path)
-        if not segments:
-            storage_service.update_project_status(project_id, "failed")
-            return jsonify({'error': 'AI analysis yielded no segments'}), 500
-
-        # 5. Extract thumbnails for each segment
-        for seg in segments:
-            # Extract at the start of the segment
-            seg.thumbnail = video_processor.extract_thumbnail(filename, seg.start_time)
-
-        # 6. Batch generate embeddings
-        descriptions = [seg.description for seg in segments]
-        embeddings = ai_engine.get_embeddings(descriptions)
-
-        # 7. Index using the project ID
-        storage_service.add_segments(project_id, segments, embeddings)
-
-        return jsonify({'message': 'Video processed and indexed successfully', 'project_id': project_id, 'filename': filename}), 200
-
-    except Exception as e:
-        logger.error(f"Process failed: {e}")
-        if project_id:
-            storage_service.update_project_status(project_id, "failed")
-        return jsonify({'error': str(e)}), 500
-    finally:
-        if proxy_path and filename and proxy_path != filename and os.path.exists(proxy_path):
-            os.remove(proxy_path)
+    return jsonify({'message': 'Video queued for processing', 'project_id': project_id, 'job_id': job_id}), 202
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
-    if not ai_engine:
-        return jsonify({'error': 'Server misconfiguration: AI Engine not loaded'}), 500
-    if not storage_service:
-        return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+    storage_service = lazy_storage.get()
+    job_queue = lazy_job_queue.get()
+    if not job_queue:
+        return jsonify({'error': 'Server misconfiguration: Ingest queue not loaded'}), 500
 
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -208,8 +351,6 @@ def upload_video():
 
     if file and allowed_file(file.filename):
         project_id = None
-        file_path = None
-        proxy_path = None
 
         try:
             filename = secure_filename(file.filename)
@@ -218,40 +359,135 @@ def upload_video():
             project_id = storage_service.create_project(filename)
             project_dir = get_project_upload_dir(project_id)
 
+            # The part is already on disk in UPLOAD_FOLDER; move it rather than writing it again.
             file_path = os.path.abspath(os.path.join(project_dir, filename))
-            file.save(file_path)
+            file.stream.flush()
+            os.replace(file.stream.name, file_path)
             storage_service.update_project_media(project_id, name=filename, video_filename=file_path)
 
-            # Create proxy for uploaded file
-            proxy_path = video_processor.get_ai_proxy(file_path)
-
-            segments = ai_engine.analyze_video(proxy_path)
-            if not segments:
-                storage_service.update_project_status(project_id, "failed")
-                return jsonify({'error': 'AI analysis yielded no segments'}), 500
-
-            # Extract Thumbnails
-            for seg in segments:
-                seg.thumbnail = video_processor.extract_thumbnail(file_path, seg.start_time)
-
-            descriptions = [seg.description for seg in segments]
-            embeddings = ai_engine.get_embeddings(descriptions)
-
-            storage_service.add_segments(project_id, segments, embeddings)
-            return jsonify({'message': 'Video uploaded and processed successfully', 'project_id': project_id, 'filename': file_path}), 200
+            job_id = job_queue.submit(project_id, 'upload', file_path)
+            return jsonify({'message': 'Video uploaded and queued for processing', 'project_id': project_id, 'job_id': job_id}), 202
         except Exception as e:
-            logger.error(f"Upload process failed: {e}")
+            logger.error(f"Upload failed: {e}")
             if project_id:
                 storage_service.update_project_status(project_id, "failed")
             return jsonify({'error': str(e)}), 500
         finally:
-            if proxy_path and file_path and proxy_path != file_path and os.path.exists(proxy_path):
-                os.remove(proxy_path)
+            discard_spooled_files()
 
+    discard_spooled_files()
     return jsonify({'error': 'File type not allowed'}), 400
 
+def discard_spooled_files():
+    for spooled in request.files.values():
+        remove_file_if_exists(spooled.stream.name)
+
+def get_upload_session(upload_id):
+    storage_service = lazy_storage.get()
+    if not storage_service or not storage_service.get_project(upload_id):
+        return None
+    return upload_manager.get(upload_id, os.path.join(app.config['UPLOAD_FOLDER'], upload_id))
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    storage_service = lazy_storage.get()
+    job_queue = lazy_job_queue.get()
+    if not job_queue:
+        return jsonify({'error': 'Server misconfiguration: Ingest queue not loaded'}), 500
+
+    data = request.json or {}
+    filename = secure_filename(data.get('filename') or '')
+    size = data.get('size')
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'File type not allowed'}), 400
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'size (in bytes) is required'}), 400
+    if size > MAX_UPLOAD_BYTES:
+        return jsonify({'error': f'Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB limit'}), 413
+
+    # The upload id is the project id; bytes land directly in the project directory.
+    project_id = storage_service.create_project(filename, status="uploading")
+    file_path = os.path.abspath(os.path.join(get_project_upload_dir(project_id), filename))
+    storage_service.update_project_media(project_id, video_filename=file_path)
+    upload_manager.create(project_id, file_path, size)
+
+    return jsonify({'upload_id': project_id, 'project_id': project_id, 'offset': 0}), 201
+
+@app.route('/uploads/<upload_id>', methods=['HEAD'])
+def upload_status(upload_id):
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+    response = app.response_class(status=200)
+    response.headers['Upload-Offset'] = str(session.offset)
+    response.headers['Upload-Length'] = str(session.size)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.route('/uploads/<upload_id>', methods=['PATCH'])
+def upload_chunk(upload_id):
+    ai_engine = lazy_ai_engine.get()
+    storage_service = lazy_storage.get()
+    job_queue = lazy_job_queue.get()
+    if not ai_engine:
+        return jsonify({'error': 'Server misconfiguration: AI Engine not loaded'}), 500
+    if not job_queue:
+        return jsonify({'error': 'Server misconfiguration: Ingest queue not loaded'}), 500
+    session = get_upload_session(upload_id)
+    if not session:
+        return jsonify({'error': 'Upload not found'}), 404
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+
+    try:
+        complete = upload_manager.append(session, offset, request.stream, request.content_length)
+    except OffsetMismatch as e:
+        return jsonify({'error': str(e), 'offset': session.offset}), 409
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e), 'offset': session.offset}), 413
+
+    if not complete:
+        response = app.response_class(status=204)
+        response.headers['Upload-Offset'] = str(session.offset)
+        return response
+
+    sha256 = upload_manager.finish(session)
+    storage_service.update_project_source(upload_id, ai_engine.analysis_key(f"sha256:{sha256}"))
+    storage_service.update_project_status(upload_id, "processing", expected="uploading")
+    job_id = job_queue.submit(upload_id, 'upload', session.path)
+
+    response = jsonify({'message': 'Video uploaded and queued for processing', 'project_id': upload_id, 'job_id': job_id, 'sha256': sha256})
+    response.headers['Upload-Offset'] = str(session.offset)
+    return response, 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job_queue = lazy_job_queue.get()
+    if not job_queue:
+        return jsonify({'error': 'Server misconfiguration: Ingest queue not loaded'}), 500
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job), 200
+
+def parse_rerank_params(data):
+    """Reads top_k, min_score and diversity (MMR relevance weight) from a query request."""
+    top_k = int(data.get('top_k', QUERY_TOP_K))
+    if not 1 <= top_k <= QUERY_TOP_K_MAX:
+        raise ValueError(f"top_k must be between 1 and {QUERY_TOP_K_MAX}")
+    min_score = float(data['min_score']) if data.get('min_score') is not None else None
+    diversity = float(data.get('diversity', MMR_DIVERSITY))
+    if not 0 <= diversity <= 1:
+        raise ValueError("diversity must be between 0 and 1")
+    return top_k, min_score, diversity
+
 @app.route('/query', methods=['POST'])
 def query_video():
+    ai_engine = lazy_ai_engine.get()
+    storage_service = lazy_storage.get()
     if not ai_engine:
          return jsonify({'error': 'Server misconfiguration: AI Engine not loaded'}), 500
     if not storage_service:
@@ -260,6 +496,45 @@ def query_video():
     data = request.json or {}
     if 'query' not in data:
         return jsonify({'error': 'No query provided'}), 400
+    try:
+        top_k, min_score, diversity = parse_rerank_params(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    n_candidates = top_k * QUERY_CANDIDATES_PER_RESULT
+
+    # scope="library" searches every project, optionally narrowed by project_ids / created_after / created_before.
+    if data.get('scope') == 'library':
+        try:
+            created_after = datetime.fromisoformat(data['created_after']) if data.get('created_after') else None
+            created_before = datetime.fromisoformat(data['created_before']) if data.get('created_before') else None
+        except ValueError:
+            return jsonify({'error': 'created_after/created_before must be ISO 8601 dates'}), 400
+        project_ids = data.get('project_ids')
+        if project_ids is not None and not (
+            isinstance(project_ids, list) and all(isinstance(project_id, str) for project_id in project_ids)
+        ):
+            return jsonify({'error': 'project_ids must be a list of project ids'}), 400
+
+        try:
+            with QUERY_STAGE_SECONDS.labels('library', 'lookup').time():
+                model_id = storage_service.library_model()
+            with QUERY_STAGE_SECONDS.labels('library', 'embed').time():
+                query_embedding = ai_engine.get_embedding(data['query'], model_id)
+            with QUERY_STAGE_SECONDS.labels('library', 'search').time():
+                results = storage_service.query_library(
+                    query_embedding,
+                    n_results=n_candidates,
+                    project_ids=project_ids,
+                    created_after=created_after,
+                    created_before=created_before,
+                    with_embeddings=True
+                )
+            with QUERY_STAGE_SECONDS.labels('library', 'rerank').time():
+                results = rerank(results, top_k, min_score=min_score, merge_gap=MERGE_GAP_SECS, diversity=diversity)
+            return jsonify(results), 200
+        except Exception as e:
+            logger.error(f"Library query failed: {e}")
+            return jsonify({'error': str(e)}), 500
 
     project_id = data.get('project_id')
     if not project_id:
@@ -268,49 +543,141 @@ def query_video():
     if not storage_service.get_project(project_id):
         return jsonify({'error': 'Project not found'}), 404
 
+    mode = data.get('mode', QUERY_MODE)
+    if mode not in QUERY_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(QUERY_MODES)}"}), 400
+
     try:
         query_text = data['query']
-        query_embedding = ai_engine.get_embedding(query_text)
-        results = storage_service.query(project_id, query_embedding, n_results=5)
+        with QUERY_STAGE_SECONDS.labels('query', 'lookup').time():
+            model_id = storage_service.project_model(project_id)
+        with QUERY_STAGE_SECONDS.labels('query', 'embed').time():
+            query_embedding = ai_engine.get_embedding(query_text, model_id)
+        with QUERY_STAGE_SECONDS.labels('query', 'search').time():
+            results = storage_service.query(
+                project_id, query_embedding, n_results=n_candidates,
+                query_text=query_text, mode=mode, weights=data.get('weights'), with_embeddings=True
+            )
+        with QUERY_STAGE_SECONDS.labels('query', 'rerank').time():
+            results = rerank(results, top_k, min_score=min_score, merge_gap=MERGE_GAP_SECS, diversity=diversity)
         return jsonify(results), 200
     except Exception as e:
         logger.error(f"Query failed: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/query/batch', methods=['POST'])
+def query_video_batch():
+    ai_engine = lazy_ai_engine.get()
+    storage_service = lazy_storage.get()
+    if not ai_engine:
+         return jsonify({'error': 'Server misconfiguration: AI Engine not loaded'}), 500
+    if not storage_service:
+         return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+
+    data = request.json or {}
+    queries = data.get('queries')
+    if not queries or not isinstance(queries, list):
+        return jsonify({'error': 'No queries provided'}), 400
+    if len(queries) > QUERY_BATCH_MAX:
+        return jsonify({'error': f'At most {QUERY_BATCH_MAX} queries per batch'}), 400
+
+    try:
+        top_k, min_score, diversity = parse_rerank_params(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    n_candidates = top_k * QUERY_CANDIDATES_PER_RESULT
+
+    mode = data.get('mode', QUERY_MODE)
+    if mode not in QUERY_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(QUERY_MODES)}"}), 400
+
+    project_id = data.get('project_id')
+    if not project_id:
+        return jsonify({'error': 'project_id is required'}), 400
+
+    if not storage_service.get_project(project_id):
+        return jsonify({'error': 'Project not found'}), 404
+
+    try:
+        # One encode call for all cache misses; each query then takes the same search + rerank path as /query
+        model_id = storage_service.project_model(project_id)
+        with QUERY_STAGE_SECONDS.labels('batch', 'embed').time():
+            query_embeddings = ai_engine.get_query_embeddings(queries, model_id)
+        answers = []
+        for query_text, query_embedding in zip(queries, query_embeddings):
+            with QUERY_STAGE_SECONDS.labels('batch', 'search').time():
+                results = storage_service.query(
+                    project_id, query_embedding, n_results=n_candidates,
+                    query_text=query_text, mode=mode, weights=data.get('weights'), with_embeddings=True
+                )
+            with QUERY_STAGE_SECONDS.labels('batch', 'rerank').time():
+                results = rerank(results, top_k, min_score=min_score, merge_gap=MERGE_GAP_SECS, diversity=diversity)
+            answers.append({'query': query_text, 'results': results})
+        return jsonify(answers), 200
+    except Exception as e:
+        logger.error(f"Batch query failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not registry.enabled:
+        return jsonify({'error': 'Metrics are disabled (set METRICS_ENABLED=true)'}), 404
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    # Reports without forcing a load: services not yet built show as not loaded.
+    services = (lazy_storage, lazy_ai_engine, lazy_job_queue)
+    stats = {'services': {service.name: service.loaded for service in services}}
+    if lazy_ai_engine.loaded:
+        stats['query_cache'] = lazy_ai_engine.get().query_cache.stats()
+    stats['events'] = event_bus.stats()
+    if lazy_reembed.loaded:
+        stats['reembed'] = lazy_reembed.get().stats()
+    stats['clip_cache'] = video_processor.clip_cache.stats()
+    return jsonify(stats), 200
+
 @app.route('/clip', methods=['POST'])
 def clip_video():
+    storage_service = lazy_storage.get()
     if not storage_service:
         return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
     data = request.json or {}
     required = ['project_id', 'start_time', 'end_time']
     if not all(k in data for k in required):
         return jsonify({'error': 'Missing parameters'}), 400
+    mode = data.get('mode', 'exact')
+    if mode not in CLIP_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(CLIP_MODES)}"}), 400
 
     try:
         project = storage_service.get_project(data['project_id'])
         if not project:
             return jsonify({'error': 'Project not found'}), 404
 
-        video_filename = project.get('video_filename')
-        if not video_filename:
+        if not project.get('video_filename'):
             return jsonify({'error': 'Project has no source video'}), 400
 
-        candidate_paths = []
-        if os.path.isabs(video_filename):
-            candidate_paths.append(video_filename)
-        else:
-            base_name = os.path.basename(video_filename)
-            candidate_paths.append(os.path.join(app.config['UPLOAD_FOLDER'], data['project_id'], base_name))
-            candidate_paths.append(os.path.join(app.config['UPLOAD_FOLDER'], base_name))
-
-        filename = next((os.path.abspath(path) for path in candidate_paths if os.path.exists(path)), None)
+        filename = find_project_video(project)
         if not filename:
             return jsonify({'error': 'Video file not found'}), 404
 
+        try:
+            start_secs, end_secs = parse_time(data['start_time']), parse_time(data['end_time'])
+        except ValueError:
+            return jsonify({'error': 'Invalid start_time or end_time'}), 400
+        if end_secs <= start_secs:
+            return jsonify({'error': 'end_time must be after start_time'}), 400
+        # Checked against the stored media index, so a bad range never starts ffmpeg.
+        duration = video_processor.media_index(filename).duration
+        if duration and end_secs > duration:
+            return jsonify({'error': f"end_time is past the end of the video ({format_time(duration)})"}), 400
+
         output_filename = video_processor.create_clip(
             filename,
             data['start_time'],
-            data['end_time']
+            data['end_time'],
+            mode=mode
         )
         return jsonify({'clip_url': f'/clips/{output_filename}'}), 200
     except Exception as e:
@@ -324,5 +691,61 @@ def serve_clip(filename):
         return jsonify({'error': 'Clip not found'}), 404
     return send_file(path, mimetype='video/mp4', conditional=True)
 
+@app.route('/projects/<project_id>/hls.m3u8')
+def project_playlist(project_id):
+    """HLS playlist of the project video, limited to the segments covering [start, end] if given."""
+    storage_service = lazy_storage.get()
+    if not storage_service:
+        return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+    project = storage_service.get_project(project_id)
+    if not project:
+        return jsonify({'error': 'Project not found'}), 404
+    video_path = find_project_video(project)
+    playlist_path = os.path.join(hls_dir(video_path), PLAYLIST_NAME) if video_path else None
+    if not playlist_path or not os.path.exists(playlist_path):
+        return jsonify({'error': 'Video is not packaged for streaming'}), 404
+
+    try:
+        start_secs = parse_time(request.args.get('start', 0))
+        end_secs = parse_time(request.args['end']) if 'end' in request.args else float('inf')
+    except ValueError:
+        return jsonify({'error': 'Invalid start or end'}), 400
+
+    with open(playlist_path, 'r') as f:
+        playlist = window_playlist(parse_playlist(f.read()), start_secs, end_secs, uri_prefix='hls/')
+    if not playlist:
+        return jsonify({'error': 'Range is outside the video'}), 400
+    return app.response_class(playlist, mimetype='application/vnd.apple.mpegurl')
+
+@app.route('/projects/<project_id>/hls/<name>')
+def serve_hls_segment(project_id, name):
+    storage_service = lazy_storage.get()
+    if not storage_service:
+        return jsonify({'error': 'Server misconfiguration: Storage service not loaded'}), 500
+    project = storage_service.get_project(project_id)
+    video_path = find_project_video(project) if project else None
+    if not video_path or not HLS_FILE_RE.match(name):
+        return jsonify({'error': 'Segment not found'}), 404
+    path = os.path.join(hls_dir(video_path), name)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Segment not found'}), 404
+    # Segments of a project never change, so shared caches can keep them indefinitely.
+    response = send_file(path, mimetype='video/mp4' if name.endswith('.mp4') else 'video/iso.segment',
+                         conditional=True, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/thumbnails/<digest>')
+def serve_thumbnail(digest):
+    path = thumbnail_store.path(digest)
+    if not path:
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    # Content-addressed: the hash is a strong ETag and the bytes never change.
+    response = send_file(path, mimetype='image/jpeg', conditional=True, etag=digest, max_age=31536000)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
@@ -0,0 +1,107 @@
+"""
+Compares embedding backends on load time, query latency, batch throughput and
+recall@10 against a reference backend (the current PyTorch model by default).
+
+    cd backend && python -m benchmarks.embeddings --backends torch onnx onnx-int8
+
+Pass --corpus with a text file (one segment description per line) to benchmark on
+real data; otherwise a synthetic corpus of segment-like descriptions is used.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import numpy as np
+from services.embeddings import load_embedding_backend, EMBEDDING_BACKENDS
+
+SUBJECTS = ["a man", "a woman", "two children", "the presenter", "a dog", "a mechanic", "the chef", "a crowd"]
+ACTIONS = ["walks into", "points at", "repairs", "cooks in", "talks about", "runs across", "holds up", "opens"]
+OBJECTS = ["the kitchen", "a red car", "the XJ-9000 drill", "a whiteboard", "the stage", "a laptop", "the garden", "a map"]
+DETAILS = ["in slow motion", "while the camera pans left", "with on-screen text", "at night", "in a close-up", ""]
+
+def synthetic_corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        " ".join(filter(None, [rng.choice(SUBJECTS), rng.choice(ACTIONS), rng.choice(OBJECTS), rng.choice(DETAILS)]))
+        for _ in range(n)
+    ]
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 2)
+
+def top_k(corpus_vectors, query_vectors, k):
+    scores = query_vectors @ corpus_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+def benchmark(name, corpus, queries, latency_runs):
+    started = time.perf_counter()
+    backend = load_embedding_backend(name)
+    load_secs = time.perf_counter() - started
+
+    backend.encode(queries[:4])  # warm-up
+    latencies = []
+    for i in range(latency_runs):
+        started = time.perf_counter()
+        backend.encode([queries[i % len(queries)]])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    corpus_vectors = np.asarray(backend.encode(corpus, batch_size=32), dtype=np.float32)
+    throughput = len(corpus) / (time.perf_counter() - started)
+    query_vectors = np.asarray(backend.encode(queries), dtype=np.float32)
+
+    return {
+        "backend": name,
+        "load_secs": round(load_secs, 2),
+        "query_p50_ms": percentile_ms(latencies, 50),
+        "query_p95_ms": percentile_ms(latencies, 95),
+        "throughput_texts_per_sec": round(throughput, 1),
+    }, corpus_vectors, query_vectors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(EMBEDDING_BACKENDS), choices=EMBEDDING_BACKENDS)
+    parser.add_argument('--reference', default='torch', choices=EMBEDDING_BACKENDS)
+    parser.add_argument('--corpus', help="text file, one document per line")
+    parser.add_argument('--texts', type=int, default=2000, help="synthetic corpus size")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--latency-runs', type=int, default=200)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus) as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = synthetic_corpus(args.texts)
+    queries = synthetic_corpus(args.queries, seed=1)
+
+    names = [args.reference] + [name for name in args.backends if name != args.reference]
+    results, reference = [], None
+    for name in names:
+        result, corpus_vectors, query_vectors = benchmark(name, corpus, queries, args.latency_runs)
+        if reference is None:
+            reference = (corpus_vectors, top_k(corpus_vectors, query_vectors, 10))
+        # Recall@10 of this backend's neighbours against the reference's, and how closely
+        # its vectors match the reference's (1.0 = interchangeable with existing indexes).
+        ref_vectors, ref_top = reference
+        own_top = top_k(corpus_vectors, query_vectors, 10)
+        result["recall_at_10"] = round(float(np.mean([
+            len(set(own) & set(ref)) / 10 for own, ref in zip(own_top, ref_top)
+        ])), 3)
+        result["cosine_vs_reference"] = round(float(np.mean(np.sum(corpus_vectors * ref_vectors, axis=1) / (
+            np.linalg.norm(corpus_vectors, axis=1) * np.linalg.norm(ref_vectors, axis=1)
+        ))), 4)
+        results.append(result)
+
+    columns = list(results[0])
+    print(" | ".join(columns))
+    for result in results:
+        print(" | ".join(str(result[column]) for column in columns))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"corpus_size": len(corpus), "results": results}, f, indent=2)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+Load test of the query and clip API: seeds projects with synthetic segments straight through
+StorageService.add_segments, then sweeps concurrency levels against /query, /clip and
+/clips/<filename>, reporting p50/p95/p99 latency, throughput and error rate at each level and
+where contention sets in.
+
+    cd backend && python -m benchmarks.load                     # in-process server, stand-in engine
+    cd backend && python -m benchmarks.load --url http://127.0.0.1:5001 --embedding-backend torch
+
+Without --url a threaded server runs in a throwaway directory with the stand-in AI engine of
+benchmarks.offline (--embedding-backend loads a real model instead). With --url, projects are
+seeded into the server's own DB_PATH and UPLOAD_FOLDER (the API has no way to add segments
+without an ingest): run on the server host with its environment, while it is not ingesting, as
+this process writes to its ChromaDB too; the seeded projects and their uploads are deleted when
+the run ends. Set METRICS_ENABLED=true on the server for the per-stage breakdown. Each
+client is a thread; for 1000+ clients run several generators so the client is not the limit.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import itertools
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from benchmarks.offline import latency_summary, make_video, seed_project, use_workdir, StubAIEngine
+
+ENDPOINTS = ('query', 'clip', 'clips')
+
+# Server time per request by part, from /metrics: (sample name prefix, resource it points at).
+STAGES = {
+    'query': {
+        'lookup': ('query_stage_seconds_sum{endpoint="query",stage="lookup"}', "project metadata (SQLite project store)"),
+        'embed': ('query_stage_seconds_sum{endpoint="query",stage="embed"}', "the embedding model"),
+        'search': ('query_stage_seconds_sum{endpoint="query",stage="search"}', "vector/lexical search (ChromaDB)"),
+        'rerank': ('query_stage_seconds_sum{endpoint="query",stage="rerank"}', "re-ranking (CPU)"),
+        'server': ('http_request_seconds_sum{endpoint="query_video",', None),
+    },
+    'clip': {
+        'encode': ('clip_encode_seconds_sum{', "ffmpeg processes (clip encodes on cache misses)"),
+        'server': ('http_request_seconds_sum{endpoint="clip_video",', None),
+    },
+    'clips': {
+        'server': ('http_request_seconds_sum{endpoint="serve_clip",', None),
+    },
+}
+QUEUEING = "waiting for a server worker (request queueing / accept backlog)"
+
+class Client:
+    """One keep-alive HTTP connection per thread."""
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def request(self, method, path, payload=None):
+        """Returns (status, body); raises OSError when the server cannot be reached."""
+        body = json.dumps(payload) if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in (0, 1):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body, headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                # Dropped keep-alive connection: reconnect once.
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+def scrape(client):
+    """Current /metrics samples as {name{labels}: value}, or None when metrics are disabled."""
+    status, body = client.request('GET', '/metrics')
+    if status != 200:
+        return None
+    samples = {}
+    for line in body.decode('utf-8').splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            samples[name] = float(value)
+    return samples
+
+def _delta(before, after, prefix):
+    return sum(value - before.get(name, 0.0) for name, value in after.items() if name.startswith(prefix))
+
+def make_requests(endpoint, projects, clip_urls, rng, args):
+    """A generator of (method, path, payload) for one client."""
+    from benchmarks.embeddings import synthetic_corpus
+
+    queries = synthetic_corpus(1000, seed=rng.randrange(1 << 30))
+    for i in itertools.count():
+        project_id = rng.choice(projects)
+        if endpoint == 'query':
+            query = queries[i % len(queries)]
+            # Unique by default, so every request pays for an embedding instead of hitting the query cache.
+            yield 'POST', '/query', {
+                'project_id': project_id, 'query': query if args.cached_queries else f"{query} {rng.random():.6f}"
+            }
+        elif endpoint == 'clip':
+            start = rng.randrange(0, args.video_secs - args.clip_secs)
+            yield 'POST', '/clip', {
+                'project_id': project_id, 'start_time': str(start), 'end_time': str(start + args.clip_secs),
+                'mode': args.clip_mode
+            }
+        else:
+            yield 'GET', rng.choice(clip_urls), None
+
+def run_level(client, endpoint, concurrency, projects, clip_urls, args):
+    deadline = time.monotonic() + args.duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        own_latencies, own_errors = [], 0
+        for method, path, payload in make_requests(endpoint, projects, clip_urls, rng, args):
+            if time.monotonic() >= deadline:
+                break
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, payload)
+                failed = status >= 400
+            except (OSError, http.client.HTTPException):
+                failed = True
+            own_latencies.append(time.perf_counter() - started)
+            own_errors += failed
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    before = scrape(client)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = scrape(client)
+
+    requests, failed = len(latencies), sum(errors)
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "error_rate": round(failed / requests, 4) if requests else 1.0,
+        "throughput_per_sec": round((requests - failed) / elapsed, 1),
+        **(latency_summary(latencies, 'latency') if latencies else {}),
+    }
+    if before is not None and after is not None and requests:
+        # Mean server seconds per request by stage; client latency beyond the server's is queueing.
+        stages = {stage: _delta(before, after, prefix) / requests for stage, (prefix, _) in STAGES[endpoint].items()}
+        stages['queue'] = max(float(np.mean(latencies)) - stages['server'], 0.0)
+        result["stage_ms"] = {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()}
+    return result
+
+def find_bottlenecks(runs, error_threshold=0.01, min_scaling=0.25):
+    """
+    Flags, per endpoint, the first level where errors appear and where throughput stops scaling
+    (grows by less than `min_scaling` of the concurrency increase), naming the stage whose
+    per-request time grew the most between the two levels.
+    """
+    findings = []
+    for endpoint in ENDPOINTS:
+        levels = sorted((run for run in runs if run['endpoint'] == endpoint), key=lambda run: run['concurrency'])
+        for run in levels:
+            if run['error_rate'] > error_threshold:
+                findings.append(f"/{endpoint}: {run['error_rate']:.1%} errors at {run['concurrency']} clients")
+                break
+        for previous, run in zip(levels, levels[1:]):
+            if not previous['throughput_per_sec']:
+                continue
+            gain = run['throughput_per_sec'] / previous['throughput_per_sec']
+            wanted = 1 + min_scaling * (run['concurrency'] / previous['concurrency'] - 1)
+            if gain >= wanted:
+                continue
+            finding = (f"/{endpoint}: saturated between {previous['concurrency']} and {run['concurrency']} clients "
+                       f"(throughput x{gain:.2f}, p95 {previous.get('latency_p95_ms')} -> {run.get('latency_p95_ms')} ms)")
+            if 'stage_ms' in run and 'stage_ms' in previous:
+                growth = {
+                    stage: run['stage_ms'][stage] - previous['stage_ms'].get(stage, 0.0)
+                    for stage in run['stage_ms'] if stage != 'server'
+                }
+                stage = max(growth, key=growth.get)
+                resource = QUEUEING if stage == 'queue' else STAGES[endpoint][stage][1]
+                finding += f"; most added time in {stage} (+{growth[stage]:.1f} ms/request): {resource}"
+            findings.append(finding)
+            break
+    return findings
+
+def start_local_server(args):
+    """Serves the app from this process in a throwaway directory; returns (url, storage, ai_engine, workdir, shutdown)."""
+    workdir = use_workdir(args.workdir, METRICS_ENABLED='true')
+    import app as app_module
+    from werkzeug.serving import make_server
+    from services.lazy import LazyService
+    from services.embeddings import load_embedding_backend
+
+    embedding_backend = load_embedding_backend(args.embedding_backend) if args.embedding_backend else None
+    ai_engine = StubAIEngine(app_module.video_processor, embedding_backend)
+    app_module.lazy_ai_engine = LazyService('AI engine', lambda: ai_engine)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    server.socket.listen(args.backlog) # the default backlog refuses connections well below 1000 clients
+    threading.Thread(target=server.serve_forever, name='load-test-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", app_module.lazy_storage.get(), ai_engine, workdir, server.shutdown
+
+def seed(storage, ai_engine, args, workdir, projects):
+    """Seeds the projects, each with its own link to one synthetic video, appending their ids to `projects`."""
+    from config import UPLOAD_FOLDER
+    from services.ingest import link_or_copy
+
+    video = make_video(os.path.join(workdir, f"load_{args.video_secs}s.mp4"), args.video_secs)
+    for i in range(args.projects):
+        project_id = seed_project(storage, ai_engine, f"load-test-{i}", args.segments)
+        projects.append(project_id)
+        project_dir = os.path.join(UPLOAD_FOLDER, project_id)
+        os.makedirs(project_dir, exist_ok=True)
+        storage.update_project_media(
+            project_id, video_filename=os.path.abspath(link_or_copy(video, os.path.join(project_dir, 'video.mp4')))
+        )
+
+def unseed(storage, projects):
+    """Deletes seeded projects (rows, collections, lexical index) and their upload directories."""
+    from config import UPLOAD_FOLDER
+
+    for project_id in projects:
+        storage.delete_project(project_id)
+        shutil.rmtree(os.path.join(UPLOAD_FOLDER, project_id), ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="a running server; default: start one in this process")
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[10, 100, 1000])
+    parser.add_argument('--duration', type=float, default=15, help="seconds per endpoint and level")
+    parser.add_argument('--projects', type=int, default=20)
+    parser.add_argument('--segments', type=int, default=500, help="segments per project")
+    parser.add_argument('--video-secs', type=int, default=120, help="length of the synthetic source video")
+    parser.add_argument('--clip-secs', type=int, default=10)
+    parser.add_argument('--clip-mode', default='exact')
+    parser.add_argument('--cached-queries', action='store_true', help="let repeated queries hit the query cache")
+    parser.add_argument('--embedding-backend', help="model for seeding (and the local server); must match --url's")
+    parser.add_argument('--timeout', type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument('--backlog', type=int, default=2048, help="listen backlog of the local server")
+    parser.add_argument('--workdir', help="local server: keep its data here instead of a temporary directory")
+    parser.add_argument('--output', help="write results as JSON to this path")
+    args = parser.parse_args(argv)
+    if args.url and not args.embedding_backend:
+        parser.error("--url needs --embedding-backend, so seeded segments match the server's model")
+
+    if args.url:
+        import tempfile
+        from services.storage import StorageService
+        from services.video_processor import VideoProcessor
+        from services.embeddings import load_embedding_backend
+        url, workdir, shutdown = args.url.rstrip('/'), tempfile.mkdtemp(prefix='video-query-load-'), None
+        storage = StorageService()
+        ai_engine = StubAIEngine(VideoProcessor(), load_embedding_backend(args.embedding_backend))
+    else:
+        url, storage, ai_engine, workdir, shutdown = start_local_server(args)
+
+    projects = []
+    try:
+        print(f"Seeding {args.projects} projects x {args.segments} segments...")
+        seed(storage, ai_engine, args, workdir, projects)
+        client = Client(url, args.timeout)
+        if scrape(client) is None:
+            print("Server metrics are disabled (METRICS_ENABLED): no per-stage breakdown.")
+
+        # A few warm clips for /clips/<filename> (also builds each video's media index).
+        clip_urls = []
+        for project_id in projects[:10]:
+            status, body = client.request('POST', '/clip', {
+                'project_id': project_id, 'start_time': '0', 'end_time': str(args.clip_secs), 'mode': args.clip_mode
+            })
+            if status == 200:
+                clip_urls.append(json.loads(body)['clip_url'])
+        if 'clips' in args.endpoints and not clip_urls:
+            raise RuntimeError("Could not create any clip to serve")
+
+        runs = []
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                run = run_level(client, endpoint, concurrency, projects, clip_urls, args)
+                runs.append(run)
+                print(" | ".join(f"{key}={value}" for key, value in run.items()))
+    finally:
+        if shutdown:
+            shutdown()
+        if args.url:
+            # Leave the live server's store as it was, even after a failed or interrupted run.
+            unseed(storage, projects)
+        if args.url or not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    findings = find_bottlenecks(runs)
+    print("\n".join(findings) or "No saturation or errors at the tested levels.")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"url": url, "projects": args.projects, "segments": args.segments,
+                       "runs": runs, "findings": findings}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
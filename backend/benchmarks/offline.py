@@ -0,0 +1,362 @@
+"""
+Offline benchmark of the ingest pipeline, /query, create_clip and thumbnail extraction on
+synthetic ffmpeg `testsrc` videos, with Gemini replaced by a deterministic local stand-in and
+(by default) a hashing embedder instead of the sentence-transformers model. Needs only ffmpeg
+and ffprobe: no network, API key or running server.
+
+    cd backend && python -m benchmarks.offline --output results.json
+    cd backend && python -m benchmarks.offline --baseline baseline.json --tolerance 0.25
+
+Results are a flat {metric: value} map. Metrics ending in _per_sec are better higher, all
+others (_ms, _secs) lower. With --baseline the run exits non-zero if any metric is worse than
+the baseline's by more than the tolerance, for CI.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+
+# Wall-clock percentiles in milliseconds.
+def latency_summary(samples, prefix):
+    return {
+        f"{prefix}_p50_ms": round(float(np.percentile(samples, 50)) * 1000, 2),
+        f"{prefix}_p95_ms": round(float(np.percentile(samples, 95)) * 1000, 2),
+        f"{prefix}_p99_ms": round(float(np.percentile(samples, 99)) * 1000, 2),
+    }
+
+def make_video(path, seconds, size='1280x720', rate=30, gop=60):
+    """Writes a `testsrc` H.264/AAC MP4 with a keyframe every `gop` frames."""
+    subprocess.run([
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f"testsrc=duration={seconds}:size={size}:rate={rate}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={seconds}",
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(gop), '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', path
+    ], check=True, capture_output=True)
+    return path
+
+class HashingEmbedder:
+    """Embedding backend stand-in: hashed bag of words, L2-normalized. Deterministic and instant."""
+    model_id = 'benchmark-hashing'
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size=32):
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode('utf-8')).hexdigest(), 16) % self.dimension] += 1.0
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+class StubAIEngine:
+    """
+    Stands in for AIEngine: analyze_video returns a Future of one segment every `segment_secs`
+    of the video (after an optional simulated `analyze_secs` delay) instead of calling Gemini.
+    """
+    def __init__(self, video_processor, embedding_backend=None, segment_secs=10, analyze_secs=0.0):
+        self.video_processor = video_processor
+        self.embedding_backend = embedding_backend or HashingEmbedder()
+        self.model_id = self.embedding_backend.model_id
+        self.dimension = self.embedding_backend.dimension
+        self.segment_secs = segment_secs
+        self.analyze_secs = analyze_secs
+        # Like the Gemini loop, waits happen off the ingest workers.
+        self._pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='stub-analysis')
+
+    def analysis_key(self, content_id):
+        return hashlib.sha256(f"{content_id}|{self.model_id}".encode('utf-8')).hexdigest()
+
+    def analyze_video(self, video_path, timings=None, on_phase=None):
+        return self._pool.submit(self._analyze, video_path, timings, on_phase)
+
+    def _analyze(self, video_path, timings=None, on_phase=None):
+        from benchmarks.embeddings import synthetic_corpus
+        from services.timecode import format_time
+        from config import VideoSegment
+
+        for phase in ('upload', 'processing', 'generation'):
+            if on_phase:
+                on_phase(phase)
+        time.sleep(self.analyze_secs)
+        if timings is not None:
+            timings.update(upload=0.0, processing=0.0, generation=self.analyze_secs)
+
+        duration = self.video_processor.media_index(video_path).duration or self.segment_secs
+        starts = range(0, int(duration), self.segment_secs)
+        descriptions = synthetic_corpus(len(starts), seed=int(duration))
+        return [
+            VideoSegment(
+                start_time=format_time(start), end_time=format_time(min(start + self.segment_secs, int(duration))),
+                description=description, key_elements=description.split()[:3]
+            )
+            for start, description in zip(starts, descriptions)
+        ]
+
+    def analyze_windows(self, windows, timings=None, on_window=None):
+        return self._pool.submit(self._analyze_windows, windows, on_window)
+
+    def _analyze_windows(self, windows, on_window=None):
+        from services.timecode import parse_time, format_time
+
+        segments = []
+        for done, (offset, window_path) in enumerate(windows, 1):
+            for seg in self._analyze(window_path):
+                segments.append(seg.model_copy(update={
+                    'start_time': format_time(parse_time(seg.start_time) + offset),
+                    'end_time': format_time(parse_time(seg.end_time) + offset),
+                }))
+            if on_window:
+                on_window(done, len(windows))
+        return segments
+
+    def get_embeddings(self, texts):
+        return np.asarray(self.embedding_backend.encode(list(texts)), dtype=np.float32).tolist()
+
+    def get_embedding(self, text, model_id=None):
+        return self.get_embeddings([text])[0]
+
+    def get_query_embeddings(self, texts, model_id=None):
+        return self.get_embeddings(texts)
+
+class StageTimer:
+    """The `stage` context manager IngestPipeline.run expects, recording wall time per stage."""
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, name):
+        started = time.perf_counter()
+        try:
+            yield lambda done, total=None, **detail: None
+        finally:
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+def synthetic_segments(count, segment_secs=10, seed=0):
+    from benchmarks.embeddings import synthetic_corpus
+    from services.timecode import format_time
+    from config import VideoSegment
+
+    return [
+        VideoSegment(
+            start_time=format_time(i * segment_secs), end_time=format_time((i + 1) * segment_secs),
+            description=description, key_elements=description.split()[:3]
+        )
+        for i, description in enumerate(synthetic_corpus(count, seed=seed))
+    ]
+
+def seed_project(storage, ai_engine, name, count, video_filename="", batch_size=1000):
+    """Creates a ready project with `count` synthetic segments; returns its id."""
+    project_id = storage.create_project(name, video_filename=video_filename)
+    segments = synthetic_segments(count)
+    for i in range(0, count, batch_size):
+        batch = segments[i:i + batch_size]
+        storage.add_segments(
+            project_id, batch, ai_engine.get_embeddings([seg.description for seg in batch]), ai_engine.model_id
+        )
+    return project_id
+
+def bench_ingest(video_processor, ai_engine, storage, thumbnail_store, videos):
+    from services.ingest import IngestPipeline
+    from services.jobs import run_steps
+
+    pipeline = IngestPipeline(video_processor, ai_engine, storage, thumbnail_store)
+    results = {}
+    for seconds, path in videos.items():
+        project_id = storage.create_project(os.path.basename(path))
+        source = os.path.join(video_processor.upload_folder, project_id, os.path.basename(path))
+        os.makedirs(os.path.dirname(source), exist_ok=True)
+        shutil.copy(path, source)
+
+        timer = StageTimer()
+        started = time.perf_counter()
+        run_steps(pipeline.run({'project_id': project_id, 'kind': 'upload', 'source': source}, timer))
+        total = time.perf_counter() - started
+        for name, elapsed in timer.timings.items():
+            results[f"ingest_{seconds}s_{name}_secs"] = round(elapsed, 3)
+        results[f"ingest_{seconds}s_total_secs"] = round(total, 3)
+        results[f"ingest_{seconds}s_video_secs_per_sec"] = round(seconds / total, 2)
+    return results
+
+def bench_query(app_module, storage, ai_engine, index_sizes, runs):
+    from benchmarks.embeddings import synthetic_corpus
+    from config import QUERY_MODES
+
+    client = app_module.app.test_client()
+    queries = synthetic_corpus(runs, seed=1)
+    results = {}
+    for size in index_sizes:
+        project_id = seed_project(storage, ai_engine, f"benchmark-{size}", size)
+        for mode in QUERY_MODES:
+            client.post('/query', json={'project_id': project_id, 'query': queries[0], 'mode': mode}) # warm-up
+            latencies = []
+            started = time.perf_counter()
+            for query in queries:
+                request_started = time.perf_counter()
+                response = client.post('/query', json={'project_id': project_id, 'query': query, 'mode': mode})
+                latencies.append(time.perf_counter() - request_started)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/query returned {response.status_code}: {response.get_json()}")
+            results.update(latency_summary(latencies, f"query_{mode}_{size}"))
+            results[f"query_{mode}_{size}_per_sec"] = round(len(queries) / (time.perf_counter() - started), 1)
+    return results
+
+def bench_clips(video_processor, video_path, duration, count, clip_secs=10):
+    from config import CLIP_MODES
+    from services.timecode import format_time
+
+    video_processor.media_index(video_path) # probed once at ingest in production
+    step = max(int(duration - clip_secs) // count, 1)
+    # Odd offsets, so starts fall between keyframes as real query results do.
+    ranges = [(format_time(1 + i * step), format_time(1 + i * step + clip_secs)) for i in range(count)]
+    results = {}
+    for mode in CLIP_MODES:
+        latencies = []
+        for start, end in ranges:
+            # Distinct ranges per run, so every clip is a cache miss.
+            started = time.perf_counter()
+            video_processor.create_clip(video_path, start, end, mode)
+            latencies.append(time.perf_counter() - started)
+        results.update(latency_summary(latencies, f"clip_{mode}"))
+    return results
+
+def bench_thumbnails(video_processor, video_path, duration, count):
+    from services.timecode import format_time
+
+    video_processor.media_index(video_path)
+    timestamps = [format_time(duration * i / count) for i in range(count)]
+    started = time.perf_counter()
+    frames = video_processor.extract_thumbnails(video_path, timestamps)
+    elapsed = time.perf_counter() - started
+    return {
+        "thumbnails_secs": round(elapsed, 3),
+        "thumbnails_per_sec": round(count / elapsed, 1),
+        "thumbnails_missing": sum(1 for frame in frames if not frame),
+    }
+
+def compare(results, baseline, tolerance):
+    """
+    Returns [(metric, baseline value, value)] for metrics worse than the baseline by more than
+    `tolerance` (relative). Metrics missing from either side or zero in the baseline are skipped.
+    """
+    regressions = []
+    for metric, expected in baseline.items():
+        value = results.get(metric)
+        if value is None or not isinstance(expected, (int, float)) or not expected:
+            continue
+        if metric.endswith('_per_sec'):
+            worse = value < expected * (1 - tolerance)
+        else:
+            worse = value > expected * (1 + tolerance)
+        if worse:
+            regressions.append((metric, expected, value))
+    return regressions
+
+def run(args, workdir):
+    # Imported after main() points the storage paths at the work directory.
+    import app as app_module
+    from services.lazy import LazyService
+    from services.embeddings import load_embedding_backend
+
+    storage = app_module.lazy_storage.get()
+    video_processor = app_module.video_processor
+    embedding_backend = load_embedding_backend(args.embedding_backend) if args.embedding_backend else None
+    ai_engine = StubAIEngine(video_processor, embedding_backend, args.segment_secs, args.analyze_secs)
+    app_module.lazy_ai_engine = LazyService('AI engine', lambda: ai_engine)
+
+    videos = {}
+    if {'ingest', 'clips', 'thumbnails'} & set(args.benchmarks):
+        for seconds in args.video_secs:
+            videos[seconds] = make_video(os.path.join(workdir, f"testsrc_{seconds}s.mp4"), seconds, args.resolution)
+    longest = max(videos) if videos else None
+
+    results = {}
+    if 'ingest' in args.benchmarks:
+        results.update(bench_ingest(video_processor, ai_engine, storage, app_module.thumbnail_store, videos))
+    if 'query' in args.benchmarks:
+        results.update(bench_query(app_module, storage, ai_engine, args.index_sizes, args.queries))
+    if 'clips' in args.benchmarks:
+        results.update(bench_clips(video_processor, videos[longest], longest, args.clips))
+    if 'thumbnails' in args.benchmarks:
+        results.update(bench_thumbnails(video_processor, videos[longest], longest, args.thumbnails))
+    return results
+
+BENCHMARKS = ('ingest', 'query', 'clips', 'thumbnails')
+
+def use_workdir(workdir=None, **settings):
+    """
+    Points the database, uploads and clips at `workdir` (default: a new temporary directory) so
+    nothing touches the real instance. Must run before config is imported; returns the directory.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix='video-query-bench-')
+    os.environ.update({
+        'DB_PATH': os.path.join(workdir, 'db'),
+        'THUMBNAIL_FOLDER': os.path.join(workdir, 'db', 'thumbnails'),
+        'UPLOAD_FOLDER': os.path.join(workdir, 'uploads'),
+        'CLIP_FOLDER': os.path.join(workdir, 'clips'),
+        'SERVICE_WARMUP': 'false',
+        'REEMBED_ON_START': 'false',
+        **settings,
+    })
+    os.makedirs(os.environ['DB_PATH'], exist_ok=True)
+    return workdir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument('--video-secs', nargs='+', type=int, default=[60, 300], help="synthetic video lengths")
+    parser.add_argument('--resolution', default='1280x720')
+    parser.add_argument('--index-sizes', nargs='+', type=int, default=[100, 1000, 10000])
+    parser.add_argument('--queries', type=int, default=200, help="requests per index size and mode")
+    parser.add_argument('--clips', type=int, default=5, help="clips per mode")
+    parser.add_argument('--thumbnails', type=int, default=48)
+    parser.add_argument('--segment-secs', type=int, default=10, help="stub analysis: one segment per N seconds")
+    parser.add_argument('--analyze-secs', type=float, default=0.0, help="stub analysis: simulated Gemini time")
+    parser.add_argument('--embedding-backend', help="a real backend (torch, onnx, ...) instead of the hashing stub")
+    parser.add_argument('--workdir', help="keep videos and indexes here instead of a temporary directory")
+    parser.add_argument('--output', help="write results as JSON to this path")
+    parser.add_argument('--baseline', help="JSON from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed relative slowdown vs the baseline")
+    args = parser.parse_args(argv)
+
+    workdir = use_workdir(args.workdir, AI_PROXY_MIN_SOURCE_MB='0') # small videos: always measure the proxy
+    try:
+        results = run(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    for metric, value in results.items():
+        print(f"{metric}: {value}")
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {k: v for k, v in vars(args).items() if k not in ('output', 'baseline', 'workdir')},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for metric, expected, value in regressions:
+            print(f"REGRESSION {metric}: {value} (baseline {expected}, tolerance {args.tolerance:.0%})")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
@@ -6,15 +7,129 @@ from pydantic import BaseModel, Field
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
 CLIP_FOLDER = os.getenv('CLIP_FOLDER', 'clips')
 DB_PATH = os.getenv('DB_PATH', './video_index_db')
+THUMBNAIL_FOLDER = os.getenv('THUMBNAIL_FOLDER', os.path.join(DB_PATH, 'thumbnails'))
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'webm'}
+MAX_UPLOAD_BYTES = int(float(os.getenv('MAX_UPLOAD_MB', '4096')) * 1024 * 1024)
+# Resumable uploads idle this long lose their streaming proxy transcode (the upload itself stays resumable).
+UPLOAD_IDLE_SECS = float(os.getenv('UPLOAD_IDLE_SECS', '900'))
+PROJECTS_PAGE_SIZE = int(os.getenv('PROJECTS_PAGE_SIZE', '100'))
+PROJECTS_PAGE_MAX = int(os.getenv('PROJECTS_PAGE_MAX', '1000'))
 
 # --- Model Configurations ---
 GENAI_MODEL_NAME = "gemini-flash-lite-latest"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
-EMBEDDING_DIMENSION = 384 
+# Each collection records the model and dimension that built it. Changing the model re-embeds
+# existing projects in the background (services/reembed.py); queries use each index's own model
+# until its replacement is ready.
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'all-MiniLM-L6-v2')
+# Collections created before models were recorded were built with this one.
+EMBEDDING_LEGACY_MODEL = 'all-MiniLM-L6-v2'
+REEMBED_ON_START = os.getenv('REEMBED_ON_START', 'true').lower() in ('1', 'true', 'yes')
+REEMBED_BATCH_SIZE = int(os.getenv('REEMBED_BATCH_SIZE', '64'))
+REEMBED_PAUSE_SECS = float(os.getenv('REEMBED_PAUSE_SECS', '0.2')) # between batches, to leave room for queries
+
+# Embedding runtime: 'torch' (sentence-transformers), 'onnx' or 'onnx-int8' (ONNX Runtime on CPU),
+# or 'remote' (the shared embedding server below).
+# All three produce vectors in the same space, so switching needs no re-indexing.
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+EMBEDDING_HF_REPO = os.getenv('EMBEDDING_HF_REPO', '')
+EMBEDDING_ONNX_FILE = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model.onnx')
+EMBEDDING_ONNX_INT8_FILE = os.getenv('EMBEDDING_ONNX_INT8_FILE', 'onnx/model_quint8_avx2.onnx')
+EMBEDDING_MAX_TOKENS = int(os.getenv('EMBEDDING_MAX_TOKENS', '256'))
+EMBEDDING_THREADS = int(os.getenv('EMBEDDING_THREADS', '0'))
+
+# Shared embedding server (`python -m services.embedding_server`): with EMBEDDING_BACKEND=remote,
+# every web worker sends texts over this Unix socket instead of loading its own model copy.
+# The server runs EMBEDDING_SERVER_BACKEND and batches requests arriving within the window.
+EMBEDDING_SOCKET = os.getenv('EMBEDDING_SOCKET', os.path.join(tempfile.gettempdir(), 'video-query-embeddings.sock'))
+EMBEDDING_SERVER_BACKEND = os.getenv('EMBEDDING_SERVER_BACKEND', 'torch')
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '5'))
+EMBEDDING_MAX_BATCH = int(os.getenv('EMBEDDING_MAX_BATCH', '64'))
+EMBEDDING_CONNECT_TIMEOUT_SECS = float(os.getenv('EMBEDDING_CONNECT_TIMEOUT_SECS', '30'))
+
+# Query embedding cache (normalized query text -> vector)
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', '2048'))
+QUERY_CACHE_TTL_SECS = float(os.getenv('QUERY_CACHE_TTL_SECS', '3600'))
+QUERY_BATCH_MAX = int(os.getenv('QUERY_BATCH_MAX', '64'))
+
+# Project queries fuse BM25 (description + key elements) and vector rankings with reciprocal rank fusion.
+QUERY_MODES = ('vector', 'lexical', 'hybrid')
+QUERY_MODE = os.getenv('QUERY_MODE', 'hybrid')
+HYBRID_VECTOR_WEIGHT = float(os.getenv('HYBRID_VECTOR_WEIGHT', '1.0'))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv('HYBRID_LEXICAL_WEIGHT', '1.0'))
+HYBRID_CANDIDATES = int(os.getenv('HYBRID_CANDIDATES', '50'))
+RRF_K = int(os.getenv('RRF_K', '60'))
+
+# Post-retrieval: candidates fetched per returned result, merge gap for neighbouring
+# segments, and the MMR relevance weight (1.0 disables diversity re-ranking).
+QUERY_TOP_K = int(os.getenv('QUERY_TOP_K', '5'))
+QUERY_TOP_K_MAX = int(os.getenv('QUERY_TOP_K_MAX', '50'))
+QUERY_CANDIDATES_PER_RESULT = int(os.getenv('QUERY_CANDIDATES_PER_RESULT', '4'))
+MERGE_GAP_SECS = float(os.getenv('MERGE_GAP_SECS', '1'))
+MMR_DIVERSITY = float(os.getenv('MMR_DIVERSITY', '0.7'))
 
 # Skip proxy generation for small files where transcode overhead is not worth it.
 AI_PROXY_MIN_SOURCE_MB = float(os.getenv('AI_PROXY_MIN_SOURCE_MB', '30'))
+# yt-dlp format fetched for the AI path of URL ingests, alongside the full-quality download.
+AI_PROXY_FORMAT = os.getenv('AI_PROXY_FORMAT', 'best[height<=480][ext=mp4]/bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]')
+
+CLIP_MODES = ('exact', 'fast', 'smart')
+
+# Disk budget for generated clips; least recently used clips are evicted beyond it.
+CLIP_CACHE_MAX_BYTES = int(float(os.getenv('CLIP_CACHE_MAX_MB', '2048')) * 1024 * 1024)
+# Temp files of clip encodes older than this are from a crashed encode and removed at startup;
+# younger ones may belong to another worker process still encoding.
+CLIP_TMP_MAX_AGE_SECS = float(os.getenv('CLIP_TMP_MAX_AGE_SECS', '3600'))
+
+# 'fast' clips stream-copy from the previous keyframe when it is at most this far before the start.
+CLIP_KEYFRAME_TOLERANCE_SECS = float(os.getenv('CLIP_KEYFRAME_TOLERANCE_SECS', '0.5'))
+
+# Thumbnails per ffmpeg process, and how many of those processes run in parallel.
+THUMBNAIL_BATCH_SIZE = int(os.getenv('THUMBNAIL_BATCH_SIZE', '16'))
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', '4'))
+
+# Long videos are analyzed as overlapping windows in parallel (0 disables windowing).
+ANALYSIS_WINDOW_MIN_SECS = float(os.getenv('ANALYSIS_WINDOW_MIN_SECS', '1200'))
+ANALYSIS_WINDOW_SECS = float(os.getenv('ANALYSIS_WINDOW_SECS', '600'))
+ANALYSIS_WINDOW_OVERLAP_SECS = float(os.getenv('ANALYSIS_WINDOW_OVERLAP_SECS', '30'))
+ANALYSIS_WINDOW_WORKERS = int(os.getenv('ANALYSIS_WINDOW_WORKERS', '4'))
+ANALYSIS_WINDOW_RETRIES = int(os.getenv('ANALYSIS_WINDOW_RETRIES', '2'))
+
+# Gemini file processing is polled with exponential backoff; the whole analysis has a deadline.
+GEMINI_POLL_INITIAL_SECS = float(os.getenv('GEMINI_POLL_INITIAL_SECS', '1'))
+GEMINI_POLL_MAX_SECS = float(os.getenv('GEMINI_POLL_MAX_SECS', '15'))
+GEMINI_DEADLINE_SECS = float(os.getenv('GEMINI_DEADLINE_SECS', '1800'))
+
+# Optional HLS packaging of source videos (fMP4 segments) for instant playback of any time range.
+HLS_ENABLED = os.getenv('HLS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+HLS_SEGMENT_SECS = int(os.getenv('HLS_SEGMENT_SECS', '6'))
+
+# --- Workers ---
+# 'light' workers serve project listing, clips and media only, and never load the AI engine.
+LIGHT_WORKER = os.getenv('WORKER_MODE', 'full').lower() == 'light'
+# Build heavy services in the background after the first request instead of on demand.
+SERVICE_WARMUP = os.getenv('SERVICE_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+
+# --- Ingest Job Queue ---
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '8'))
+# Jobs live in SQLite, shared by every worker process. Running jobs heartbeat; a job whose process
+# died (no heartbeat for JOB_STALE_SECS) is requeued. Finished jobs are pruned after the retention.
+JOB_HEARTBEAT_SECS = float(os.getenv('JOB_HEARTBEAT_SECS', '10'))
+JOB_STALE_SECS = float(os.getenv('JOB_STALE_SECS', '60'))
+JOB_RETENTION_DAYS = float(os.getenv('JOB_RETENTION_DAYS', '7'))
+# Prometheus-style metrics on /metrics; when off, instrumentation is a no-op.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+# Idle interval of /projects/<id>/events streams: a keepalive, and a recheck of the project status.
+EVENTS_HEARTBEAT_SECS = float(os.getenv('EVENTS_HEARTBEAT_SECS', '15'))
+# Max jobs inside each pipeline stage at once (ffmpeg is CPU bound, Gemini is I/O bound).
+STAGE_CONCURRENCY = {
+    'download': int(os.getenv('DOWNLOAD_CONCURRENCY', '4')),
+    'proxy': int(os.getenv('PROXY_CONCURRENCY', '2')),
+    'analyze': int(os.getenv('ANALYZE_CONCURRENCY', '8')),
+    'thumbnails': int(os.getenv('THUMBNAIL_CONCURRENCY', '2')),
+    'embed': int(os.getenv('EMBED_CONCURRENCY', '1')),
+    'index': int(os.getenv('INDEX_CONCURRENCY', '4')),
+    'package': int(os.getenv('PACKAGE_CONCURRENCY', '2')),
+}
 
 # --- Structured Output Schemas ---
 class VideoSegment(BaseModel):
@@ -22,7 +137,7 @@ class VideoSegment(BaseModel):
     end_time: str = Field(description="End time of the segment in MM:SS format")
     description: str = Field(description="Detailed description of what happens in this segment")
     key_elements: List[str] = Field(description="List of key objects, people, or concepts in the segment")
-    thumbnail: Optional[str] = Field(default="", description="Base64 encoded thumbnail image")
+    thumbnail: Optional[str] = Field(default="", description="Content hash of the stored thumbnail image")
 
 class VideoAnalysis(BaseModel):
     segments: List[VideoSegment]
@@ -0,0 +1,26 @@
+import pytest
+import services.storage as storage_module
+from services.lazy import LazyService
+from services.storage import StorageService
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """A StorageService over an empty database in tmp_path."""
+    monkeypatch.setattr(storage_module, 'DB_PATH', str(tmp_path))
+    return StorageService()
+
+@pytest.fixture
+def make_client(storage, monkeypatch):
+    """
+    Returns a factory for a Flask test client whose services are `storage` and the given
+    fakes (None = that service is unavailable, as on a light worker).
+    """
+    import app as app_module
+
+    def make(ai_engine=None, job_queue=None):
+        monkeypatch.setattr(app_module, 'SERVICE_WARMUP', False)
+        monkeypatch.setattr(app_module, 'lazy_storage', LazyService('storage service', lambda: storage))
+        monkeypatch.setattr(app_module, 'lazy_ai_engine', LazyService('AI engine', lambda: ai_engine))
+        monkeypatch.setattr(app_module, 'lazy_job_queue', LazyService('ingest job queue', lambda: job_queue))
+        return app_module.app.test_client()
+    return make
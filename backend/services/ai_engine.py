@@ -1,14 +1,28 @@
 import os
-import time
+import asyncio
+import hashlib
 import logging
-import torch
+import threading
 from google import genai
-from google.genai import types
-from sentence_transformers import SentenceTransformer
-from config import GENAI_MODEL_NAME, EMBEDDING_MODEL_NAME, VideoAnalysis
+from config import (
+    GENAI_MODEL_NAME, EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_SERVER_BACKEND, QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL_SECS, ANALYSIS_WINDOW_SECS, ANALYSIS_WINDOW_WORKERS, ANALYSIS_WINDOW_RETRIES
+)
+from services.cache import LRUCache
+from services.embeddings import load_embedding_backend
+from services.analysis_client import AnalysisClient
+from services.timecode import parse_time, format_time, window_bounds
 
 logger = logging.getLogger(__name__)
 
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"AI Analysis failed: {future.exception()}")
+
+def _normalize_query(text):
+    # The embedding model is uncased, so case and spacing variants share one cache entry.
+    return " ".join(text.lower().split())
+
 class AIEngine:
     def __init__(self):
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
@@ -16,17 +30,15 @@ class AIEngine:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
         self.client = genai.Client(api_key=self.google_api_key)
+        self.analysis_client = AnalysisClient(self.client)
         
-        # Detect device: CUDA > MPS (Apple) > CPU
-        if torch.cuda.is_available():
-            device = "cuda"
-        elif torch.backends.mps.is_available():
-            device = "mps"
-        else:
-            device = "cpu"
-            
-        logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME} on {device}...")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+        self.embedding_backend = load_embedding_backend()
+        self.model_id = self.embedding_backend.model_id
+        self.dimension = self.embedding_backend.dimension
+        # Models of indexes not yet re-embedded, loaded when a query needs them.
+        self._other_backends = {}
+        self._backends_lock = threading.Lock()
+        self.query_cache = LRUCache(QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL_SECS)
         
         # Load prompt from file
         self.prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'video_analysis.txt')
@@ -41,56 +53,135 @@ class AIEngine:
             # Fallback to a basic prompt if file reading fails
             return "Analyze this video and break it down into segments."
 
-    def analyze_video(self, video_path):
-        """Uploads video to Gemini and gets structured analysis."""
+    def analysis_key(self, content_id):
+        """
+        Cache key for an analysis: the source content plus everything that shapes the output
+        (prompt text, generation model, embedding model). A prompt or model change is a miss.
+        """
+        prompt_hash = hashlib.sha256(self._get_prompt().encode('utf-8')).hexdigest()
+        material = "|".join([content_id, GENAI_MODEL_NAME, prompt_hash, EMBEDDING_MODEL_NAME])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def analyze_video(self, video_path, timings=None, on_phase=None):
+        """
+        Uploads video to Gemini and gets structured analysis. The upload, polling and
+        generation run on the analysis client's event loop; returns a concurrent.futures.Future
+        of the segments, so the caller need not hold a thread while Gemini works.
+        Upload/processing/generation durations are written into `timings` if given, and
+        `on_phase(name)` is called as each phase starts.
+        """
+        future = self.analysis_client.submit(video_path, self._get_prompt(), timings, on_phase)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def analyze_windows(self, windows, timings=None, on_window=None):
+        """
+        Analyzes [(offset_seconds, window_path)] concurrently, retrying each failed window on its own.
+        Returns a Future of the segments, shifted to the full video's timeline with overlaps
+        deduplicated: a segment is kept only by the window that owns its start time.
+        Phase durations are summed across windows into `timings`; `on_window(done, total)`
+        is called as windows complete.
+        """
+        future = self.analysis_client.run(self._analyze_windows(windows, timings, on_window))
+        future.add_done_callback(_log_failure)
+        return future
+
+    async def _analyze_windows(self, windows, timings=None, on_window=None):
+        # Runs on the analysis loop; a failed window cancels its siblings.
+        offsets = [offset for offset, _ in windows]
+        bounds = window_bounds(offsets, ANALYSIS_WINDOW_SECS)
+        window_timings = [{} for _ in windows]
+        prompt = self._get_prompt()
+        limit = asyncio.Semaphore(ANALYSIS_WINDOW_WORKERS)
+        done = 0
+
+        async def analyze_window(offset, window_path, timings):
+            nonlocal done
+            async with limit:
+                for attempt in range(ANALYSIS_WINDOW_RETRIES + 1):
+                    try:
+                        segments = await self.analysis_client.analyze(window_path, prompt, timings)
+                        break
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        if attempt == ANALYSIS_WINDOW_RETRIES:
+                            raise
+                        logger.warning(f"Window at {format_time(offset)} failed ({e}); retrying")
+                        await asyncio.sleep(2 ** attempt)
+            done += 1
+            if on_window:
+                on_window(done, len(windows))
+            return segments
+
+        tasks = [
+            asyncio.ensure_future(analyze_window(offset, path, timings))
+            for (offset, path), timings in zip(windows, window_timings)
+        ]
         try:
-            # 1. Upload file
-            logger.info(f"Uploading {video_path} to Gemini...")
-            file_ref = self.client.files.upload(file=video_path)
-            
-            # 2. Wait for processing
-            while file_ref.state.name == "PROCESSING":
-                time.sleep(2)
-                file_ref = self.client.files.get(name=file_ref.name)
-            
-            if file_ref.state.name == "FAILED":
-                raise RuntimeError("Video processing failed on Gemini side")
-
-            # 3. Generate Content with Structured Output
-            logger.info(f"Generating analysis using {GENAI_MODEL_NAME}...")
-            prompt = self._get_prompt()
-            
-            response = self.client.models.generate_content(
-                model=GENAI_MODEL_NAME,
-                contents=[file_ref, prompt],
-                config=types.GenerateContentConfig(
-                    response_mime_type='application/json',
-                    response_schema=VideoAnalysis
-                )
-            )
-            
-            # Clean up the file from Gemini after analysis to be tidy
-            try:
-                self.client.files.delete(name=file_ref.name)
-            except:
-                pass
-
-            if not response.parsed:
-                logger.error("No parsed response received")
-                return []
-
-            return response.parsed.segments
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
 
-        except Exception as e:
-            logger.error(f"AI Analysis failed: {e}")
-            raise
+        if timings is not None:
+            for phases in window_timings:
+                for phase, seconds in phases.items():
+                    timings[phase] = timings.get(phase, 0.0) + seconds
+
+        merged = []
+        for offset, (lo, hi), segments in zip(offsets, bounds, results):
+            for seg in segments:
+                start = offset + parse_time(seg.start_time)
+                if lo <= start < hi:
+                    merged.append(seg.model_copy(update={
+                        'start_time': format_time(start),
+                        'end_time': format_time(offset + parse_time(seg.end_time))
+                    }))
+        merged.sort(key=lambda seg: parse_time(seg.start_time))
+        return merged
+
+    def backend_for(self, model_id=None):
+        """The embedding backend for `model_id` (default: the configured model)."""
+        if model_id is None or model_id == self.model_id:
+            return self.embedding_backend
+        with self._backends_lock:
+            backend = self._other_backends.get(model_id)
+            if backend is None:
+                logger.info(f"Loading {model_id} to query indexes not yet re-embedded")
+                # The shared server only serves the current model: older ones load in this
+                # process, on the runtime the server uses.
+                name = EMBEDDING_SERVER_BACKEND if EMBEDDING_BACKEND == 'remote' else EMBEDDING_BACKEND
+                backend = load_embedding_backend(name, model_id)
+                if backend.model_id != model_id:
+                    raise ValueError(f"Embedding backend serves {backend.model_id}, not {model_id}")
+                self._other_backends[model_id] = backend
+            return backend
+
+    def get_embedding(self, text, model_id=None):
+        """Generates vector embedding for a single query string (cached)."""
+        return self.get_query_embeddings([text], model_id)[0]
+
+    def get_query_embeddings(self, texts, model_id=None):
+        """
+        Generates embeddings for query strings with `model_id` (the model of the index being
+        searched), encoding only cache misses in one batch.
+        """
+        model_id = model_id or self.model_id
+        keys = [(model_id, _normalize_query(text)) for text in texts]
+        embeddings = [self.query_cache.get(key) for key in keys]
 
-    def get_embedding(self, text):
-        """Generates vector embedding for a single string."""
-        return self.embedding_model.encode(text).tolist()
+        missing = list(dict.fromkeys(key for key, emb in zip(keys, embeddings) if emb is None))
+        if missing:
+            vectors = self.backend_for(model_id).encode([text for _, text in missing], batch_size=32)
+            encoded = dict(zip(missing, vectors.tolist()))
+            for key, emb in encoded.items():
+                self.query_cache.put(key, emb)
+            embeddings = [emb if emb is not None else encoded[key] for key, emb in zip(keys, embeddings)]
+        return embeddings
 
     def get_embeddings(self, texts):
         """Generates vector embeddings for a list of strings (batched)."""
         logger.info(f"Generating embeddings for {len(texts)} segments...")
-        embeddings = self.embedding_model.encode(texts, batch_size=32, show_progress_bar=False)
+        embeddings = self.embedding_backend.encode(texts, batch_size=32)
         return embeddings.tolist()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import logging
+import threading
+from google.genai import types
+from config import GENAI_MODEL_NAME, GEMINI_POLL_INITIAL_SECS, GEMINI_POLL_MAX_SECS, GEMINI_DEADLINE_SECS, VideoAnalysis
+from services.metrics import GEMINI_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class AnalysisClient:
+    """
+    Async Gemini video analysis on one background event loop.
+
+    Every pending upload is a coroutine rather than a blocked thread: file processing is
+    polled with exponential backoff, each analysis has an overall deadline, and callers get
+    a concurrent.futures.Future they can wait on or cancel from any thread. The ingest
+    pipeline yields that Future and resumes when it completes, so no worker waits on Gemini.
+    """
+    def __init__(self, client, poll_initial=GEMINI_POLL_INITIAL_SECS, poll_max=GEMINI_POLL_MAX_SECS,
+                 deadline=GEMINI_DEADLINE_SECS):
+        self.client = client
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.deadline = deadline
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name='gemini-loop', daemon=True).start()
+
+    def run(self, coroutine):
+        """Schedules a coroutine on the loop; cancelling the returned Future cancels it."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def submit(self, video_path, prompt, timings=None, on_phase=None):
+        """Schedules one analysis and returns a Future of its segments."""
+        return self.run(self.analyze(video_path, prompt, timings, on_phase))
+
+    async def analyze(self, video_path, prompt, timings=None, on_phase=None):
+        """
+        Uploads, waits for server-side processing, then generates the structured analysis,
+        all within the deadline. Phase durations in seconds are written into `timings`, and
+        `on_phase(name)` is called as each phase starts.
+        """
+        timings = timings if timings is not None else {}
+        on_phase = on_phase or (lambda phase: None)
+        try:
+            return await asyncio.wait_for(self._analyze(video_path, prompt, timings, on_phase), self.deadline)
+        finally:
+            for phase, seconds in timings.items():
+                GEMINI_PHASE_SECONDS.labels(phase).observe(seconds)
+
+    async def _analyze(self, video_path, prompt, timings, on_phase):
+        file_ref = None
+        try:
+            on_phase('upload')
+            started = time.monotonic()
+            logger.info(f"Uploading {video_path} to Gemini...")
+            file_ref = await self.client.aio.files.upload(file=video_path)
+            timings['upload'] = time.monotonic() - started
+
+            on_phase('processing')
+            started = time.monotonic()
+            file_ref = await self._wait_until_processed(file_ref)
+            timings['processing'] = time.monotonic() - started
+
+            on_phase('generation')
+            started = time.monotonic()
+            logger.info(f"Generating analysis using {GENAI_MODEL_NAME}...")
+            response = await self.client.aio.models.generate_content(
+                model=GENAI_MODEL_NAME,
+                contents=[file_ref, prompt],
+                config=types.GenerateContentConfig(
+                    response_mime_type='application/json',
+                    response_schema=VideoAnalysis
+                )
+            )
+            timings['generation'] = time.monotonic() - started
+        finally:
+            if file_ref is not None:
+                # Shielded so a cancelled or timed-out analysis still cleans up its upload.
+                await asyncio.shield(self._delete(file_ref.name))
+
+        if not response.parsed:
+            logger.error("No parsed response received")
+            return []
+        return response.parsed.segments
+
+    async def _wait_until_processed(self, file_ref):
+        delay = self.poll_initial
+        while file_ref.state.name == "PROCESSING":
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_max)
+            file_ref = await self.client.aio.files.get(name=file_ref.name)
+
+        if file_ref.state.name == "FAILED":
+            raise RuntimeError("Video processing failed on Gemini side")
+        return file_ref
+
+    async def _delete(self, name):
+        try:
+            await self.client.aio.files.delete(name=name)
+        except Exception as e:
+            logger.warning(f"Failed to delete Gemini file {name}: {e}")
@@ -0,0 +1,163 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+TMP_PREFIX = '.tmp-'
+
+class ClipCache:
+    """
+    Generated clips on disk, kept under a byte budget and evicted least recently used.
+
+    Clips are written to a temp file and renamed into place, so readers never see a partial
+    clip, and concurrent requests for the same clip share one encode (single flight).
+    Recency survives restarts through file mtimes, which are bumped on every hit.
+
+    The folder on disk is the source of truth, so worker processes sharing it reuse each
+    other's clips, and the budget covers the whole folder (re-measured after every encode).
+    Single flight is per process: two workers missing the same clip at once both encode it.
+    """
+    def __init__(self, root, max_bytes, tmp_max_age=3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_max_age = tmp_max_age
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        files = []
+        stale_before = time.time() - self.tmp_max_age
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(TMP_PREFIX):
+                # Left behind by an encode that died mid-write. A recent one may be another
+                # process's encode in progress, so only old ones go.
+                try:
+                    if os.path.getmtime(path) < stale_before:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+        with self._lock:
+            self._load_entries()
+            self._evict()
+
+    def _load_entries(self):
+        # Caller holds the lock. Clips on disk, least recently used first; mtimes within one
+        # filesystem tick keep this process's known order.
+        known = {name: rank for rank, name in enumerate(self._entries)}
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.name.startswith('clip_'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue # evicted by another process meanwhile
+                files.append((stat.st_mtime_ns, known.get(entry.name, len(known)), entry.name, stat.st_size))
+        self._entries = OrderedDict((name, size) for _, _, name, size in sorted(files))
+        self._size = sum(self._entries.values())
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def get_or_create(self, name, produce):
+        """
+        Returns the path of clip `name`, calling `produce(tmp_path)` to write it on a miss.
+        If the same clip is already being produced, waits for that result instead.
+        """
+        path = self.path(name)
+        with self._lock:
+            try:
+                # On disk counts as a hit even if another process wrote it.
+                os.utime(path)
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                size = None
+            if size is not None:
+                self._size += size - self._entries.pop(name, 0)
+                self._entries[name] = size
+                self.hits += 1
+                return path
+            future = self._inflight.get(name)
+            owner = future is None
+            if owner:
+                future = self._inflight[name] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        # Keep the extension: ffmpeg picks the container from it.
+        tmp_path = self.path(f"{TMP_PREFIX}{uuid.uuid4().hex}-{name}")
+        try:
+            produce(tmp_path)
+            os.replace(tmp_path, path)
+            with self._lock:
+                # Other processes may have added clips too: budget against what is on disk.
+                self._load_entries()
+                self._evict(keep=name)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+
+    def _evict(self, keep=None):
+        # Caller holds the lock.
+        for name in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            self._size -= self._entries.pop(name)
+            self.evictions += 1
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass # another process evicted it first
+            except OSError as e:
+                logger.warning(f"Failed to evict clip {name}: {e}")
+
+    def names(self):
+        with self._lock:
+            return list(self._entries)
+
+    def remove(self, name):
+        with self._lock:
+            self._size -= self._entries.pop(name, 0)
+        path = self.path(name)
+        if os.path.exists(path):
+            os.remove(path)
+            return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions
+            }
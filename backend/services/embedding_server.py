@@ -0,0 +1,244 @@
+"""
+Shared embedding server: one model in one process, reached by every web worker over a
+Unix socket. Concurrent requests arriving within a short window are encoded as one batch.
+
+    python -m services.embedding_server [--backend onnx-int8] [--socket PATH]
+
+Workers use it with EMBEDDING_BACKEND=remote (see EmbeddingClient).
+"""
+import os
+import json
+import time
+import queue
+import socket
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+from concurrent.futures import Future
+import numpy as np
+from config import (
+    EMBEDDING_SOCKET, EMBEDDING_SERVER_BACKEND, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH,
+    EMBEDDING_CONNECT_TIMEOUT_SECS
+)
+
+logger = logging.getLogger(__name__)
+
+# Frame: header length, payload length, JSON header, raw payload (float32 vectors).
+FRAME = struct.Struct('!II')
+
+def send_message(sock, header, payload=b''):
+    data = json.dumps(header).encode('utf-8')
+    sock.sendall(FRAME.pack(len(data), len(payload)) + data + payload)
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+def recv_message(sock):
+    """Returns (header, payload); raises ConnectionError when the peer has gone."""
+    header_len, payload_len = FRAME.unpack(_recv_exact(sock, FRAME.size))
+    header = json.loads(_recv_exact(sock, header_len))
+    return header, _recv_exact(sock, payload_len)
+
+class MicroBatcher:
+    """
+    Collects encode requests from many threads and runs them through the backend together:
+    a batch closes after `window_secs` from its first request or once `max_batch` texts wait.
+    """
+    def __init__(self, backend, window_secs, max_batch):
+        self.backend = backend
+        self.window_secs = window_secs
+        self.max_batch = max_batch
+        self._pending = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._run, name='embedding-batcher', daemon=True).start()
+
+    def encode(self, texts):
+        future = Future()
+        self._pending.put((texts, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self._pending.get()]
+            count = len(batch[0][0])
+            deadline = time.monotonic() + self.window_secs
+            while count < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                count += len(item[0])
+            self._encode(batch)
+
+    def _encode(self, batch):
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            vectors = np.asarray(self.backend.encode(texts, batch_size=self.max_batch), dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.texts += len(texts)
+        offset = 0
+        for item_texts, future in batch:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "batches": self.batches, "texts": self.texts}
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except (ConnectionError, struct.error):
+                return
+            op = header.get('op')
+            if op == 'encode':
+                try:
+                    vectors = server.batcher.encode(header['texts'])
+                except Exception as e:
+                    send_message(self.request, {"error": str(e)})
+                    continue
+                send_message(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+            elif op == 'info':
+                send_message(self.request, {
+                    "model_id": server.backend.model_id, "dimension": int(server.backend.dimension)
+                })
+            elif op == 'stats':
+                send_message(self.request, server.batcher.stats())
+            else:
+                send_message(self.request, {"error": f"Unknown op {op!r}"})
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, backend, socket_path=EMBEDDING_SOCKET,
+                 window_secs=EMBEDDING_BATCH_WINDOW_MS / 1000, max_batch=EMBEDDING_MAX_BATCH):
+        self.backend = backend
+        self.batcher = MicroBatcher(backend, window_secs, max_batch)
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+def _remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.remove(path) # Left behind by a server that died
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"An embedding server is already listening on {path}")
+
+class EmbeddingClient:
+    """
+    Embedding backend that forwards to the shared server. Each thread keeps its own
+    connection, so concurrent requests reach the server (and its batcher) in parallel.
+    """
+    def __init__(self, socket_path=EMBEDDING_SOCKET, connect_timeout=EMBEDDING_CONNECT_TIMEOUT_SECS):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        # The server may still be loading its model when workers start.
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                info = self._call({"op": "info"})[0]
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+        self.model_id = info['model_id']
+        self.dimension = info['dimension']
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _call(self, header, retry=True):
+        try:
+            sock = self._connection()
+            send_message(sock, header)
+            response, payload = recv_message(sock)
+        except OSError:
+            # Server restarted: drop the dead connection and try once more.
+            sock = getattr(self._local, 'sock', None)
+            if sock is not None:
+                sock.close()
+            self._local.sock = None
+            if not retry:
+                raise
+            return self._call(header, retry=False)
+        if 'error' in response:
+            raise RuntimeError(f"Embedding server: {response['error']}")
+        return response, payload
+
+    def encode(self, texts, batch_size=32):
+        # The server batches across callers, so batch_size does not apply here.
+        response, payload = self._call({"op": "encode", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=np.float32).reshape(response['shape'])
+
+    def stats(self):
+        return self._call({"op": "stats"})[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve embeddings to web workers over a Unix socket.")
+    parser.add_argument('--backend', default=EMBEDDING_SERVER_BACKEND, help="torch, onnx or onnx-int8")
+    parser.add_argument('--socket', default=EMBEDDING_SOCKET)
+    parser.add_argument('--window-ms', type=float, default=EMBEDDING_BATCH_WINDOW_MS)
+    parser.add_argument('--max-batch', type=int, default=EMBEDDING_MAX_BATCH)
+    args = parser.parse_args()
+
+    from services.embeddings import load_embedding_backend
+    logging.basicConfig(level=logging.INFO)
+    if args.backend == 'remote':
+        parser.error("the server needs a local backend")
+    backend = load_embedding_backend(args.backend)
+    server = EmbeddingServer(backend, args.socket, args.window_ms / 1000, args.max_batch)
+    logger.info(f"Embedding server ({args.backend}, {backend.model_id}) listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+from config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_HF_REPO, EMBEDDING_MAX_TOKENS,
+    EMBEDDING_ONNX_FILE, EMBEDDING_ONNX_INT8_FILE, EMBEDDING_THREADS
+)
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx-int8', 'remote')
+
+class TorchBackend:
+    """The sentence-transformers model on PyTorch (CUDA > MPS > CPU)."""
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME):
+        # Heavy imports stay out of module import time.
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if torch.cuda.is_available():
+            device = "cuda"
+        elif torch.backends.mps.is_available():
+            device = "mps"
+        else:
+            device = "cpu"
+
+        logger.info(f"Loading embedding model: {model_name} on {device}...")
+        self.model = SentenceTransformer(model_name, device=device)
+        self.model_id = model_name
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+
+class OnnxBackend:
+    """
+    The same model exported to ONNX, run with ONNX Runtime on CPU: tokenize, encode, then the
+    model's mean pooling and L2 normalization, so vectors share the PyTorch model's space and
+    existing indexes stay valid. `quantized` uses the int8 export (smaller, faster, ~0.99 cosine
+    agreement with full precision).
+    """
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, quantized=False):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        from huggingface_hub import hf_hub_download
+
+        repo = EMBEDDING_HF_REPO or f"sentence-transformers/{model_name}"
+        onnx_file = EMBEDDING_ONNX_INT8_FILE if quantized else EMBEDDING_ONNX_FILE
+        logger.info(f"Loading ONNX embedding model: {repo}/{onnx_file}...")
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(repo, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = EMBEDDING_THREADS # 0 = ONNX Runtime default
+        self.session = onnxruntime.InferenceSession(
+            hf_hub_download(repo, onnx_file), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {inp.name for inp in self.session.get_inputs()}
+        self.model_id = model_name
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts, batch_size=32):
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        return np.concatenate(batches) if batches else np.zeros((0, self.dimension), dtype=np.float32)
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        mask = feeds['attention_mask'][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+def load_embedding_backend(name=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL_NAME):
+    """Builds the configured embedding backend: 'torch', 'onnx', 'onnx-int8' or 'remote'."""
+    if name == 'torch':
+        return TorchBackend(model_name)
+    if name == 'onnx':
+        return OnnxBackend(model_name)
+    if name == 'onnx-int8':
+        return OnnxBackend(model_name, quantized=True)
+    if name == 'remote':
+        from services.embedding_server import EmbeddingClient
+        return EmbeddingClient()
+    raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}")
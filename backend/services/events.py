@@ -0,0 +1,82 @@
+import json
+import queue
+import threading
+
+class EventBus:
+    """
+    In-memory pub/sub of ingest progress, keyed by project id.
+
+    Each subscriber gets its own bounded queue; a subscriber too slow to keep up loses its
+    oldest events rather than blocking the ingest. The latest event of each kind per project
+    is kept so a new subscriber starts from the current state.
+    """
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._latest = {}
+
+    def publish(self, project_id, event, data):
+        message = {"event": event, "data": data}
+        with self._lock:
+            key = (event, data.get('stage')) if event == 'progress' else event
+            self._latest.setdefault(project_id, {})[key] = message
+            subscribers = list(self._subscribers.get(project_id, ()))
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def subscribe(self, project_id):
+        """Returns (queue, snapshot of the latest events); call unsubscribe when done."""
+        subscriber = queue.Queue(self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(subscriber)
+            snapshot = list(self._latest.get(project_id, {}).values())
+        return subscriber, snapshot
+
+    def unsubscribe(self, project_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[project_id]
+
+    def clear(self, project_id):
+        """Forgets a finished project's state (current subscribers keep their queues)."""
+        with self._lock:
+            self._latest.pop(project_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "projects": len(self._latest),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values())
+            }
+
+def sse_message(message):
+    """Formats an event for a text/event-stream response."""
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+class ProgressReporter:
+    """Publishes `done/total` of a stage, only when the whole percentage changes."""
+    def __init__(self, publish, stage):
+        self.publish = publish
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._percent = None
+
+    def __call__(self, done, total=None, **detail):
+        percent = min(int(100 * done / total), 100) if total else None
+        with self._lock:
+            if percent is not None and percent == self._percent and not detail:
+                return
+            self._percent = percent
+        self.publish('progress', {"stage": self.stage, "done": done, "total": total, "percent": percent, **detail})
@@ -0,0 +1,51 @@
+import os
+import re
+import math
+
+PLAYLIST_NAME = 'index.m3u8'
+INIT_NAME = 'init.mp4'
+SEGMENT_PATTERN = 'seg_%05d.m4s'
+HLS_FILE_RE = re.compile(r'^(init\.mp4|seg_\d{5}\.m4s)$')
+
+def hls_dir(video_path):
+    """Packaged segments live in an `hls` folder next to the source video."""
+    return os.path.join(os.path.dirname(os.path.abspath(video_path)), 'hls')
+
+def parse_playlist(text):
+    """Returns [(start_seconds, duration_seconds, uri)] for the media segments of a VOD playlist."""
+    segments = []
+    start = 0.0
+    duration = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('#EXTINF:'):
+            duration = float(line[len('#EXTINF:'):].split(',')[0])
+        elif line and not line.startswith('#') and duration is not None:
+            segments.append((start, duration, line))
+            start += duration
+            duration = None
+    return segments
+
+def window_playlist(segments, start_secs, end_secs, uri_prefix=''):
+    """
+    Builds a VOD playlist of only the segments overlapping [start_secs, end_secs], starting
+    playback at start_secs. Segment URIs are unchanged, so every window shares cached segments.
+    """
+    window = [seg for seg in segments if seg[0] + seg[1] > start_secs and seg[0] < end_secs]
+    if not window:
+        return None
+
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:7',
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(duration for _, duration, _ in window))}",
+        '#EXT-X-PLAYLIST-TYPE:VOD',
+        '#EXT-X-INDEPENDENT-SEGMENTS',
+        f"#EXT-X-START:TIME-OFFSET={max(start_secs - window[0][0], 0):.3f},PRECISE=YES",
+        f'#EXT-X-MAP:URI="{uri_prefix}{INIT_NAME}"',
+    ]
+    for _, duration, uri in window:
+        lines.append(f"#EXTINF:{duration:.6f},")
+        lines.append(f"{uri_prefix}{uri}")
+    lines.append('#EXT-X-ENDLIST')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,221 @@
+import os
+import copy
+import math
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import (
+    ANALYSIS_WINDOW_MIN_SECS, ANALYSIS_WINDOW_SECS, ANALYSIS_WINDOW_OVERLAP_SECS, HLS_ENABLED, HLS_SEGMENT_SECS
+)
+from services.timecode import parse_time, format_time
+from services.media_index import media_index_path
+
+logger = logging.getLogger(__name__)
+
+GEMINI_PHASES = ('upload', 'processing', 'generation')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def link_or_copy(source, target):
+    """Hard-links `source` to `target` (no extra disk), copying across filesystems."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+    return target
+
+def job_source_dir(video_processor, project_id):
+    project_dir = os.path.join(video_processor.upload_folder, project_id)
+    os.makedirs(project_dir, exist_ok=True)
+    return project_dir
+
+def clamp_segments(segments, duration):
+    """Drops segments that start past the end of the video and clamps end times to its duration."""
+    if not duration:
+        return segments
+    clamped = []
+    for seg in segments:
+        if parse_time(seg.start_time) >= duration:
+            continue
+        if parse_time(seg.end_time) > duration:
+            seg = seg.model_copy(update={'end_time': format_time(math.floor(duration))})
+        clamped.append(seg)
+    return clamped
+
+class IngestPipeline:
+    """Runs the download/probe, proxy -> analysis -> thumbnails + embeddings -> index (-> package) stages for a job."""
+    def __init__(self, video_processor, ai_engine, storage_service, thumbnail_store):
+        self.video_processor = video_processor
+        self.ai_engine = ai_engine
+        self.storage_service = storage_service
+        self.thumbnail_store = thumbnail_store
+
+    def run(self, job, stage):
+        """
+        A generator handler for JobQueue: yields the Gemini analysis Future, so no worker is held
+        while Gemini works, and returns Gemini phase timings (upload, processing, generation) in seconds.
+
+        For a fresh URL the full-quality download runs in the background while a low-res
+        rendition is fetched and analyzed; thumbnails (from the proxy) and embeddings then run
+        side by side, so time-to-ready tracks the slowest stage rather than their sum.
+        """
+        project_id = job['project_id']
+        video_path = None
+        proxy_path = None
+        analysis_timings = {}
+
+        side = ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"ingest-{project_id[:8]}")
+        thumbnails = None
+        try:
+            # 1. Fetch the source (uploads are already on disk) and look up its analysis cache key
+            source = None # full-quality download + probe, running alongside the AI path
+            if job['kind'] == 'url':
+                with stage('resolve'):
+                    info, source_key, duplicate, video_path = self._resolve_url(project_id, job['source'])
+                if not video_path:
+                    source = side.submit(self._download_source, project_id, job['source'], info, stage)
+            else:
+                video_path = job['source']
+                project = self.storage_service.get_project(project_id) or {}
+                # Chunked uploads hash on the fly; legacy uploads are hashed here.
+                source_key = project.get('source_key') or self.ai_engine.analysis_key(f"sha256:{file_sha256(video_path)}")
+                duplicate = self.storage_service.find_analyzed_project(source_key, exclude_id=project_id)
+            self.storage_service.update_project_source(project_id, source_key)
+            if source is None:
+                source = side.submit(self._probe_source, project_id, video_path, stage)
+
+            # 2. Same source, prompt and models already indexed: reuse it instead of calling Gemini
+            if duplicate:
+                video_path = source.result()
+                with stage('index'):
+                    copied = self.storage_service.copy_segments(duplicate['id'], project_id)
+                if copied:
+                    logger.info(f"Reused analysis of project {duplicate['id']} for {project_id} ({copied} segments)")
+                    self._package(video_path, stage)
+                    return {}
+
+            # 3. Low-res proxy for AI: fetched directly for URLs still downloading, else transcoded
+            # from the source (an upload, or the file linked from a duplicate)
+            if job['kind'] == 'url' and not video_path and not source.done():
+                with stage('proxy') as progress:
+                    proxy_path = self.video_processor.download_ai_proxy(
+                        job['source'], job_source_dir(self.video_processor, project_id), copy.deepcopy(info),
+                        progress=progress
+                    )
+            if not proxy_path:
+                video_path = video_path or source.result()
+                with stage('proxy') as progress:
+                    proxy_path = self.video_processor.get_ai_proxy(video_path, progress)
+
+            # 4. Analyze using proxy (much faster upload)
+            with stage('analyze') as progress:
+                # One probe of the proxy serves the windowing, the time clamp and the thumbnails.
+                proxy_index = self.video_processor.media_index(proxy_path)
+                segments = yield from self._analyze(proxy_path, proxy_index, analysis_timings, progress)
+            # Segment times come from the analyzed file; the proxy has the source's length.
+            segments = clamp_segments(segments, proxy_index.duration)
+            if not segments:
+                raise RuntimeError("AI analysis yielded no segments")
+
+            # 5 + 6. Thumbnails at the start of each segment (small, so the proxy suffices)
+            # and embeddings of the descriptions, side by side
+            thumbnails = side.submit(self._thumbnails, proxy_path, segments, stage)
+            with stage('embed'):
+                embeddings = self.ai_engine.get_embeddings([seg.description for seg in segments])
+            thumbnails.result()
+
+            # 7. Index using the project ID once the full-quality source is in place for clips
+            video_path = source.result()
+            with stage('index'):
+                self.storage_service.add_segments(project_id, segments, embeddings, self.ai_engine.model_id)
+
+            # 8. Optionally package HLS segments so results play without a per-query clip
+            self._package(video_path, stage)
+            return {f"gemini_{phase}": seconds for phase, seconds in analysis_timings.items()}
+        except Exception:
+            self.storage_service.update_project_status(project_id, "failed", expected="processing")
+            raise
+        finally:
+            # Thumbnails read the proxy, so let them finish before it goes. A failed job does
+            # not wait for the full-quality download; it is left to finish in the background.
+            if thumbnails is not None:
+                wait([thumbnails])
+            side.shutdown(wait=False, cancel_futures=True)
+            if proxy_path and proxy_path != video_path and os.path.exists(proxy_path):
+                os.remove(proxy_path)
+                if os.path.exists(media_index_path(proxy_path)):
+                    os.remove(media_index_path(proxy_path))
+
+    def _download_source(self, project_id, url, info, stage):
+        with stage('download') as progress:
+            video_path = os.path.abspath(self.video_processor.download_video(
+                url, output_dir=job_source_dir(self.video_processor, project_id), info=info, progress=progress
+            ))
+        return self._probe_source(project_id, video_path, stage)
+
+    def _probe_source(self, project_id, video_path, stage):
+        self.storage_service.update_project_media(
+            project_id, name=os.path.basename(video_path), video_filename=video_path
+        )
+        # Keyframes, duration and codecs, probed once for clipping, thumbnails and time checks
+        with stage('probe'):
+            self.video_processor.media_index(video_path)
+        return video_path
+
+    def _thumbnails(self, video_path, segments, stage):
+        with stage('thumbnails') as progress:
+            thumbnails = self.video_processor.extract_thumbnails(video_path, [seg.start_time for seg in segments], progress)
+            for seg, thumbnail in zip(segments, thumbnails):
+                seg.thumbnail = self.thumbnail_store.put(thumbnail) if thumbnail else ""
+
+    def _package(self, video_path, stage):
+        if not HLS_ENABLED:
+            return
+        with stage('package') as progress:
+            try:
+                self.video_processor.package_hls(video_path, HLS_SEGMENT_SECS, progress)
+            except Exception as e:
+                # Optional: playback falls back to /clip.
+                logger.warning(f"HLS packaging of {video_path} failed: {e}")
+
+    def _analyze(self, proxy_path, proxy_index, timings, progress=None):
+        """
+        Analyzes short videos in one call; long ones as overlapping windows in parallel.
+        Yields the analysis Future and returns its segments.
+        Progress is the Gemini phase of a single call, or windows done.
+        """
+        if not ANALYSIS_WINDOW_MIN_SECS or proxy_index.duration <= ANALYSIS_WINDOW_MIN_SECS:
+            on_phase = (lambda phase: progress(GEMINI_PHASES.index(phase), len(GEMINI_PHASES), phase=phase)) if progress else None
+            return (yield self.ai_engine.analyze_video(proxy_path, timings, on_phase))
+
+        windows = self.video_processor.split_video(
+            proxy_path, ANALYSIS_WINDOW_SECS, ANALYSIS_WINDOW_OVERLAP_SECS, index=proxy_index
+        )
+        logger.info(f"Analyzing {proxy_path} as {len(windows)} windows")
+        try:
+            return (yield self.ai_engine.analyze_windows(windows, timings, progress))
+        finally:
+            for _, window_path in windows:
+                if os.path.exists(window_path):
+                    os.remove(window_path)
+
+    def _resolve_url(self, project_id, url):
+        """
+        Resolves the video id first so a duplicate can reuse the already-downloaded file.
+        Returns (info, source_key, duplicate_project_or_None, video_path_or_None).
+        """
+        info = self.video_processor.probe_url(url)
+        source_key = self.ai_engine.analysis_key(f"{info.get('extractor_key', 'url').lower()}:{info['id']}")
+        duplicate = self.storage_service.find_analyzed_project(source_key, exclude_id=project_id)
+
+        source_video = (duplicate or {}).get('video_filename')
+        if source_video and os.path.exists(source_video):
+            target = os.path.join(job_source_dir(self.video_processor, project_id), os.path.basename(source_video))
+            return info, source_key, duplicate, os.path.abspath(link_or_copy(source_video, target))
+        return info, source_key, duplicate, None
@@ -0,0 +1,355 @@
+import os
+import json
+import time
+import uuid
+import socket
+import inspect
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config import (DB_PATH, INGEST_WORKERS, STAGE_CONCURRENCY,
+                    JOB_HEARTBEAT_SECS, JOB_STALE_SECS, JOB_RETENTION_DAYS)
+from services.events import ProgressReporter
+from services.metrics import INGEST_STAGE_SECONDS, INGEST_STAGE_ACTIVE, INGEST_STAGE_WAITING
+from services.project_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    error TEXT,
+    timings TEXT NOT NULL DEFAULT '{}',
+    owner TEXT,
+    heartbeat_at REAL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+# Bookkeeping columns, not part of the job as the API reports it.
+INTERNAL_COLUMNS = ("owner", "heartbeat_at")
+
+class JobStore(SQLiteStore):
+    """
+    Ingest jobs in SQLite, shared by every worker process. A job is run by whichever
+    process claims it first (`claim` is a compare-and-set on status='queued').
+    """
+    def __init__(self, db_path, legacy_json_path=None):
+        super().__init__(db_path)
+        self._conn().executescript(SCHEMA)
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self._import_json(legacy_json_path)
+
+    def _import_json(self, json_path):
+        """One-time import of the legacy jobs.json; unfinished jobs are queued again."""
+        try:
+            with open(json_path, 'r') as f:
+                jobs = json.load(f)
+        except FileNotFoundError:
+            # Another process imported it first.
+            return
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (id, project_id, kind, source, status, stage, error, timings, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?, ?)",
+                [
+                    (job['id'], job['project_id'], job['kind'], job['source'],
+                     'queued' if job['status'] in ACTIVE_STATUSES else job['status'],
+                     job.get('error'), json.dumps(job.get('timings') or {}), job['created_at'], job['updated_at'])
+                    for job in jobs.values()
+                ]
+            )
+        try:
+            os.replace(json_path, f"{json_path}.imported")
+        except FileNotFoundError:
+            pass
+        logger.info(f"Imported {len(jobs)} jobs from {json_path}.")
+
+    @staticmethod
+    def _to_job(row):
+        job = {key: row[key] for key in row.keys() if key not in INTERNAL_COLUMNS}
+        job['timings'] = json.loads(job['timings'])
+        return job
+
+    def insert(self, job):
+        self._conn().execute(
+            "INSERT INTO jobs (id, project_id, kind, source, status, timings, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job['id'], job['project_id'], job['kind'], job['source'], job['status'],
+             json.dumps(job['timings']), job['created_at'], job['updated_at'])
+        )
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row else None
+
+    def queued_ids(self):
+        """Queued job ids, oldest first."""
+        rows = self._conn().execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")
+        return [row['id'] for row in rows]
+
+    def counts(self):
+        counts = dict.fromkeys(ACTIVE_STATUSES, 0)
+        rows = self._conn().execute(
+            "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN (?, ?) GROUP BY status", ACTIVE_STATUSES
+        )
+        counts.update((row['status'], row['n']) for row in rows)
+        return counts
+
+    def claim(self, job_id, owner):
+        """Atomically moves a queued job to running for `owner`; returns the job, or None if taken."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (owner, time.time(), datetime.now().isoformat(), job_id)
+        )
+        return self.get(job_id) if cursor.rowcount else None
+
+    def update(self, job_id, owner, **fields):
+        """Updates a job this owner still holds; returns whether it did."""
+        if 'timings' in fields:
+            fields['timings'] = json.dumps(fields['timings'])
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND owner = ?",
+            (*fields.values(), job_id, owner)
+        )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, owner):
+        self._conn().execute(
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (time.time(), owner)
+        )
+
+    def requeue_stale(self, stale_secs):
+        """Queues running jobs whose owner stopped heartbeating (its process died)."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', stage = NULL, owner = NULL, heartbeat_at = NULL "
+            "WHERE status = 'running' AND heartbeat_at < ?",
+            (time.time() - stale_secs,)
+        )
+        return cursor.rowcount
+
+    def prune(self, retention_days):
+        """Deletes finished jobs last updated more than `retention_days` ago."""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        cursor = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED_STATUSES, cutoff)
+        )
+        return cursor.rowcount
+
+def run_steps(steps):
+    """
+    Drives a generator handler in the calling thread: blocks on each Future it yields, sends
+    the result back in (or throws the Future's exception into it) and returns its value.
+    """
+    try:
+        future = next(steps)
+        while True:
+            try:
+                result = future.result()
+            except Exception as e:
+                future = steps.throw(e)
+            else:
+                future = steps.send(result)
+    except StopIteration as stop:
+        return stop.value
+
+class JobQueue:
+    """
+    Persistent ingest job queue drained by a bounded worker pool.
+
+    `handler(job, stage)` does the actual work; `stage(name)` is a context
+    manager that records progress and caps how many jobs run that stage at once
+    in this process. It yields a `progress(done, total)` callback for
+    finer-grained progress. Each job keeps per-stage wall times in `timings`,
+    plus any finer-grained timings the handler returns. A handler may be a
+    generator that yields concurrent.futures.Future objects (e.g. a Gemini
+    analysis): the job is suspended without holding a worker, and resumed on the
+    pool with the Future's result once it completes. With an `events` bus,
+    stage transitions, progress and the job outcome are published under the
+    job's project id.
+
+    Jobs live in a SQLite table shared by every worker process: any process can
+    report on any job, each job runs once (claimed atomically), running jobs of
+    a process that died are requeued once their heartbeat goes stale, and
+    finished jobs are pruned after JOB_RETENTION_DAYS.
+    """
+    def __init__(self, handler, workers=INGEST_WORKERS, events=None):
+        self.handler = handler
+        self.events = events
+        os.makedirs(DB_PATH, exist_ok=True)
+        self.store = JobStore(os.path.join(DB_PATH, 'projects.db'), legacy_json_path=os.path.join(DB_PATH, 'jobs.json'))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._scheduled = set()
+        self._stage_limits = {
+            name: threading.BoundedSemaphore(limit) for name, limit in STAGE_CONCURRENCY.items()
+        }
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ingest')
+        self._started = False
+
+    def start(self):
+        """Picks up queued jobs and starts the heartbeat/maintenance thread. Idempotent."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self._maintain()
+        threading.Thread(target=self._maintenance_loop, name='ingest-heartbeat', daemon=True).start()
+
+    def _maintenance_loop(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECS)
+            try:
+                self._maintain()
+            except Exception as e:
+                logger.error(f"Ingest job maintenance failed: {e}")
+
+    def _maintain(self):
+        self.store.heartbeat(self.owner)
+        requeued = self.store.requeue_stale(JOB_STALE_SECS)
+        if requeued:
+            logger.info(f"Requeued {requeued} ingest jobs left running by a stopped process")
+        for job_id in self.store.queued_ids():
+            self._schedule(job_id)
+        self.store.prune(JOB_RETENTION_DAYS)
+
+    def _schedule(self, job_id):
+        # Every process may schedule a queued job; the claim in `_run` decides who runs it.
+        with self._lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def submit(self, project_id, kind, source):
+        """Persists a new job and schedules it. Returns the job id."""
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        self.store.insert({
+            "id": job_id,
+            "project_id": project_id,
+            "kind": kind,
+            "source": source,
+            "status": "queued",
+            "timings": {},
+            "created_at": now,
+            "updated_at": now
+        })
+        self._schedule(job_id)
+        return job_id
+
+    def counts(self):
+        """Number of queued and running jobs (across all processes)."""
+        return self.store.counts()
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _update(self, job_id, **fields):
+        if not self.store.update(job_id, self.owner, **fields):
+            logger.warning(f"Ingest job {job_id} is no longer held by this process")
+
+    def _run(self, job_id):
+        try:
+            job = self.store.claim(job_id, self.owner)
+            if job:
+                logger.info(f"Running ingest job {job_id} ({job['kind']})")
+                self._execute(job)
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
+
+    def _execute(self, job):
+        job_id = job['id']
+        timings = {}
+
+        def publish(event, data):
+            if self.events:
+                self.events.publish(job['project_id'], event, data)
+
+        @contextmanager
+        def stage(name):
+            self._update(job_id, stage=name)
+            INGEST_STAGE_WAITING.labels(name).inc()
+            with self._stage_limits.get(name, nullcontext()):
+                INGEST_STAGE_WAITING.labels(name).dec()
+                INGEST_STAGE_ACTIVE.labels(name).inc()
+                started = time.monotonic()
+                publish('stage', {"stage": name, "state": "started"})
+                try:
+                    yield ProgressReporter(publish, name)
+                finally:
+                    elapsed = time.monotonic() - started
+                    INGEST_STAGE_ACTIVE.labels(name).dec()
+                    INGEST_STAGE_SECONDS.labels(name).observe(elapsed)
+                    timings[name] = round(timings.get(name, 0.0) + elapsed, 3)
+                    self._update(job_id, timings=dict(timings))
+                    publish('stage', {"stage": name, "state": "finished", "seconds": round(elapsed, 3)})
+
+        def finish(extra_timings=None, error=None):
+            try:
+                if error is not None:
+                    logger.error(f"Ingest job {job_id} failed: {error}")
+                    self._update(job_id, status="failed", error=str(error))
+                    publish('job', {"job_id": job_id, "status": "failed", "error": str(error)})
+                else:
+                    timings.update((name, round(seconds, 3)) for name, seconds in (extra_timings or {}).items())
+                    self._update(job_id, status="done", stage=None, timings=timings)
+                    publish('job', {"job_id": job_id, "status": "done", "timings": timings})
+            finally:
+                if self.events:
+                    # Finished: late subscribers read the project status instead.
+                    self.events.clear(job['project_id'])
+
+        publish('job', {"job_id": job_id, "status": "running"})
+        try:
+            outcome = self.handler(job, stage)
+        except Exception as e:
+            finish(error=e)
+            return
+        if inspect.isgenerator(outcome):
+            self._step(outcome, finish)
+        else:
+            finish(outcome)
+
+    def _step(self, steps, finish, future=None):
+        """
+        Runs a generator handler up to the next Future it yields (sending in the result of
+        `future`, or throwing its exception), then returns the worker to the pool. The
+        Future's completion schedules the following step.
+        """
+        try:
+            if future is None:
+                waiting = next(steps)
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    waiting = steps.throw(e)
+                else:
+                    waiting = steps.send(result)
+        except StopIteration as stop:
+            finish(stop.value)
+            return
+        except Exception as e:
+            finish(error=e)
+            return
+        waiting.add_done_callback(lambda done: self._executor.submit(self._step, steps, finish, done))
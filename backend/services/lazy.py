@@ -0,0 +1,35 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class LazyService:
+    """
+    Builds a service on first use, exactly once, even under concurrent requests.
+    A failed or disabled build yields None (callers already handle a missing service).
+    """
+    def __init__(self, name, factory, enabled=True):
+        self.name = name
+        self.factory = factory
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._built = False
+        self._instance = None
+
+    def get(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    if self.enabled:
+                        try:
+                            self._instance = self.factory()
+                        except Exception as e:
+                            logger.error(f"Failed to initialize {self.name}: {e}")
+                    else:
+                        logger.info(f"{self.name} is disabled on this worker")
+                    self._built = True
+        return self._instance
+
+    @property
+    def loaded(self):
+        return self._built and self._instance is not None
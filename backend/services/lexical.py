@@ -0,0 +1,136 @@
+import os
+import re
+import json
+import math
+import heapq
+import logging
+import threading
+from collections import Counter
+from services.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+
+def tokenize(text):
+    """
+    Lowercased word tokens. Joined tokens like part numbers ("XJ-9000", "v2.1") are kept
+    whole, without separators, and as their parts, so "xj-9000", "xj9000" and "9000" all match.
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        parts = re.split(r"[-./]", token)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+        tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 over a small document set, as an in-memory inverted index."""
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = []
+        self.lengths = []
+        self.postings = {}
+
+    def add(self, ids, texts):
+        for doc_id, text in zip(ids, texts):
+            doc = len(self.ids)
+            counts = Counter(tokenize(text))
+            self.ids.append(doc_id)
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc] = tf
+
+    def search(self, query, n):
+        """Returns up to n [(id, score)] with a positive score, best first."""
+        if not self.ids:
+            return []
+        avg_length = sum(self.lengths) / len(self.ids) or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.ids) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc] / avg_length)
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+        return [(self.ids[doc], score) for doc, score in best]
+
+    def to_dict(self):
+        # JSON object keys are strings; document numbers are restored on load.
+        return {"ids": self.ids, "lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls()
+        index.ids = data["ids"]
+        index.lengths = data["lengths"]
+        index.postings = {
+            term: {int(doc): tf for doc, tf in postings.items()}
+            for term, postings in data["postings"].items()
+        }
+        return index
+
+class LexicalStore:
+    """
+    One BM25 index per project, persisted as JSON under `root` and cached in memory.
+    Projects indexed before lexical search existed are built lazily on first query.
+    """
+    def __init__(self, root, cache_size=64):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._cache = LRUCache(cache_size)
+        self._lock = threading.Lock()
+
+    def _path(self, project_id):
+        return os.path.join(self.root, f"{project_id}.json")
+
+    def _load(self, project_id):
+        index = self._cache.get(project_id)
+        if index is None and os.path.exists(self._path(project_id)):
+            with open(self._path(project_id), 'r') as f:
+                index = BM25Index.from_dict(json.load(f))
+            self._cache.put(project_id, index)
+        return index
+
+    def _save(self, project_id, index):
+        tmp_path = f"{self._path(project_id)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(index.to_dict(), f)
+        os.replace(tmp_path, self._path(project_id))
+        self._cache.put(project_id, index)
+
+    def add(self, project_id, ids, texts):
+        with self._lock:
+            # Extend a copy: concurrent searches may be reading the cached index.
+            current = self._load(project_id)
+            index = BM25Index.from_dict(current.to_dict()) if current else BM25Index()
+            index.add(ids, texts)
+            self._save(project_id, index)
+
+    def search(self, project_id, query, n, loader=None):
+        """
+        Top n [(id, score)] for the project. If it has no index yet, `loader()` supplies
+        its (ids, texts) to build one.
+        """
+        index = self._load(project_id)
+        if index is None and loader is not None:
+            with self._lock:
+                index = self._load(project_id)
+                if index is None:
+                    ids, texts = loader()
+                    logger.info(f"Building lexical index for project {project_id} ({len(ids)} segments)")
+                    index = BM25Index()
+                    index.add(ids, texts)
+                    self._save(project_id, index)
+        return index.search(query, n) if index else []
+
+    def delete(self, project_id):
+        with self._lock:
+            self._cache.pop(project_id)
+            if os.path.exists(self._path(project_id)):
+                os.remove(self._path(project_id))
@@ -0,0 +1,129 @@
+import os
+import json
+import uuid
+import logging
+import subprocess
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Timestamps closer than this are the same frame.
+KEYFRAME_EPSILON = 0.001
+
+def media_index_path(video_path):
+    return f"{os.path.splitext(video_path)[0]}.index.npz"
+
+def _source_stamp(video_path):
+    stat = os.stat(video_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+class MediaIndex:
+    """
+    Keyframe timestamps and byte offsets, duration and stream parameters of one video,
+    probed once and persisted as a small .npz next to it so clipping, thumbnailing and
+    time validation never have to re-probe the container.
+    """
+    def __init__(self, keyframe_times, keyframe_positions, duration, streams):
+        self.keyframe_times = np.asarray(keyframe_times, dtype=np.float64)
+        self.keyframe_positions = np.asarray(keyframe_positions, dtype=np.int64)
+        self.duration = float(duration)
+        self.streams = streams
+
+    @classmethod
+    def build(cls, video_path):
+        """Probes the video: one pass over the video packet index plus the stream headers."""
+        packets = subprocess.run(
+            [
+                'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                '-show_entries', 'packet=pts_time,pos,flags', '-of', 'csv=p=0', video_path
+            ],
+            capture_output=True, text=True, check=True
+        )
+        keyframes = []
+        for line in packets.stdout.split():
+            pts_time, pos, flags = (line.split(',') + ['', ''])[:3]
+            if 'K' in flags and pts_time != 'N/A':
+                keyframes.append((float(pts_time), int(pos) if pos not in ('', 'N/A') else -1))
+        keyframes.sort()
+
+        probe = subprocess.run(
+            [
+                'ffprobe', '-v', 'error', '-show_entries',
+                'format=duration:stream=index,codec_type,codec_name,profile,width,height,pix_fmt,'
+                'r_frame_rate,sample_rate,channels,bit_rate',
+                '-of', 'json', video_path
+            ],
+            capture_output=True, text=True, check=True
+        )
+        info = json.loads(probe.stdout)
+        return cls(
+            [t for t, _ in keyframes],
+            [p for _, p in keyframes],
+            float(info.get('format', {}).get('duration') or 0),
+            info.get('streams', [])
+        )
+
+    def save(self, path, source_stamp):
+        # np.savez appends .npz to names without it, so the temp name keeps the suffix.
+        # Unique per writer: the ingest probe and other readers may build the same index at once.
+        tmp_path = f"{path[:-len('.npz')]}.{uuid.uuid4().hex[:8]}.tmp.npz"
+        np.savez(
+            tmp_path,
+            keyframe_times=self.keyframe_times,
+            keyframe_positions=self.keyframe_positions,
+            duration=np.float64(self.duration),
+            streams=np.array(json.dumps(self.streams)),
+            source=source_stamp
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, source_stamp=None):
+        """Returns the stored index, or None if it is missing, unreadable or for a different file."""
+        try:
+            with np.load(path) as data:
+                if source_stamp is not None and not np.array_equal(data['source'], source_stamp):
+                    return None
+                return cls(
+                    data['keyframe_times'],
+                    data['keyframe_positions'],
+                    float(data['duration']),
+                    json.loads(str(data['streams']))
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def for_video(cls, video_path):
+        """Loads the persisted index, (re)building it if absent or stale."""
+        path = media_index_path(video_path)
+        stamp = _source_stamp(video_path)
+        index = cls.load(path, stamp)
+        if index is None:
+            logger.info(f"Building media index for {video_path}")
+            index = cls.build(video_path)
+            index.save(path, stamp)
+        return index
+
+    def codecs(self):
+        """{'video': codec, 'audio': codec} of the first stream of each type (None if absent)."""
+        codecs = {'video': None, 'audio': None}
+        for stream in self.streams:
+            codec_type = stream.get('codec_type')
+            if codec_type in codecs and codecs[codec_type] is None:
+                codecs[codec_type] = stream.get('codec_name')
+        return codecs
+
+    def stream(self, codec_type):
+        """Probed parameters of the first stream of `codec_type` ({} if absent)."""
+        return next((s for s in self.streams if s.get('codec_type') == codec_type), {})
+
+    def keyframe_before(self, seconds):
+        """Timestamp of the last keyframe at or before `seconds` (0.0 if there is none)."""
+        i = np.searchsorted(self.keyframe_times, seconds + KEYFRAME_EPSILON, side='right')
+        return float(self.keyframe_times[i - 1]) if i else 0.0
+
+    def keyframe_after(self, seconds):
+        """Timestamp of the first keyframe strictly after `seconds`, or None."""
+        i = np.searchsorted(self.keyframe_times, seconds + KEYFRAME_EPSILON, side='right')
+        return float(self.keyframe_times[i]) if i < len(self.keyframe_times) else None
@@ -0,0 +1,222 @@
+"""
+Prometheus-style metrics for the hot paths (ingest stages, Gemini phases, queries, clips),
+rendered in the text exposition format on /metrics.
+
+With METRICS_ENABLED off every metric is a shared no-op object, so instrumented code pays one
+method call and nothing else. Values that already live elsewhere (cache statistics, job counts)
+are read by callbacks at scrape time instead of being counted on the hot path.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from config import METRICS_ENABLED
+
+# Seconds: sub-millisecond cache hits up to half-hour Gemini analyses.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class _Gauge(_Counter):
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+class _Histogram:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+class Metric:
+    """A named family of counters, gauges or histograms, one per combination of label values."""
+    def __init__(self, kind, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        if self.kind == 'histogram':
+            return _Histogram(self.buckets)
+        return _Gauge() if self.kind == 'gauge' else _Counter()
+
+    # Unlabeled metrics can be used directly.
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in sorted(children):
+            if self.kind != 'histogram':
+                yield self.name, _labels(self.labelnames, values), child.value
+                continue
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _labels(self.labelnames, values, [('le', _number(bound))]), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, values), total
+            yield f"{self.name}_count", _labels(self.labelnames, values), cumulative
+
+class CallbackMetric:
+    """A gauge or counter read at scrape time: `read()` returns a value or {label values: value}."""
+    def __init__(self, kind, name, help_text, read, labelnames=()):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        values = self.read()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            yield self.name, _labels(self.labelnames, key), value
+
+class _Noop:
+    """Stands in for every metric when metrics are disabled."""
+    def labels(self, *values):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return nullcontext()
+
+NOOP = _Noop()
+
+class Registry:
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            # Idempotent, so re-importing instrumented modules reuses the same series.
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Metric('counter', name, help_text, labelnames)) if self.enabled else NOOP
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Metric('gauge', name, help_text, labelnames)) if self.enabled else NOOP
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Metric('histogram', name, help_text, labelnames, buckets)) if self.enabled else NOOP
+
+    def callback(self, kind, name, help_text, read, labelnames=()):
+        if self.enabled:
+            self._register(CallbackMetric(kind, name, help_text, read, labelnames))
+
+    def render(self):
+        """The Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                # A failing callback must not take the other metrics down with it.
+                lines.append(f"# {metric.name} unavailable: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+# Hot-path metrics shared across modules.
+INGEST_STAGE_SECONDS = registry.histogram(
+    'ingest_stage_seconds', 'Wall time of each ingest pipeline stage.', ['stage'])
+INGEST_STAGE_ACTIVE = registry.gauge(
+    'ingest_stage_active', 'Jobs currently inside each ingest stage.', ['stage'])
+INGEST_STAGE_WAITING = registry.gauge(
+    'ingest_stage_waiting', 'Jobs waiting for a free slot of each ingest stage.', ['stage'])
+GEMINI_PHASE_SECONDS = registry.histogram(
+    'gemini_phase_seconds', 'Gemini upload, server-side processing and generation time per analysis.', ['phase'])
+QUERY_STAGE_SECONDS = registry.histogram(
+    'query_stage_seconds', 'Query latency by part: lookup (project metadata), embed, search and rerank.', ['endpoint', 'stage'])
+CLIP_ENCODE_SECONDS = registry.histogram(
+    'clip_encode_seconds', 'Time to produce a clip on a cache miss, by mode.', ['mode'])
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'HTTP request latency by endpoint and status code.', ['endpoint', 'status'])
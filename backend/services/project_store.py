@@ -0,0 +1,166 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    video_filename TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_projects_status ON projects (status);
+CREATE INDEX IF NOT EXISTS idx_projects_created_at ON projects (created_at);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Columns added after the first release, applied to existing databases on startup.
+COLUMNS = {
+    "source_key": "TEXT",
+    "collection": "TEXT",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_projects_source_key ON projects (source_key, status);
+"""
+
+class SQLiteStore:
+    """A SQLite database (WAL mode) shared by threads and processes, one connection per thread."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self):
+        # One connection per thread; WAL lets readers proceed while a writer commits.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+class ProjectStore(SQLiteStore):
+    """
+    Project metadata in SQLite (WAL mode): indexed lookups by id, status and created_at,
+    with row-level updates instead of rewriting a whole JSON file.
+    """
+    def __init__(self, db_path, legacy_json_path=None):
+        super().__init__(db_path)
+        self._migrate()
+        if legacy_json_path and os.path.exists(legacy_json_path):
+            self._import_json(legacy_json_path)
+
+    def _migrate(self):
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        existing = {row['name'] for row in conn.execute("PRAGMA table_info(projects)")}
+        for column, column_type in COLUMNS.items():
+            if column not in existing:
+                conn.execute(f"ALTER TABLE projects ADD COLUMN {column} {column_type}")
+        conn.executescript(INDEXES)
+
+    def _import_json(self, json_path):
+        """One-time import of the legacy projects.json; the file is renamed afterwards."""
+        try:
+            with open(json_path, 'r') as f:
+                projects = json.load(f)
+        except FileNotFoundError:
+            # Another process imported it first.
+            return
+
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO projects (id, name, status, created_at, video_filename) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (p['id'], p.get('name', ''), p.get('status', 'ready'), p['created_at'], p.get('video_filename') or '')
+                    for p in projects.values()
+                ]
+            )
+        try:
+            os.replace(json_path, f"{json_path}.imported")
+        except FileNotFoundError:
+            pass
+        logger.info(f"Imported {len(projects)} projects from {json_path}.")
+
+    def create(self, project):
+        self._conn().execute(
+            "INSERT INTO projects (id, name, status, created_at, video_filename) VALUES (?, ?, ?, ?, ?)",
+            (project['id'], project['name'], project['status'], project['created_at'], project['video_filename'])
+        )
+
+    def get(self, project_id):
+        row = self._conn().execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self, limit=None, offset=0, status=None):
+        """Returns projects newest first, optionally filtered by status and paginated."""
+        sql = "SELECT * FROM projects"
+        params = []
+        if status:
+            sql += " WHERE status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([limit if limit is not None else -1, offset])
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    def find_by_source_key(self, source_key, status="ready", exclude_id=None):
+        """Returns the oldest project with this source key and status (other than `exclude_id`)."""
+        row = self._conn().execute(
+            "SELECT * FROM projects WHERE source_key = ? AND status = ? AND id != ? ORDER BY created_at LIMIT 1",
+            (source_key, status, exclude_id or '')
+        ).fetchone()
+        return dict(row) if row else None
+
+    def count(self, status=None):
+        if status:
+            return self._conn().execute("SELECT COUNT(*) FROM projects WHERE status = ?", (status,)).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+
+    def update(self, project_id, **fields):
+        if not fields:
+            return False
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        cursor = self._conn().execute(
+            f"UPDATE projects SET {assignments} WHERE id = ?",
+            (*fields.values(), project_id)
+        )
+        return cursor.rowcount > 0
+
+    def set_status(self, project_id, status, expected=None):
+        """
+        Atomically sets the status. With `expected`, only transitions from that status
+        (compare-and-set); returns whether the row changed.
+        """
+        if expected is None:
+            return self.update(project_id, status=status)
+        cursor = self._conn().execute(
+            "UPDATE projects SET status = ? WHERE id = ? AND status = ?",
+            (status, project_id, expected)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, project_id):
+        cursor = self._conn().execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        return cursor.rowcount > 0
+
+    def get_setting(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else default
+
+    def set_setting(self, key, value):
+        self._conn().execute(
+            "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
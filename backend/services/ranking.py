@@ -0,0 +1,93 @@
+import numpy as np
+from services.timecode import parse_time, format_time
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuses ranked id lists given as [(ids_best_first, weight)]: each id scores
+    sum(weight / (k + rank)). Returns [(id, fused_score)], best first.
+    """
+    scores = {}
+    for ids, weight in rankings:
+        for rank, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def relevance(result):
+    """What a result is ranked by: its retrieval's fused (RRF) score if it has one, else cosine similarity."""
+    return result.get('relevance', result['score'])
+
+def merge_adjacent(results, gap=0.0):
+    """
+    Merges results of the same project whose time ranges overlap or are at most `gap` seconds
+    apart into one result spanning them. The most relevant member supplies description, score,
+    thumbnail and embedding; keywords are combined. One sort plus a sweep: O(k log k).
+    """
+    spans = sorted(
+        ((result.get('project_id') or '', parse_time(result['start_time']), parse_time(result['end_time']), i)
+         for i, result in enumerate(results))
+    )
+
+    groups = []
+    for project_id, start, end, i in spans:
+        last = groups[-1] if groups else None
+        if last and last[0] == project_id and start <= last[2] + gap:
+            last[2] = max(last[2], end)
+            last[3].append(results[i])
+        else:
+            groups.append([project_id, start, end, [results[i]]])
+
+    merged = []
+    for _, start, end, members in groups:
+        if len(members) == 1:
+            merged.append(members[0])
+            continue
+        best = max(members, key=relevance)
+        keywords = list(dict.fromkeys(kw for member in members for kw in member.get('keywords', []) if kw))
+        merged.append(dict(
+            best,
+            start_time=format_time(start),
+            end_time=format_time(end),
+            keywords=keywords,
+            segment_ids=[member['id'] for member in members]
+        ))
+    return merged
+
+def mmr(results, k, diversity=0.7):
+    """
+    Maximal marginal relevance: picks k results trading relevance (see `relevance`) against
+    embedding similarity to those already picked. `diversity` is the relevance weight; 1.0 is
+    plain ranking by relevance.
+    """
+    if diversity >= 1 or len(results) <= 1 or any(result.get('embedding') is None for result in results):
+        return sorted(results, key=relevance, reverse=True)[:k]
+
+    embeddings = np.asarray([result['embedding'] for result in results], dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+    scores = np.asarray([relevance(result) for result in results], dtype=np.float32)
+    # Scaled to [0, 1] so fused (RRF) and cosine scores trade off against similarity alike.
+    spread = scores.max() - scores.min()
+    scores = (scores - scores.min()) / spread if spread else np.ones_like(scores)
+
+    picked = []
+    redundancy = np.zeros(len(results), dtype=np.float32)
+    available = np.ones(len(results), dtype=bool)
+    for _ in range(min(k, len(results))):
+        gain = np.where(available, diversity * scores - (1 - diversity) * redundancy, -np.inf)
+        best = int(np.argmax(gain))
+        picked.append(results[best])
+        available[best] = False
+        similarity = embeddings @ embeddings[best]
+        redundancy = similarity if len(picked) == 1 else np.maximum(redundancy, similarity)
+    return picked
+
+def rerank(results, top_k, min_score=None, merge_gap=0.0, diversity=1.0):
+    """
+    Post-retrieval stage: drops results whose cosine score is under `min_score` (in every mode;
+    None keeps all, so lexical hits far from the query's embedding survive by default), merges
+    neighbouring segments, then selects `top_k` with MMR.
+    Embeddings and relevance used for re-ranking are stripped from the output.
+    """
+    if min_score is not None:
+        results = [result for result in results if result['score'] >= min_score]
+    results = mmr(merge_adjacent(results, gap=merge_gap), top_k, diversity=diversity)
+    return [{key: value for key, value in result.items() if key not in ('embedding', 'relevance')} for result in results]
@@ -0,0 +1,90 @@
+"""
+Re-embeds indexed projects after EMBEDDING_MODEL_NAME changes, project by project in throttled
+batches. Each project switches to its new index once complete; until then queries use the old
+one with the old model. Library search switches when every project is done.
+
+Runs in the background after startup (REEMBED_ON_START), or by hand:
+
+    python -m services.reembed
+"""
+import os
+import fcntl
+import logging
+import threading
+from config import DB_PATH, REEMBED_BATCH_SIZE, REEMBED_PAUSE_SECS
+
+logger = logging.getLogger(__name__)
+
+LOCK_PATH = os.path.join(DB_PATH, 'reembed.lock')
+
+class ReembedMigration:
+    def __init__(self, storage_service, ai_engine, batch_size=REEMBED_BATCH_SIZE, pause=REEMBED_PAUSE_SECS):
+        self.storage_service = storage_service
+        self.ai_engine = ai_engine
+        self.batch_size = batch_size
+        self.pause = pause
+        self._lock = threading.Lock()
+        self.progress = {"state": "idle", "model": ai_engine.model_id, "projects_done": 0, "projects_total": 0,
+                         "segments": 0, "failed": 0}
+
+    def _update(self, **fields):
+        with self._lock:
+            self.progress.update(fields)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.progress)
+
+    def run(self):
+        """Migrates every stale project. Returns False if another process is already migrating."""
+        # One migrator across web workers; the others keep serving queries.
+        with open(LOCK_PATH, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._update(state="running elsewhere")
+                return False
+            self._migrate()
+            return True
+
+    def _migrate(self):
+        model_id = self.ai_engine.model_id
+        stale = [
+            project['id'] for project in self.storage_service.list_projects()
+            if self.storage_service.project_model(project['id']) != model_id
+        ]
+        self._update(state="running", projects_total=len(stale))
+        if stale:
+            logger.info(f"Re-embedding {len(stale)} projects with {model_id}...")
+
+        segments = failed = 0
+        for done, project_id in enumerate(stale, 1):
+            try:
+                segments += self.storage_service.reembed_project(
+                    project_id, self.ai_engine.get_embeddings, model_id, self.ai_engine.dimension,
+                    batch_size=self.batch_size, pause=self.pause
+                ) or 0
+            except Exception as e:
+                # Left on the old index; its checkpoint lets the next run resume.
+                failed += 1
+                logger.error(f"Re-embedding project {project_id} failed: {e}")
+            self._update(projects_done=done, segments=segments, failed=failed)
+
+        if not failed:
+            self.storage_service.switch_library(model_id)
+        self._update(state="done" if not failed else "incomplete")
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    from services.storage import StorageService
+    from services.ai_engine import AIEngine
+    migration = ReembedMigration(StorageService(), AIEngine())
+    if not migration.run():
+        print("Another process is already re-embedding.")
+    print(migration.stats())
+
+if __name__ == '__main__':
+    main()
@@ -1,99 +1,212 @@
-import chromadb
+import base64
+import hashlib
 import logging
 import uuid
-import json
+import threading
 import os
+import time
+import numpy as np
 from datetime import datetime
-from config import DB_PATH
+from config import (
+    DB_PATH, QUERY_MODES, HYBRID_VECTOR_WEIGHT, HYBRID_LEXICAL_WEIGHT, HYBRID_CANDIDATES, RRF_K,
+    EMBEDDING_MODEL_NAME, EMBEDDING_LEGACY_MODEL
+)
+from services.project_store import ProjectStore
+from services.lexical import LexicalStore
+from services.ranking import reciprocal_rank_fusion
+
+LIBRARY_COLLECTION = "video_library"
+LIBRARY_SETTING = "library_collection"
+RESULT_FIELDS = ['documents', 'metadatas', 'distances']
 
 logger = logging.getLogger(__name__)
 
-class StorageService:
-    def __init__(self):
-        self.client = chromadb.PersistentClient(path=DB_PATH)
-        self.metadata_file = os.path.join(DB_PATH, 'projects.json')
-        self._ensure_metadata_file()
+def _not_found_error():
+    # chromadb >= 0.6 raises NotFoundError for missing collections, older versions ValueError.
+    from chromadb.errors import NotFoundError
+    return NotFoundError
+
+def model_key(model_id):
+    """Short, collection-name-safe tag for an embedding model id."""
+    return hashlib.sha1(model_id.encode('utf-8')).hexdigest()[:10]
+
+def collection_model(collection):
+    """The embedding model that built a collection; untagged ones predate model tracking."""
+    return (collection.metadata or {}).get('embedding_model', EMBEDDING_LEGACY_MODEL)
 
-    def _ensure_metadata_file(self):
-        if not os.path.exists(self.metadata_file):
-            with open(self.metadata_file, 'w') as f:
-                json.dump({}, f)
+def collection_metadata(model_id, dimension=None):
+    metadata = {"hnsw:space": "cosine", "embedding_model": model_id}
+    if dimension:
+        metadata["embedding_dimension"] = int(dimension)
+    return metadata
 
-    def _load_projects(self):
-        with open(self.metadata_file, 'r') as f:
-            return json.load(f)
+def lexical_text(document, metadata):
+    """What lexical search matches on: the description plus the key elements."""
+    return f"{document} {metadata.get('key_elements', '')}"
+
+def thumbnail_url(thumbnail):
+    """Maps a stored thumbnail hash to its URL; legacy inline data URIs pass through."""
+    if not thumbnail or thumbnail.startswith('data:'):
+        return thumbnail
+    return f"/thumbnails/{thumbnail}"
+
+class StorageService:
+    def __init__(self):
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.projects = ProjectStore(
+            os.path.join(DB_PATH, 'projects.db'),
+            legacy_json_path=os.path.join(DB_PATH, 'projects.json')
+        )
+        self.lexical = LexicalStore(os.path.join(DB_PATH, 'lexical'))
 
-    def _save_projects(self, projects):
-        with open(self.metadata_file, 'w') as f:
-            json.dump(projects, f, indent=4)
+    @property
+    def client(self):
+        """The ChromaDB client, opened on first use: project metadata alone never imports chromadb."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import chromadb
+                    self._client = chromadb.PersistentClient(path=DB_PATH)
+        return self._client
 
-    def create_project(self, name, video_filename=""):
+    def create_project(self, name, video_filename="", status="processing"):
         """Creates a new project entry."""
         project_id = str(uuid.uuid4())
-        projects = self._load_projects()
-
-        projects[project_id] = {
+        self.projects.create({
             "id": project_id,
             "name": name,
-            "status": "processing",
+            "status": status,
             "created_at": datetime.now().isoformat(),
             "video_filename": video_filename
-        }
-        self._save_projects(projects)
+        })
         return project_id
 
     def update_project_media(self, project_id, name=None, video_filename=None):
-        projects = self._load_projects()
-        if project_id not in projects:
-            return
-
+        fields = {}
         if name is not None:
-            projects[project_id]["name"] = name
+            fields["name"] = name
         if video_filename is not None:
-            projects[project_id]["video_filename"] = video_filename
+            fields["video_filename"] = video_filename
+        self.projects.update(project_id, **fields)
+
+    def update_project_source(self, project_id, source_key):
+        """Records the analysis cache key (source content + prompt + model versions) of a project."""
+        self.projects.update(project_id, source_key=source_key)
 
-        self._save_projects(projects)
+    def find_analyzed_project(self, source_key, exclude_id=None):
+        """Returns a ready project that was analyzed from the same source with the same models."""
+        return self.projects.find_by_source_key(source_key, exclude_id=exclude_id)
 
-    def update_project_status(self, project_id, status):
-        projects = self._load_projects()
-        if project_id in projects:
-            projects[project_id]["status"] = status
-            self._save_projects(projects)
+    def update_project_status(self, project_id, status, expected=None):
+        """Sets the status; with `expected`, only if the current status matches. Returns whether it changed."""
+        return self.projects.set_status(project_id, status, expected=expected)
 
-    def list_projects(self):
-        projects = self._load_projects()
+    def list_projects(self, limit=None, offset=0, status=None):
         # Return list sorted by date desc
-        return sorted(projects.values(), key=lambda x: x['created_at'], reverse=True)
+        return self.projects.list(limit=limit, offset=offset, status=status)
+
+    def count_projects(self, status=None):
+        return self.projects.count(status=status)
 
     def get_project(self, project_id):
-        projects = self._load_projects()
-        return projects.get(project_id)
+        return self.projects.get(project_id)
 
     def delete_project(self, project_id):
-        projects = self._load_projects()
-        if project_id in projects:
-            del projects[project_id]
-            self._save_projects(projects)
-            try:
-                self.client.delete_collection(f"video_{project_id}")
-            except ValueError:
-                pass # Collection might not exist
-
-    def _get_collection(self, project_id):
-        return self.client.get_or_create_collection(
-            name=f"video_{project_id}",
-            metadata={"hnsw:space": "cosine"}
+        project = self.get_project(project_id)
+        if project and self.projects.delete(project_id):
+            # The active collection, the legacy name, and a re-embedding target in progress.
+            for name in {self._collection_name(project), f"video_{project_id}", self._model_collection_name(project_id)}:
+                self._delete_collection(name)
+            self._delete_from_libraries(project_id)
+            self.lexical.delete(project_id)
+
+    def _delete_collection(self, name):
+        try:
+            self.client.delete_collection(name)
+        except (ValueError, _not_found_error()):
+            pass # Collection might not exist
+
+    def _open_collection(self, name):
+        try:
+            return self.client.get_collection(name)
+        except (ValueError, _not_found_error()):
+            return None
+
+    def _collection_name(self, project):
+        # The pointer is switched in one row update once a re-embedded collection is complete.
+        return project.get('collection') or f"video_{project['id']}"
+
+    def _model_collection_name(self, project_id, model_id=EMBEDDING_MODEL_NAME):
+        return f"video_{project_id}_{model_key(model_id)}"
+
+    def _get_collection(self, project_id, model_id, dimension=None):
+        """The project's collection for `model_id`: the active one if that model built it, else a new active one."""
+        active = self._find_collection(project_id)
+        if active is not None and collection_model(active) == model_id:
+            return active
+        collection = self.client.get_or_create_collection(
+            name=self._model_collection_name(project_id, model_id),
+            metadata=collection_metadata(model_id, dimension)
+        )
+        self.projects.update(project_id, collection=collection.name)
+        return collection
+
+    def _find_collection(self, project_id):
+        """Returns the project's active collection, or None if it was never created."""
+        project = self.get_project(project_id)
+        return self._open_collection(self._collection_name(project)) if project else None
+
+    def project_model(self, project_id):
+        """Embedding model of the project's active index; queries must be embedded with it."""
+        collection = self._find_collection(project_id)
+        return collection_model(collection) if collection is not None else EMBEDDING_MODEL_NAME
+
+    def _find_library(self):
+        """The library collection queries use, or None before anything was indexed."""
+        return self._open_collection(self.projects.get_setting(LIBRARY_SETTING, LIBRARY_COLLECTION))
+
+    def library_model(self):
+        library = self._find_library()
+        return collection_model(library) if library is not None else EMBEDDING_MODEL_NAME
+
+    def _library_for(self, model_id, dimension=None):
+        """
+        Shared collection holding every project's segments, tagged with project_id, for vectors
+        of `model_id`: the active library if that model built it, else the one a re-embed fills.
+        """
+        active = self._find_library()
+        if active is not None and collection_model(active) == model_id:
+            return active
+        name = f"{LIBRARY_COLLECTION}_{model_key(model_id)}" if active is not None else \
+            self.projects.get_setting(LIBRARY_SETTING, LIBRARY_COLLECTION)
+        return self.client.get_or_create_collection(name=name, metadata=collection_metadata(model_id, dimension))
+
+    def _delete_from_libraries(self, project_id):
+        for name in {self.projects.get_setting(LIBRARY_SETTING, LIBRARY_COLLECTION),
+                     f"{LIBRARY_COLLECTION}_{model_key(EMBEDDING_MODEL_NAME)}"}:
+            library = self._open_collection(name)
+            if library is not None:
+                library.delete(where={"project_id": project_id})
+
+    def _add_to_library(self, project_id, ids, embeddings, documents, metadatas, model_id):
+        project = self.get_project(project_id) or {}
+        created_at = project.get('created_at')
+        created_ts = datetime.fromisoformat(created_at).timestamp() if created_at else 0.0
+        self._library_for(model_id, len(embeddings[0])).upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=[{**meta, "project_id": project_id, "created_ts": created_ts} for meta in metadatas]
         )
 
-    def add_segments(self, project_id, segments, embeddings):
+    def add_segments(self, project_id, segments, embeddings, model_id=EMBEDDING_MODEL_NAME):
         """
-        Adds video segments and their embeddings to the project's collection.
+        Adds video segments and their embeddings (made by `model_id`) to the project's collection.
         """
         if not segments:
             return
 
-        collection = self._get_collection(project_id)
-
         ids = [str(uuid.uuid4()) for _ in segments]
         documents = [seg.description for seg in segments]
         metadatas = [
@@ -105,42 +218,262 @@ class StorageService:
             }
             for seg in segments
         ]
+        self._index(project_id, ids, embeddings, documents, metadatas, model_id)
+
+    def copy_segments(self, source_project_id, project_id):
+        """
+        Indexes another project's segments and embeddings under `project_id` (analysis cache hit).
+        Returns the number of segments copied.
+        """
+        source = self._find_collection(source_project_id)
+        if source is None:
+            return 0
 
-        collection.add(
+        records = source.get(include=['embeddings', 'documents', 'metadatas'])
+        if not records['ids']:
+            return 0
+
+        ids = [str(uuid.uuid4()) for _ in records['ids']]
+        self._index(
+            project_id, ids, records['embeddings'], records['documents'], records['metadatas'], collection_model(source)
+        )
+        return len(ids)
+
+    def _index(self, project_id, ids, embeddings, documents, metadatas, model_id):
+        self._get_collection(project_id, model_id, len(embeddings[0])).add(
             ids=ids,
             embeddings=embeddings,
             documents=documents,
             metadatas=metadatas
         )
-        logger.info(f"Added {len(segments)} segments to project {project_id}.")
-        self.update_project_status(project_id, "ready")
+        self._add_to_library(project_id, ids, embeddings, documents, metadatas, model_id)
+        self.lexical.add(project_id, ids, [lexical_text(doc, meta) for doc, meta in zip(documents, metadatas)])
+        logger.info(f"Added {len(ids)} segments to project {project_id}.")
+        self.update_project_status(project_id, "ready", expected="processing")
 
-    def query(self, project_id, query_embedding, n_results=5):
+    def query(self, project_id, query_embedding, n_results=5, query_text=None, mode='vector', weights=None,
+              with_embeddings=False):
         """
-        Queries the project's collection.
+        Queries the project's collection. `mode` is 'vector' (cosine similarity), 'lexical'
+        (BM25 over descriptions and key elements) or 'hybrid' (both, reciprocal rank fusion
+        with `weights` {'vector': w, 'lexical': w}). Scores are cosine similarity in every mode;
+        lexical and hybrid results also carry their fused 'relevance' (RRF score), which is what
+        they are ranked by. With `with_embeddings`, each result carries its 'embedding' for re-ranking.
         """
-        try:
-            collection = self.client.get_collection(f"video_{project_id}")
-        except ValueError:
+        collection = self._find_collection(project_id)
+        if collection is None:
+            return []
+
+        if mode == 'vector' or not query_text:
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=RESULT_FIELDS + (['embeddings'] if with_embeddings else [])
+            )
+            return self._format_results(results, project_id=project_id)
+
+        weights = weights or {}
+        candidates = max(n_results, HYBRID_CANDIDATES)
+        lexical_hits = self.lexical.search(
+            project_id, query_text, candidates,
+            loader=lambda: self._lexical_documents(collection)
+        )
+        rankings = [([doc_id for doc_id, _ in lexical_hits], weights.get('lexical', HYBRID_LEXICAL_WEIGHT))]
+        if mode == 'hybrid':
+            vector_hits = collection.query(query_embeddings=[query_embedding], n_results=candidates, include=[])
+            rankings.append((vector_hits['ids'][0], weights.get('vector', HYBRID_VECTOR_WEIGHT)))
+
+        fused = dict(reciprocal_rank_fusion(rankings, k=RRF_K)[:n_results])
+        results = self._format_records(collection, list(fused), query_embedding, project_id, with_embeddings)
+        for result in results:
+            result['relevance'] = fused[result['id']]
+        return results
+
+    def _lexical_documents(self, collection):
+        records = collection.get(include=['documents', 'metadatas'])
+        texts = [lexical_text(doc, meta) for doc, meta in zip(records['documents'], records['metadatas'])]
+        return records['ids'], texts
+
+    def _format_records(self, collection, ids, query_embedding, project_id, with_embeddings=False):
+        """Formats the given segment ids in order, scored by cosine similarity to the query."""
+        if not ids:
             return []
+        records = collection.get(ids=ids, include=['embeddings', 'documents', 'metadatas'])
+        position = {doc_id: i for i, doc_id in enumerate(records['ids'])}
+        order = [position[doc_id] for doc_id in ids if doc_id in position]
+
+        embeddings = np.asarray(records['embeddings'], dtype=np.float32)[order]
+        query = np.asarray(query_embedding, dtype=np.float32)
+        similarity = embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query) + 1e-12)
+
+        results = {
+            'ids': [[records['ids'][i] for i in order]],
+            'documents': [[records['documents'][i] for i in order]],
+            'metadatas': [[records['metadatas'][i] for i in order]],
+            'distances': [(1 - similarity).tolist()],
+            'embeddings': [embeddings] if with_embeddings else None
+        }
+        return self._format_results(results, project_id=project_id)
+
+    def query_library(self, query_embedding, n_results=5, project_ids=None, created_after=None, created_before=None,
+                      with_embeddings=False):
+        """
+        Queries every project at once through the shared library collection.
+        Optionally restricted to a subset of projects and/or a created_at range (datetimes).
+        """
+        filters = []
+        if project_ids:
+            filters.append({"project_id": {"$in": list(project_ids)}})
+        if created_after:
+            filters.append({"created_ts": {"$gte": created_after.timestamp()}})
+        if created_before:
+            filters.append({"created_ts": {"$lte": created_before.timestamp()}})
+
+        where = None
+        if len(filters) == 1:
+            where = filters[0]
+        elif filters:
+            where = {"$and": filters}
 
-        results = collection.query(
+        library = self._find_library()
+        if library is None:
+            return []
+        results = library.query(
             query_embeddings=[query_embedding],
-            n_results=n_results
+            n_results=n_results,
+            where=where,
+            include=RESULT_FIELDS + (['embeddings'] if with_embeddings else [])
         )
+        return self._format_results(results)
 
+    def _format_results(self, results, index=0, project_id=None):
         formatted_results = []
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i in range(len(results['ids'][0])):
-                meta = results['metadatas'][0][i]
+        if results['ids'] and len(results['ids'][index]) > 0:
+            for i in range(len(results['ids'][index])):
+                meta = results['metadatas'][index][i]
                 formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'description': results['documents'][0][i],
+                    'id': results['ids'][index][i],
+                    'project_id': project_id or meta.get('project_id'),
+                    'description': results['documents'][index][i],
                     'start_time': meta['start_time'],
                     'end_time': meta['end_time'],
                     'keywords': meta.get('key_elements', '').split(', '),
-                    'thumbnail': meta.get('thumbnail', ''),
-                    'score': 1 - results['distances'][0][i] if 'distances' in results else 0
+                    'thumbnail': thumbnail_url(meta.get('thumbnail', '')),
+                    'score': 1 - results['distances'][index][i] if 'distances' in results else 0
                 })
+                if results.get('embeddings') is not None:
+                    formatted_results[-1]['embedding'] = results['embeddings'][index][i]
 
         return formatted_results
+
+    def migrate_thumbnails(self, thumbnail_store):
+        """
+        Moves inline base64 thumbnails from existing collections into the thumbnail store,
+        leaving only the content hash in metadata. Safe to re-run.
+        """
+        migrated = 0
+        for project in self.list_projects():
+            collection = self._find_collection(project['id'])
+            if collection is None:
+                continue
+
+            records = collection.get(include=['metadatas'])
+            ids, metadatas = [], []
+            for record_id, meta in zip(records['ids'], records['metadatas']):
+                thumbnail = meta.get('thumbnail') or ''
+                if not thumbnail.startswith('data:'):
+                    continue
+                data = base64.b64decode(thumbnail.split(',', 1)[1])
+                ids.append(record_id)
+                metadatas.append({**meta, 'thumbnail': thumbnail_store.put(data)})
+
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                migrated += len(ids)
+                logger.info(f"Migrated {len(ids)} thumbnails for project {project['id']}.")
+        return migrated
+
+    def backfill_library(self):
+        """
+        Copies segments of projects indexed before the library collection existed.
+        Projects already present in the library are skipped, so this is safe to re-run.
+        """
+        added = 0
+        for project in self.list_projects():
+            collection = self._find_collection(project['id'])
+            if collection is None:
+                continue
+            library = self._library_for(collection_model(collection), collection.metadata.get('embedding_dimension'))
+            if library.get(where={"project_id": project['id']}, limit=1)['ids']:
+                continue
+
+            records = collection.get(include=['embeddings', 'documents', 'metadatas'])
+            if records['ids']:
+                self._add_to_library(
+                    project['id'], records['ids'], records['embeddings'], records['documents'], records['metadatas'],
+                    collection_model(collection)
+                )
+                added += len(records['ids'])
+        return added
+
+    def reembed_project(self, project_id, encode, model_id, dimension, batch_size=64, pause=0.0):
+        """
+        Re-embeds the project's documents with `encode` (texts -> vectors of `model_id`) into a new
+        collection, `batch_size` at a time, sleeping `pause` seconds between batches. Segments
+        already in the new collection are skipped, so an interrupted run resumes where it stopped.
+        Queries keep using the old collection until the project is switched over at the end.
+        Returns the number of segments embedded, or None if the project was already current.
+        """
+        source = self._find_collection(project_id)
+        if source is None or collection_model(source) == model_id:
+            return None
+
+        target = self.client.get_or_create_collection(
+            name=self._model_collection_name(project_id, model_id),
+            metadata=collection_metadata(model_id, dimension)
+        )
+        done = set(target.get(include=[])['ids'])
+        records = source.get(include=['documents', 'metadatas'])
+        pending = [i for i, record_id in enumerate(records['ids']) if record_id not in done]
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            # Segment ids are kept, so the lexical index stays valid.
+            ids = [records['ids'][i] for i in batch]
+            documents = [records['documents'][i] for i in batch]
+            metadatas = [records['metadatas'][i] for i in batch]
+            embeddings = encode(documents)
+            target.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+            self._add_to_library(project_id, ids, embeddings, documents, metadatas, model_id)
+            if pause:
+                time.sleep(pause)
+
+        if not self.projects.update(project_id, collection=target.name):
+            # Deleted while re-embedding.
+            self._delete_collection(target.name)
+            self._delete_from_libraries(project_id)
+            return len(pending)
+        if source.name != target.name:
+            self._delete_collection(source.name)
+        logger.info(f"Re-embedded {len(pending)} segments of project {project_id} with {model_id}.")
+        return len(pending)
+
+    def switch_library(self, model_id):
+        """
+        Makes the `model_id` library the one queries use, once every project's active collection
+        was built by that model, and drops the old library. Returns whether it switched.
+        """
+        active = self._find_library()
+        if active is None or collection_model(active) == model_id:
+            return False
+        for project in self.list_projects():
+            collection = self._find_collection(project['id'])
+            if collection is not None and collection_model(collection) != model_id:
+                return False
+
+        name = f"{LIBRARY_COLLECTION}_{model_key(model_id)}"
+        self.client.get_or_create_collection(name=name, metadata=collection_metadata(model_id))
+        self.projects.set_setting(LIBRARY_SETTING, name)
+        self._delete_collection(active.name)
+        logger.info(f"Library search switched to {model_id}.")
+        return True
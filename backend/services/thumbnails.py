@@ -0,0 +1,39 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from config import THUMBNAIL_FOLDER
+
+logger = logging.getLogger(__name__)
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class ThumbnailStore:
+    """Content-addressed JPEG store: each image lives at <root>/<hash[:2]>/<hash>.jpg."""
+    def __init__(self, root=THUMBNAIL_FOLDER):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], f"{digest}.jpg")
+
+    def put(self, data):
+        """Stores image bytes and returns their sha256 hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique temp name + rename keeps concurrent writers of the same image safe.
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+    def path(self, digest):
+        """Returns the file path for a digest, or None if it is malformed or missing."""
+        if not _DIGEST_RE.match(digest or ''):
+            return None
+        path = self._path(digest)
+        return path if os.path.exists(path) else None
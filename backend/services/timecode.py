@@ -0,0 +1,29 @@
+def parse_time(time_str):
+    """Converts MM:SS or HH:MM:SS (or plain seconds) to seconds."""
+    parts = str(time_str).split(':')
+    if len(parts) == 2:
+        return int(parts[0]) * 60 + float(parts[1])
+    elif len(parts) == 3:
+        return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
+    return float(time_str)
+
+def format_time(seconds):
+    """Formats seconds as MM:SS, or H:MM:SS from one hour up."""
+    seconds = int(round(max(0, seconds)))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+def window_bounds(starts, window_secs):
+    """
+    Given the start times of overlapping analysis windows, returns the (lo, hi) range each
+    window owns: overlaps are split at their midpoint so every instant has exactly one owner.
+    """
+    bounds = []
+    for i, start in enumerate(starts):
+        lo = 0.0 if i == 0 else (start + starts[i - 1] + window_secs) / 2
+        hi = float('inf') if i == len(starts) - 1 else (starts[i + 1] + start + window_secs) / 2
+        bounds.append((lo, hi))
+    return bounds
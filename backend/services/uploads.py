@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+from config import UPLOAD_IDLE_SECS
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+class OffsetMismatch(ValueError):
+    pass
+
+class UploadTooLarge(ValueError):
+    pass
+
+class UploadSession:
+    """
+    State of one resumable upload: the target file, its declared size and a running sha256.
+    The offset is always read from the file, so every worker process agrees on it.
+    """
+    def __init__(self, upload_id, path, size):
+        self.id = upload_id
+        self.path = path
+        self.size = size
+        self.sha256 = hashlib.sha256()
+        self.hashed = 0
+        self.proxy_process = None
+        self.lock = threading.Lock()
+        self.touched_at = time.monotonic()
+
+    @property
+    def offset(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def catch_up(self, f):
+        """
+        Hashes bytes appended since this process last saw the file (after a restart, or
+        by another worker). Returns True if there were any.
+        """
+        end = os.fstat(f.fileno()).st_size
+        if self.hashed == end:
+            return False
+        f.seek(self.hashed)
+        for chunk in iter(lambda: f.read(min(CHUNK_SIZE, end - self.hashed)), b''):
+            self.sha256.update(chunk)
+            self.hashed += len(chunk)
+        return True
+
+class UploadManager:
+    """
+    Resumable chunked uploads written straight into the project directory.
+
+    Each PATCH appends bytes at the current offset, updates the content hash on the fly
+    and tees the bytes into a streaming proxy transcode, so the AI proxy is mostly done
+    by the time the last chunk lands. Appends hold an exclusive lock on the file, so
+    chunks of one upload may arrive at any worker process. Sessions idle for
+    UPLOAD_IDLE_SECS are dropped along with their proxy transcode.
+    """
+    def __init__(self, video_processor, max_bytes, idle_secs=UPLOAD_IDLE_SECS):
+        self.video_processor = video_processor
+        self.max_bytes = max_bytes
+        self.idle_secs = idle_secs
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def _manifest_path(self, path):
+        return os.path.join(os.path.dirname(path), '.upload.json')
+
+    def create(self, upload_id, path, size):
+        """Starts a session for `size` bytes destined for `path`. The manifest makes it resumable."""
+        if size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {self.max_bytes // (1024 * 1024)}MB limit")
+
+        with open(self._manifest_path(path), 'w') as f:
+            json.dump({"id": upload_id, "path": path, "size": size}, f)
+        open(path, 'wb').close()
+
+        session = UploadSession(upload_id, path, size)
+        session.proxy_process = self.video_processor.start_ai_proxy_stream(path, size)
+        with self._lock:
+            self._sessions[upload_id] = session
+            self._start_reaper()
+        return session
+
+    def get(self, upload_id, project_dir):
+        """Returns the live session, restoring it from its manifest if this process has none."""
+        with self._lock:
+            session = self._sessions.get(upload_id)
+            if session is None:
+                manifest_path = os.path.join(project_dir, '.upload.json')
+                if not os.path.exists(manifest_path):
+                    return None
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                session = UploadSession(manifest['id'], manifest['path'], manifest['size'])
+                self._sessions[upload_id] = session
+                self._start_reaper()
+            session.touched_at = time.monotonic()
+            return session
+
+    def append(self, session, offset, stream, length=None):
+        """
+        Appends the request body (of `length` bytes, if known) at `offset`. Returns True once the file is complete.
+        Raises OffsetMismatch if `offset` is not where the file ends, UploadTooLarge if the body
+        would overrun the declared size.
+        """
+        with session.lock, open(session.path, 'r+b') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if session.catch_up(f) and session.proxy_process is not None:
+                # Another process took some chunks: this proxy stream has a gap.
+                self._stop_proxy(session)
+
+            current = os.fstat(f.fileno()).st_size
+            if offset != current:
+                raise OffsetMismatch(f"Offset mismatch: expected {current}")
+            if length is not None and offset + length > session.size:
+                raise UploadTooLarge("Upload exceeds its declared size")
+
+            f.seek(offset)
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                if session.hashed + len(chunk) > session.size:
+                    f.truncate(session.hashed)
+                    raise UploadTooLarge("Upload exceeds its declared size")
+                f.write(chunk)
+                session.hashed += len(chunk)
+                session.sha256.update(chunk)
+                self._feed_proxy(session, chunk)
+            f.flush()
+            session.touched_at = time.monotonic()
+
+            return session.hashed == session.size
+
+    def _feed_proxy(self, session, chunk):
+        if session.proxy_process is None:
+            return
+        try:
+            session.proxy_process.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            # ffmpeg gave up on a non-streamable container; get_ai_proxy falls back to the file.
+            session.proxy_process = None
+
+    def _stop_proxy(self, session):
+        session.proxy_process = None
+        self.video_processor.abort_ai_proxy_stream(session.path)
+
+    def finish(self, session):
+        """Closes the session and returns the sha256 of the uploaded file."""
+        if session.proxy_process is not None:
+            try:
+                session.proxy_process.stdin.close()
+            except OSError:
+                pass
+        with self._lock:
+            self._sessions.pop(session.id, None)
+        manifest_path = self._manifest_path(session.path)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        return session.sha256.hexdigest()
+
+    def expire_idle(self):
+        """
+        Drops sessions with no chunk for `idle_secs`, killing their proxy transcode (which
+        would otherwise block on stdin forever). The upload stays resumable from its manifest.
+        """
+        cutoff = time.monotonic() - self.idle_secs
+        with self._lock:
+            expired = [s for s in self._sessions.values() if s.touched_at < cutoff]
+            for session in expired:
+                del self._sessions[session.id]
+        for session in expired:
+            with session.lock:
+                logger.info(f"Upload {session.id} idle for {self.idle_secs:.0f}s; dropping its session")
+                if session.proxy_process is not None:
+                    self._stop_proxy(session)
+        return len(expired)
+
+    def _start_reaper(self):
+        # Called with self._lock held.
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name='upload-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(max(self.idle_secs / 4, 1.0))
+            try:
+                self.expire_idle()
+            except Exception as e:
+                logger.error(f"Expiring idle uploads failed: {e}")
@@ -1,14 +1,54 @@
-import base64
 import os
 import subprocess
-import yt_dlp
 import logging
 import platform
 import shutil
-from config import UPLOAD_FOLDER, CLIP_FOLDER, AI_PROXY_MIN_SOURCE_MB
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    UPLOAD_FOLDER, CLIP_FOLDER, AI_PROXY_MIN_SOURCE_MB, AI_PROXY_FORMAT,
+    THUMBNAIL_BATCH_SIZE, THUMBNAIL_WORKERS, CLIP_KEYFRAME_TOLERANCE_SECS, CLIP_CACHE_MAX_BYTES, CLIP_TMP_MAX_AGE_SECS
+)
+from services.timecode import parse_time
+from services.media_index import MediaIndex, KEYFRAME_EPSILON
+from services.clip_cache import ClipCache
+from services.hls import hls_dir, PLAYLIST_NAME, INIT_NAME, SEGMENT_PATTERN
+from services.metrics import CLIP_ENCODE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# ffprobe profile names of H.264 sources a smart cut can splice into, and the encoder's name for each.
+SMART_CUT_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+}
+
+def _download_hook(progress):
+    """yt-dlp progress hook reporting bytes across every file of a download (video + audio)."""
+    files = {}
+    def hook(d):
+        if d.get('status') not in ('downloading', 'finished'):
+            return
+        total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+        files[d.get('filename')] = (d.get('downloaded_bytes') or total, total)
+        progress(sum(done for done, _ in files.values()), sum(size for _, size in files.values()) or None)
+    return hook
+
+def _split_jpegs(data):
+    """Splits a concatenated MJPEG byte stream into individual JPEG images."""
+    frames = []
+    start = data.find(b'\xff\xd8')
+    while start != -1:
+        end = data.find(b'\xff\xd9', start)
+        if end == -1:
+            break
+        frames.append(data[start:end + 2])
+        start = data.find(b'\xff\xd8', end + 2)
+    return frames
+
 class VideoProcessor:
     def __init__(self):
         # Use paths from config
@@ -17,38 +57,84 @@ class VideoProcessor:
         os.makedirs(self.upload_folder, exist_ok=True)
         os.makedirs(self.clip_folder, exist_ok=True)
         self.is_mac = platform.system() == 'Darwin'
+        self.clip_cache = ClipCache(self.clip_folder, CLIP_CACHE_MAX_BYTES, CLIP_TMP_MAX_AGE_SECS)
+        self._streaming_proxies = {}
 
     def extract_thumbnail(self, video_path, timestamp_str):
-        """Extracts a tiny frame at timestamp and returns as base64 string."""
-        # Output to a temporary small jpeg
-        temp_thumb = os.path.join(self.upload_folder, f"thumb_{os.getpid()}.jpg")
-        
-        # -ss before -i for speed
-        # scale to small width (e.g. 280px)
-        # q:v 2-5 for decent quality but small size
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-ss', timestamp_str,
-            '-i', video_path,
-            '-frames:v', '1',
-            '-vf', 'scale=280:-1',
-            '-q:v', '4',
-            temp_thumb
+        """Extracts a tiny frame at timestamp and returns its JPEG bytes (or None)."""
+        return self.extract_thumbnails(video_path, [timestamp_str])[0]
+
+    def extract_thumbnails(self, video_path, timestamps, progress=None):
+        """
+        Extracts one small frame per timestamp and returns JPEG bytes (or None) in the same order.
+        Timestamps are split into a few batches, each decoded by a single ffmpeg process.
+        `progress(done, total)` is called as batches finish.
+        """
+        if not timestamps:
+            return []
+
+        # Clamp to the last frame so a segment time past the end can't break its whole batch.
+        duration = self.media_index(video_path).duration
+        if duration:
+            timestamps = [min(parse_time(ts), max(duration - 0.1, 0)) for ts in timestamps]
+
+        batches = [
+            timestamps[i:i + THUMBNAIL_BATCH_SIZE]
+            for i in range(0, len(timestamps), THUMBNAIL_BATCH_SIZE)
         ]
-        
+        done = 0
+        lock = threading.Lock()
+
+        def extract(batch):
+            nonlocal done
+            frames = self._extract_frames(video_path, batch)
+            if progress:
+                with lock:
+                    done += len(batch)
+                    progress(done, len(timestamps))
+            return frames
+
+        with ThreadPoolExecutor(max_workers=min(THUMBNAIL_WORKERS, len(batches))) as pool:
+            return [frame for batch in pool.map(extract, batches) for frame in batch]
+
+    def _extract_frames(self, video_path, timestamps):
+        """Returns raw JPEG bytes (or None) for each timestamp, streamed through a pipe."""
+        # -ss/-t before each -i: fast seek, and only read a moment of each input
+        cmd = ['ffmpeg', '-v', 'error']
+        for ts in timestamps:
+            cmd.extend(['-ss', str(ts), '-t', '1', '-i', video_path])
+
+        # Keep the first frame of every input, scale to small width (280px)
+        # and concatenate them into one MJPEG stream on stdout.
+        count = len(timestamps)
+        graph = ''.join(
+            f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS,scale=280:-1,setsar=1[v{i}];"
+            for i in range(count)
+        )
+        graph += ''.join(f"[v{i}]" for i in range(count)) + f"concat=n={count}:v=1:a=0,setpts=N/TB[out]"
+        cmd.extend([
+            '-filter_complex', graph,
+            '-map', '[out]',
+            '-vsync', 'passthrough',
+            '-q:v', '4',
+            '-c:v', 'mjpeg',
+            '-f', 'image2pipe',
+            'pipe:1'
+        ])
+
         try:
-            subprocess.run(cmd, capture_output=True, check=True)
-            if os.path.exists(temp_thumb):
-                with open(temp_thumb, "rb") as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                os.remove(temp_thumb)
-                return f"data:image/jpeg;base64,{encoded_string}"
+            result = subprocess.run(cmd, capture_output=True, check=True)
+            frames = _split_jpegs(result.stdout)
+            if len(frames) == count:
+                return frames
+            logger.warning(f"Batch thumbnail extraction returned {len(frames)}/{count} frames")
         except Exception as e:
             logger.error(f"Thumbnail extraction failed: {e}")
-            if os.path.exists(temp_thumb):
-                os.remove(temp_thumb)
-        return ""
+
+        # A timestamp past the end (or a decode error) breaks the batch; retry one at a time.
+        if count == 1:
+            return [None]
+        return [self._extract_frames(video_path, [ts])[0] for ts in timestamps]
 
     def clear_temp_folders(self):
         """Clears all files in the uploads and clips directories."""
@@ -65,8 +151,19 @@ class VideoProcessor:
                 except Exception as e:
                     logger.error(f'Failed to delete {file_path}. Reason: {e}')
 
-    def download_video(self, url, output_dir=None):
-        """Downloads a video from YouTube (Highest Quality)."""
+    def probe_url(self, url):
+        """Fetches raw video metadata (extractor, id, formats) without downloading or picking formats."""
+        import yt_dlp # deferred: only URL ingest needs it
+        ydl_opts = {'quiet': True, 'no_warnings': True, 'noplaylist': True}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False, process=False)
+
+    def download_video(self, url, output_dir=None, info=None, progress=None):
+        """
+        Downloads a video from YouTube (Highest Quality). Pass `info` from probe_url to skip a second lookup.
+        `progress(bytes_done, bytes_total)` follows the download.
+        """
+        import yt_dlp
         target_dir = output_dir or self.upload_folder
         os.makedirs(target_dir, exist_ok=True)
         ydl_opts = {
@@ -76,47 +173,62 @@ class VideoProcessor:
             'restrictfilenames': True,
             'quiet': True,
             'no_warnings': True,
-            'noplaylist': True
+            'noplaylist': True,
+            'progress_hooks': [_download_hook(progress)] if progress else []
         }
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                if info:
+                    info = ydl.process_ie_result(info, download=True)
+                else:
+                    info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
                 return filename
         except Exception as e:
             logger.error(f"Failed to download video: {e}")
             raise
 
-    def get_ai_proxy(self, input_path):
-        """Creates a low-res (480p) proxy of a video for faster AI upload."""
-        source_size_mb = (os.path.getsize(input_path) / (1024 * 1024)) if os.path.exists(input_path) else 0
-        if source_size_mb < AI_PROXY_MIN_SOURCE_MB:
-            logger.info(
-                "Skipping proxy generation for small file (%.2fMB < %.2fMB): %s",
-                source_size_mb,
-                AI_PROXY_MIN_SOURCE_MB,
-                input_path
-            )
-            return input_path
+    def download_ai_proxy(self, url, output_dir, info=None, progress=None):
+        """
+        Downloads a low-res rendition (AI_PROXY_FORMAT) for analysis and thumbnails, so they don't
+        wait for the full-quality download or a transcode. Returns its path, or None if unavailable.
+        """
+        import yt_dlp
+        ydl_opts = {
+            'outtmpl': os.path.join(output_dir, 'proxy_480p_%(title)s.%(ext)s'),
+            'format': AI_PROXY_FORMAT,
+            'restrictfilenames': True,
+            'quiet': True,
+            'no_warnings': True,
+            'noplaylist': True,
+            'progress_hooks': [_download_hook(progress)] if progress else []
+        }
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                if info:
+                    info = ydl.process_ie_result(info, download=True)
+                else:
+                    info = ydl.extract_info(url, download=True)
+                return ydl.prepare_filename(info)
+        except Exception as e:
+            logger.info(f"No low-res rendition for the AI path ({e}); proxying the full download instead")
+            return None
 
+    def _proxy_path(self, input_path):
         filename = os.path.basename(input_path)
-        proxy_filename = f"proxy_480p_{filename}"
-        proxy_path = os.path.join(os.path.dirname(os.path.abspath(input_path)), proxy_filename)
+        return os.path.join(os.path.dirname(os.path.abspath(input_path)), f"proxy_480p_{filename}")
 
-        if os.path.exists(proxy_path):
-            return proxy_path
-
-        logger.info(f"Creating low-res AI proxy: {proxy_path}")
+    def _proxy_cmd(self, source, output_path):
         # Downscale to 480p, reduce bitrate for fast upload
         encoder = 'h264_videotoolbox' if self.is_mac else 'libx264'
         cmd = [
             'ffmpeg',
             '-y',
-            '-i', input_path,
+            '-i', source,
             '-vf', 'scale=-2:360',
             '-c:v', encoder,
         ]
-        
+
         if self.is_mac:
             cmd.extend(['-b:v', '1000k']) # Videotoolbox uses bitrate
         else:
@@ -125,80 +237,308 @@ class VideoProcessor:
         cmd.extend([
             '-c:a', 'aac',
             '-ar', '22050',
-            proxy_path
+            output_path
         ])
-        
+        return cmd
+
+    def start_ai_proxy_stream(self, input_path, expected_size):
+        """
+        Starts transcoding the AI proxy from stdin while the source is still arriving.
+        Returns the ffmpeg process (write source chunks to its stdin, then close it),
+        or None when the finished file would be too small to need a proxy.
+        get_ai_proxy later waits for this process instead of transcoding again.
+        """
+        if expected_size / (1024 * 1024) < AI_PROXY_MIN_SOURCE_MB:
+            return None
+
+        proxy_path = self._proxy_path(input_path)
+        root, ext = os.path.splitext(proxy_path)
+        logger.info(f"Streaming low-res AI proxy: {proxy_path}")
+        process = subprocess.Popen(
+            self._proxy_cmd('pipe:0', f"{root}.part{ext}"),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        self._streaming_proxies[proxy_path] = process
+        return process
+
+    def abort_ai_proxy_stream(self, input_path):
+        """Kills a streamed proxy transcode that will not get the rest of its input, and removes its output."""
+        proxy_path = self._proxy_path(input_path)
+        process = self._streaming_proxies.pop(proxy_path, None)
+        if process is None:
+            return
+        process.kill()
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.wait()
+        root, ext = os.path.splitext(proxy_path)
+        part_path = f"{root}.part{ext}"
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    def _finish_proxy_stream(self, proxy_path):
+        """Waits for a streamed proxy transcode; returns True if it produced the proxy."""
+        process = self._streaming_proxies.pop(proxy_path, None)
+        if process is None:
+            return False
+
+        root, ext = os.path.splitext(proxy_path)
+        part_path = f"{root}.part{ext}"
+        if process.wait() == 0 and os.path.exists(part_path):
+            os.replace(part_path, proxy_path)
+            return True
+
+        # Non-streamable sources (e.g. MP4 with the moov atom at the end) fail here.
+        logger.info(f"Streamed proxy failed (exit {process.returncode}); transcoding from file")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
+
+    def get_ai_proxy(self, input_path, progress=None):
+        """Creates a low-res (480p) proxy of a video for faster AI upload, reporting transcoded seconds to `progress`."""
+        source_size_mb = (os.path.getsize(input_path) / (1024 * 1024)) if os.path.exists(input_path) else 0
+        if source_size_mb < AI_PROXY_MIN_SOURCE_MB:
+            logger.info(
+                "Skipping proxy generation for small file (%.2fMB < %.2fMB): %s",
+                source_size_mb,
+                AI_PROXY_MIN_SOURCE_MB,
+                input_path
+            )
+            return input_path
+
+        proxy_path = self._proxy_path(input_path)
+
+        if self._finish_proxy_stream(proxy_path) or os.path.exists(proxy_path):
+            return proxy_path
+
+        logger.info(f"Creating low-res AI proxy: {proxy_path}")
         try:
-            subprocess.run(cmd, capture_output=True, check=True)
+            self._run_with_progress(self._proxy_cmd(input_path, proxy_path), progress, input_path)
             return proxy_path
         except subprocess.CalledProcessError as e:
-            logger.error(f"Proxy generation failed: {e.stderr.decode()}")
+            logger.error(f"Proxy generation failed: {e.stderr}")
             return input_path # Fallback to original if proxy fails
 
-    def _parse_time(self, time_str):
-        """Converts MM:SS or HH:MM:SS to seconds."""
-        parts = time_str.split(':')
-        if len(parts) == 2:
-            return int(parts[0]) * 60 + int(parts[1])
-        elif len(parts) == 3:
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
-        return float(time_str)
-
-    def create_clip(self, input_path, start_time, end_time):
-        """Creates a video clip using ffmpeg."""
+    def split_video(self, video_path, window_secs, overlap_secs, index=None):
+        """
+        Cuts the video into overlapping windows with stream copy (no re-encode).
+        Returns [(offset_seconds, window_path)], where offset is the keyframe each window starts on.
+        Pass the video's MediaIndex if the caller already has it, to skip probing again.
+        """
+        index = index or MediaIndex.build(video_path)
+        duration = index.duration
+        root, ext = os.path.splitext(os.path.abspath(video_path))
+        step = window_secs - overlap_secs
+
+        windows = []
+        nominal = 0.0
+        while nominal < duration:
+            offset = index.keyframe_before(nominal)
+            window_path = f"{root}.window{len(windows):03d}{ext}"
+            subprocess.run(
+                [
+                    'ffmpeg', '-y', '-v', 'error',
+                    '-ss', str(offset), '-i', video_path,
+                    '-t', str(window_secs),
+                    '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+                    window_path
+                ],
+                capture_output=True, check=True
+            )
+            windows.append((offset, window_path))
+            if offset + window_secs >= duration:
+                break
+            nominal += step
+        return windows
+
+    def media_index(self, video_path):
+        """The persisted keyframe/stream index of a source video (built on first use)."""
+        return MediaIndex.for_video(video_path)
+
+    def _encoder_args(self):
+        encoder = 'h264_videotoolbox' if self.is_mac else 'libx264'
+        if self.is_mac:
+            return ['-c:v', encoder, '-b:v', '4000k'] # High quality for clips
+        return ['-c:v', encoder, '-preset', 'ultrafast']
+
+    def _run_ffmpeg(self, args, progress=None, input_path=None):
+        cmd = ['ffmpeg', '-y', '-v', 'error', *args]
+        logger.info(f"Executing FFmpeg: {' '.join(cmd)}")
+        self._run_with_progress(cmd, progress, input_path)
+
+    def _run_with_progress(self, cmd, progress=None, input_path=None):
+        """
+        Runs an ffmpeg command line; stderr is text on CalledProcessError. With `progress`,
+        reports seconds written out of `input_path`'s duration from ffmpeg's -progress output.
+        """
+        if progress is None:
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
+            return
+
+        try:
+            duration = self.media_index(input_path).duration if input_path else None
+        except Exception:
+            duration = None # Progress without a total
+        cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+        with tempfile.TemporaryFile('w+') as stderr:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+            for line in process.stdout:
+                key, _, value = line.strip().partition('=')
+                if key == 'out_time_us' and value.isdigit():
+                    seconds = int(value) / 1_000_000
+                    progress(min(seconds, duration) if duration else seconds, duration)
+            if process.wait() != 0:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr.read())
+
+    def create_clip(self, input_path, start_time, end_time, mode='exact'):
+        """
+        Creates a video clip using ffmpeg.
+
+        'exact' re-encodes the whole range. 'fast' stream-copies from the keyframe at or before
+        `start_time` when it is within CLIP_KEYFRAME_TOLERANCE_SECS. 'smart' re-encodes only the
+        partial GOP before the first keyframe in range and stream-copies the rest, frame-accurate.
+        Fast falls back to smart, and smart to exact, when the source does not allow them.
+        Clips are served from the size-bounded clip cache; returns the clip's filename.
+        """
+        # Times may be MM:SS, HH:MM:SS or seconds (int, float or string); the clip is named by the
+        # exact seconds so "01:05", 65 and "65.0" share a clip while 65.4 gets its own.
+        start_secs = parse_time(start_time)
+        end_secs = parse_time(end_time)
         filename = os.path.basename(input_path)
         source_scope = os.path.basename(os.path.dirname(os.path.abspath(input_path))) or "video"
         safe_scope = source_scope.replace(' ', '_')
-        # Create a safe name for the clip
-        safe_start = start_time.replace(':', '-')
-        safe_end = end_time.replace(':', '-')
         # Ensure filename is safe (replace spaces)
         safe_filename = filename.replace(' ', '_')
-        output_filename = f"clip_{safe_scope}_{safe_start}_{safe_end}_{safe_filename}"
-        output_path = os.path.join(self.clip_folder, output_filename)
+        mode_suffix = "" if mode == 'exact' else f"_{mode}"
+        output_filename = f"clip_{safe_scope}_{start_secs:.3f}_{end_secs:.3f}{mode_suffix}_{safe_filename}"
 
-        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
-            logger.info(f"Clip already exists: {output_path}")
-            return output_filename
+        def produce(output_path):
+            with CLIP_ENCODE_SECONDS.labels(mode).time():
+                self._write_clip(input_path, start_secs, end_secs, output_path, mode)
 
-        # Calculate duration for -t
-        start_secs = self._parse_time(start_time)
-        end_secs = self._parse_time(end_time)
-        duration = max(0, end_secs - start_secs)
+        self.clip_cache.get_or_create(output_filename, produce)
+        return output_filename
 
-        encoder = 'h264_videotoolbox' if self.is_mac else 'libx264'
+    def _write_clip(self, input_path, start_secs, end_secs, output_path, mode):
+        duration = max(0, end_secs - start_secs)
+        try:
+            if mode != 'exact' and duration and self._copy_clip(input_path, start_secs, end_secs, output_path, mode):
+                logger.info(f"Stream-copied clip ({mode}): {output_path}")
+                return
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Stream-copy clip failed, re-encoding instead: {e.stderr}")
 
         # Fast seeking: -ss before -i
         # Accurate duration: -t
         # Web optimized: +faststart, yuv420p
-        cmd = [
-            'ffmpeg',
-            '-y',
-            '-ss', str(start_time),
-            '-i', input_path,
-            '-t', str(duration),
-            '-c:v', encoder,
-        ]
-
-        if self.is_mac:
-            cmd.extend(['-b:v', '4000k']) # High quality for clips
-        else:
-            cmd.extend(['-preset', 'ultrafast'])
-
-        cmd.extend([
-            '-c:a', 'aac',
-            '-pix_fmt', 'yuv420p',
-            '-movflags', '+faststart',
-            '-strict', 'experimental',
-            output_path
-        ])
-        
-        logger.info(f"Executing FFmpeg: {' '.join(cmd)}")
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            self._run_ffmpeg([
+                '-ss', str(start_secs),
+                '-i', input_path,
+                '-t', str(duration),
+                *self._encoder_args(),
+                '-c:a', 'aac',
+                '-pix_fmt', 'yuv420p',
+                '-movflags', '+faststart',
+                '-strict', 'experimental',
+                output_path
+            ])
             logger.info(f"FFmpeg successful: {output_path}")
-            return output_filename
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg failed with exit code {e.returncode}")
             logger.error(f"FFmpeg stderr: {e.stderr}")
             raise RuntimeError(f"FFmpeg failed: {e.stderr}")
+
+    def _copy_clip(self, input_path, start_secs, end_secs, output_path, mode):
+        """Writes a fast or smart clip. Returns False when the keyframes or codecs rule it out."""
+        index = self.media_index(input_path)
+        streams = ['-map', '0:v:0', '-map', '0:a:0?']
+
+        before = index.keyframe_before(start_secs)
+        if start_secs - before <= (CLIP_KEYFRAME_TOLERANCE_SECS if mode == 'fast' else KEYFRAME_EPSILON):
+            self._run_ffmpeg([
+                '-ss', str(before), '-i', input_path, '-t', str(end_secs - before), *streams,
+                '-c', 'copy', '-avoid_negative_ts', 'make_zero', '-movflags', '+faststart', output_path
+            ])
+            return True
+
+        # Smart cut: only H.264 (+ AAC) can be spliced with our encoder without re-encoding the rest,
+        # and only when the re-encoded head can match the copied tail's pixel format and profile.
+        after = index.keyframe_after(start_secs)
+        codecs = index.codecs()
+        if after is None or after >= end_secs or codecs['video'] != 'h264' or codecs['audio'] not in ('aac', None):
+            return False
+        video = index.stream('video')
+        profile = SMART_CUT_PROFILES.get(video.get('profile'))
+        if video.get('pix_fmt') != 'yuv420p' or profile is None:
+            logger.info(f"Smart cut cannot match a {video.get('pix_fmt')} {video.get('profile')} source; re-encoding")
+            return False
+
+        # MPEG-TS parts carry their parameter sets in-band, so the concat survives differing encoder settings.
+        root = os.path.splitext(output_path)[0]
+        head_path, tail_path, list_path = f"{root}.head.ts", f"{root}.tail.ts", f"{root}.concat.txt"
+        try:
+            self._run_ffmpeg([
+                '-ss', str(start_secs), '-i', input_path, '-t', str(after - start_secs), *streams,
+                *self._encoder_args(), '-pix_fmt', 'yuv420p', '-profile:v', profile,
+                '-c:a', 'aac', '-f', 'mpegts', head_path
+            ])
+            self._run_ffmpeg([
+                '-ss', str(after), '-i', input_path, '-t', str(end_secs - after), *streams,
+                '-c', 'copy', '-bsf:v', 'h264_mp4toannexb', '-f', 'mpegts', tail_path
+            ])
+            # Entries resolve against the list's own directory, not the working directory, so they must
+            # be absolute: with a relative CLIP_FOLDER the concat would otherwise look for clips/clips/...
+            with open(list_path, 'w') as f:
+                f.write(f"file '{os.path.abspath(head_path)}'\nfile '{os.path.abspath(tail_path)}'\n")
+            self._run_ffmpeg([
+                '-f', 'concat', '-safe', '0', '-i', list_path,
+                '-c', 'copy', '-bsf:a', 'aac_adtstoasc', '-movflags', '+faststart', output_path
+            ])
+            return True
+        finally:
+            for path in (head_path, tail_path, list_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def package_hls(self, video_path, segment_secs, progress=None):
+        """
+        Packages the video as fMP4 HLS segments with a VOD playlist in hls_dir(video_path).
+        H.264/AAC sources are stream-copied (segments cut on keyframes); anything else is
+        re-encoded with a keyframe forced at every segment boundary. Returns the playlist path.
+        """
+        output_dir = hls_dir(video_path)
+        # Package into a temp folder and swap it in, so a playlist never points at missing segments.
+        tmp_dir = f"{output_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        codecs = self.media_index(video_path).codecs()
+        if codecs['video'] == 'h264' and codecs['audio'] in ('aac', None):
+            codec_args = ['-c', 'copy']
+        else:
+            codec_args = [
+                *self._encoder_args(), '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+                '-force_key_frames', f"expr:gte(t,n_forced*{segment_secs})"
+            ]
+
+        try:
+            self._run_ffmpeg([
+                '-i', video_path, '-map', '0:v:0', '-map', '0:a:0?', *codec_args,
+                '-f', 'hls', '-hls_time', str(segment_secs), '-hls_playlist_type', 'vod',
+                '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', INIT_NAME,
+                '-hls_segment_filename', os.path.join(tmp_dir, SEGMENT_PATTERN),
+                os.path.join(tmp_dir, PLAYLIST_NAME)
+            ], progress, video_path)
+        except subprocess.CalledProcessError as e:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise RuntimeError(f"HLS packaging failed: {e.stderr}")
+
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(tmp_dir, output_dir)
+        return os.path.join(output_dir, PLAYLIST_NAME)
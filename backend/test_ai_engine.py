@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import services.ai_engine as ai_engine_module
+from config import VideoSegment
+from services.analysis_client import AnalysisClient
+from services.ai_engine import AIEngine
+
+class FakeBackend:
+    dimension = 2
+
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.calls = []
+
+    def encode(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        return np.asarray([[float(len(text)), 1.0] for text in texts], dtype=np.float32)
+
+@pytest.fixture
+def make_engine(monkeypatch):
+    """Builds an AIEngine without Gemini; `backend` is EMBEDDING_BACKEND, loads are recorded."""
+    def make(backend='torch', served_model='current'):
+        loads = []
+
+        def load(name='torch', model_name=served_model):
+            loads.append((name, model_name))
+            # Like EmbeddingClient, 'remote' serves whatever model the server has loaded.
+            return FakeBackend(served_model if name == 'remote' else model_name)
+
+        monkeypatch.setenv('GOOGLE_API_KEY', 'test')
+        monkeypatch.setattr(ai_engine_module.genai, 'Client', lambda api_key: None)
+        monkeypatch.setattr(ai_engine_module, 'AnalysisClient', lambda client: None)
+        monkeypatch.setattr(ai_engine_module, 'EMBEDDING_BACKEND', backend)
+        monkeypatch.setattr(ai_engine_module, 'EMBEDDING_SERVER_BACKEND', 'onnx')
+        monkeypatch.setattr(ai_engine_module, 'load_embedding_backend',
+                            lambda name=backend, model_name=served_model: load(name, model_name))
+        return AIEngine(), loads
+    return make
+
+def test_old_model_loads_locally_when_embeddings_are_remote(make_engine):
+    engine, loads = make_engine(backend='remote')
+    assert engine.model_id == 'current'
+
+    embedding = engine.get_embedding("query", model_id='old')
+    assert embedding == [5.0, 1.0]
+    assert loads == [('remote', 'current'), ('onnx', 'old')]
+    assert engine.backend_for('old') is engine.backend_for('old')
+
+def test_query_embeddings_encode_only_cache_misses_once(make_engine):
+    engine, _ = make_engine()
+    backend = engine.backend_for('current')
+
+    first = engine.get_query_embeddings(["A cat", "a  CAT", "dog"])
+    assert first == [[5.0, 1.0], [5.0, 1.0], [3.0, 1.0]]
+    # Case and spacing variants share a cache entry; duplicates are encoded once.
+    assert backend.calls == [["a cat", "dog"]]
+
+    assert engine.get_query_embeddings(["dog", "bird"]) == [[3.0, 1.0], [4.0, 1.0]]
+    assert backend.calls[-1] == ["bird"]
+    assert engine.get_embedding("Dog") == [3.0, 1.0]
+    assert len(backend.calls) == 2
+
+def test_query_cache_is_per_model(make_engine):
+    engine, _ = make_engine()
+    engine.get_query_embeddings(["cat"])
+    engine.get_query_embeddings(["cat"], model_id='old')
+
+    assert engine.backend_for('old').calls == [["cat"]]
+    assert engine.query_cache.stats()["size"] == 2
+
+def test_windows_are_analyzed_off_thread_and_merged_on_one_timeline(make_engine, monkeypatch):
+    monkeypatch.setattr(ai_engine_module, 'ANALYSIS_WINDOW_SECS', 600)
+    engine, _ = make_engine()
+    engine._get_prompt = lambda: "prompt"
+    engine.analysis_client = AnalysisClient(None)
+    starts = {'w0.mp4': ['09:40', '09:50'], 'w1.mp4': ['00:10', '00:20', '00:30']}
+
+    async def analyze(path, prompt, timings):
+        timings['generation'] = 1.0
+        return [VideoSegment(start_time=start, end_time=start, description=path, key_elements=[])
+                for start in starts[path]]
+
+    engine.analysis_client.analyze = analyze
+    timings, progress = {}, []
+    future = engine.analyze_windows([(0.0, 'w0.mp4'), (570.0, 'w1.mp4')], timings,
+                                    lambda done, total: progress.append((done, total)))
+
+    # The windows overlap in 570-600s; each keeps only the segments starting in its half.
+    segments = future.result(timeout=5)
+    assert [(seg.start_time, seg.description) for seg in segments] == [
+        ('09:40', 'w0.mp4'), ('09:50', 'w1.mp4'), ('10:00', 'w1.mp4')
+    ]
+    assert timings == {'generation': 2.0} and progress[-1] == (2, 2)
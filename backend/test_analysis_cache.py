@@ -0,0 +1,50 @@
+from config import VideoSegment
+
+def analyzed_project(storage, name, source_key, status="ready"):
+    project_id = storage.create_project(name)
+    storage.update_project_source(project_id, source_key)
+    segments = [
+        VideoSegment(start_time="00:00", end_time="00:05", description="a red car drives by", key_elements=["car"]),
+        VideoSegment(start_time="00:05", end_time="00:10", description="a dog runs on the beach", key_elements=["dog"]),
+    ]
+    storage.add_segments(project_id, segments, [[1.0, 0.0], [0.0, 1.0]], 'fake')
+    if status != "ready":
+        storage.update_project_status(project_id, status)
+    return project_id
+
+def test_find_analyzed_project_returns_oldest_ready_match(storage):
+    first = analyzed_project(storage, "first", "key-a")
+    second = analyzed_project(storage, "second", "key-a")
+    analyzed_project(storage, "other", "key-b")
+    failed = analyzed_project(storage, "failed", "key-c", status="failed")
+
+    assert storage.find_analyzed_project("key-a")['id'] == first
+    assert storage.find_analyzed_project("key-a", exclude_id=first)['id'] == second
+    assert storage.find_analyzed_project("key-c") is None
+    assert storage.get_project(failed)['status'] == "failed"
+    assert storage.find_analyzed_project("key-z") is None
+
+def test_copy_segments_indexes_a_duplicate_without_reanalysis(storage):
+    original = analyzed_project(storage, "original", "key-a")
+    copy_id = storage.create_project("copy")
+
+    assert storage.copy_segments(original, copy_id) == 2
+    assert storage.get_project(copy_id)['status'] == "ready"
+    assert storage.project_model(copy_id) == 'fake'
+
+    # Vector, lexical and library search all see the copy, under new segment ids.
+    vector = storage.query(copy_id, [1.0, 0.0], n_results=1)
+    assert vector[0]['description'] == "a red car drives by" and vector[0]['project_id'] == copy_id
+    lexical = storage.query(copy_id, [1.0, 0.0], n_results=1, query_text="dog beach", mode='lexical')
+    assert lexical[0]['description'] == "a dog runs on the beach"
+    library = storage.query_library([1.0, 0.0], n_results=10, project_ids=[copy_id])
+    assert len(library) == 2
+    original_ids = {r['id'] for r in storage.query(original, [1.0, 0.0], n_results=2)}
+    assert original_ids.isdisjoint(r['id'] for r in library)
+
+def test_copy_segments_from_unindexed_project_copies_nothing(storage):
+    empty = storage.create_project("never indexed")
+    copy_id = storage.create_project("copy")
+
+    assert storage.copy_segments(empty, copy_id) == 0
+    assert storage.get_project(copy_id)['status'] == "processing"
@@ -0,0 +1,45 @@
+import asyncio
+from concurrent.futures import TimeoutError as FutureTimeout
+from types import SimpleNamespace
+import pytest
+from services.analysis_client import AnalysisClient
+
+class FakeFiles:
+    def __init__(self, polls_until_active):
+        self.polls_until_active = polls_until_active
+        self.gets = 0
+        self.deleted = []
+
+    async def upload(self, file):
+        return SimpleNamespace(name="files/1", state=SimpleNamespace(name="PROCESSING"))
+
+    async def get(self, name):
+        self.gets += 1
+        state = "ACTIVE" if self.gets >= self.polls_until_active else "PROCESSING"
+        return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+class FakeModels:
+    async def generate_content(self, model, contents, config):
+        return SimpleNamespace(parsed=SimpleNamespace(segments=["seg"]))
+
+def make_client(polls_until_active, **kwargs):
+    files = FakeFiles(polls_until_active)
+    fake = SimpleNamespace(aio=SimpleNamespace(files=files, models=FakeModels()))
+    return AnalysisClient(fake, poll_initial=0.01, poll_max=0.02, **kwargs), files
+
+def test_analysis_records_phase_timings_and_cleans_up():
+    client, files = make_client(polls_until_active=3)
+    timings = {}
+    assert client.submit("video.mp4", "prompt", timings).result(timeout=5) == ["seg"]
+    assert set(timings) == {"upload", "processing", "generation"}
+    assert files.gets == 3
+    assert files.deleted == ["files/1"]
+
+def test_analysis_deadline_deletes_upload():
+    client, files = make_client(polls_until_active=10 ** 6, deadline=0.1)
+    with pytest.raises((asyncio.TimeoutError, FutureTimeout)):
+        client.submit("video.mp4", "prompt").result(timeout=5)
+    assert files.deleted == ["files/1"]
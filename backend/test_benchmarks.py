@@ -0,0 +1,64 @@
+import os
+from types import SimpleNamespace
+import numpy as np
+from benchmarks.offline import HashingEmbedder, StubAIEngine, compare
+from benchmarks.load import find_bottlenecks, unseed
+
+class FakeVideoProcessor:
+    def media_index(self, path):
+        return SimpleNamespace(duration=35.0)
+
+def test_stub_analysis_is_deterministic_and_covers_the_video():
+    engine = StubAIEngine(FakeVideoProcessor(), segment_secs=10)
+    phases, timings = [], {}
+    segments = engine.analyze_video('video.mp4', timings, phases.append).result()
+
+    assert phases == ['upload', 'processing', 'generation']
+    assert [(s.start_time, s.end_time) for s in segments] == [
+        ('00:00', '00:10'), ('00:10', '00:20'), ('00:20', '00:30'), ('00:30', '00:35')
+    ]
+    assert segments == engine.analyze_video('video.mp4').result()
+
+def test_hashing_embedder_is_normalized_and_stable():
+    vectors = HashingEmbedder(dimension=64).encode(["a red car", "a red car", "the stage"])
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert not np.array_equal(vectors[0], vectors[2])
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"query_p95_ms": 10.0, "clip_secs": 2.0, "query_per_sec": 100.0, "thumbnails_missing": 0}
+    results = {"query_p95_ms": 12.0, "clip_secs": 2.6, "query_per_sec": 70.0, "thumbnails_missing": 3}
+
+    assert compare(results, baseline, tolerance=0.25) == [("clip_secs", 2.0, 2.6), ("query_per_sec", 100.0, 70.0)]
+    assert compare(baseline, baseline, tolerance=0.0) == []
+
+def run(endpoint, concurrency, throughput, error_rate=0.0, **stage_ms):
+    return {"endpoint": endpoint, "concurrency": concurrency, "throughput_per_sec": throughput,
+            "error_rate": error_rate, "latency_p95_ms": 1.0, "stage_ms": {"server": 1.0, **stage_ms}}
+
+def test_find_bottlenecks_names_the_stage_that_grew():
+    runs = [
+        run('query', 10, 100, lookup=1, embed=5, search=10, queue=0),
+        run('query', 100, 110, lookup=2, embed=60, search=12, queue=5),
+        run('clip', 10, 5, encode=100, queue=0),
+        run('clip', 100, 40, encode=120, queue=0),
+        run('clip', 1000, 41, 0.2, encode=130, queue=900),
+    ]
+    findings = find_bottlenecks(runs)
+
+    assert len(findings) == 3
+    assert findings[0].startswith("/query: saturated between 10 and 100") and "the embedding model" in findings[0]
+    assert findings[1] == "/clip: 20.0% errors at 1000 clients"
+    assert findings[2].startswith("/clip: saturated between 100 and 1000") and "request queueing" in findings[2]
+
+def test_unseed_removes_seeded_projects_and_uploads(storage, tmp_path, monkeypatch):
+    import config
+    monkeypatch.setattr(config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    kept = storage.create_project("kept")
+    seeded = [storage.create_project(f"load-test-{i}") for i in range(2)]
+    for project_id in seeded:
+        os.makedirs(tmp_path / 'uploads' / project_id)
+
+    unseed(storage, seeded)
+    assert [project['id'] for project in storage.list_projects()] == [kept]
+    assert os.listdir(tmp_path / 'uploads') == []
@@ -0,0 +1,37 @@
+import services.cache as cache_module
+from services.cache import LRUCache
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {"size": 2, "hits": 3, "misses": 1}
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    cache = LRUCache(maxsize=10, ttl=60)
+    cache.put('a', 1)
+
+    clock.now += 59
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats()["size"] == 0
+
+    # Re-putting restarts the clock; pop removes regardless of age.
+    cache.put('a', 2)
+    clock.now += 30
+    assert cache.pop('a') == 2 and cache.pop('a') is None
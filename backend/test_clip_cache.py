@@ -0,0 +1,79 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.clip_cache import ClipCache
+
+def write(size):
+    def produce(path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    return produce
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=250)
+    cache.get_or_create('clip_a.mp4', write(100))
+    cache.get_or_create('clip_b.mp4', write(100))
+    cache.get_or_create('clip_a.mp4', write(100))  # hit: a becomes most recent
+    cache.get_or_create('clip_c.mp4', write(100))
+
+    assert sorted(cache.names()) == ['clip_a.mp4', 'clip_c.mp4']
+    assert not (tmp_path / 'clip_b.mp4').exists()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size_bytes']) == (1, 3, 1, 200)
+
+def test_concurrent_requests_share_one_encode(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=10 ** 6)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(path):
+        calls.append(path)
+        started.set()
+        release.wait(5)
+        write(10)(path)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        first = pool.submit(cache.get_or_create, 'clip_x.mp4', slow)
+        started.wait(5)
+        others = [pool.submit(cache.get_or_create, 'clip_x.mp4', slow) for _ in range(3)]
+        while cache.stats()['coalesced'] < 3:
+            pass
+        release.set()
+        paths = {first.result()} | {f.result() for f in others}
+
+    assert len(calls) == 1
+    assert paths == {str(tmp_path / 'clip_x.mp4')}
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith('.tmp-')]
+
+def test_startup_removes_only_stale_temp_files(tmp_path):
+    stale = tmp_path / '.tmp-dead-clip_a.mp4'
+    fresh = tmp_path / '.tmp-live-clip_b.mp4'
+    stale.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+
+    ClipCache(str(tmp_path), max_bytes=10 ** 6, tmp_max_age=3600)
+    # The fresh one may be another worker's encode in progress.
+    assert not stale.exists() and fresh.exists()
+
+def test_workers_sharing_a_folder_reuse_clips_and_one_budget(tmp_path):
+    first = ClipCache(str(tmp_path), max_bytes=250)
+    second = ClipCache(str(tmp_path), max_bytes=250)
+    encodes = []
+
+    def produce(path):
+        encodes.append(path)
+        write(100)(path)
+
+    first.get_or_create('clip_a.mp4', produce)
+    assert second.get_or_create('clip_a.mp4', produce) == str(tmp_path / 'clip_a.mp4')
+    assert len(encodes) == 1 and second.stats()['hits'] == 1
+
+    # Together they exceed the budget; the least recently used clip goes whoever wrote it.
+    second.get_or_create('clip_b.mp4', write(100))
+    first.get_or_create('clip_c.mp4', write(100))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['clip_b.mp4', 'clip_c.mp4']
+    assert first.stats()['size_bytes'] == 200
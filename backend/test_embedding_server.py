@@ -0,0 +1,38 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from services.embedding_server import EmbeddingServer, EmbeddingClient
+
+class FakeBackend:
+    model_id = 'fake'
+    dimension = 2
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def encode(self, texts, batch_size=32):
+        self.batch_sizes.append(len(texts))
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+def test_concurrent_clients_share_batches(tmp_path):
+    backend = FakeBackend()
+    path = str(tmp_path / 'embed.sock')
+    server = EmbeddingServer(backend, path, window_secs=0.05, max_batch=64)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = EmbeddingClient(path, connect_timeout=1)
+        assert (client.model_id, client.dimension) == ('fake', 2)
+
+        texts = [['a' * n, 'b' * (n + 1)] for n in range(16)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(client.encode, texts))
+
+        for pair, vectors in zip(texts, results):
+            assert vectors.shape == (2, 2)
+            assert vectors[:, 0].tolist() == [len(t) for t in pair]
+        assert sum(backend.batch_sizes) == 32
+        assert len(backend.batch_sizes) < 16
+        assert client.stats()['requests'] == 16
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import huggingface_hub
+import onnxruntime
+import tokenizers
+from services.embeddings import OnnxBackend, load_embedding_backend
+
+PAD = [100.0, -100.0]
+
+class FakeTokenizer:
+    """One token per word (id = word length), padded to the longest text of the batch."""
+    def enable_truncation(self, max_length):
+        pass
+
+    def enable_padding(self):
+        pass
+
+    def encode_batch(self, texts):
+        words = [text.split() for text in texts]
+        width = max(len(w) for w in words)
+        return [
+            SimpleNamespace(
+                ids=[len(word) for word in w] + [0] * (width - len(w)),
+                attention_mask=[1] * len(w) + [0] * (width - len(w)),
+                type_ids=[0] * width,
+            )
+            for w in words
+        ]
+
+class FakeSession:
+    """Token embedding [id, 1] for real tokens; a large vector at padding, which pooling must ignore."""
+    def __init__(self, path, options, providers):
+        self.batches = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='input_ids'), SimpleNamespace(name='attention_mask')]
+
+    def get_outputs(self):
+        return [SimpleNamespace(shape=['batch', 'tokens', 2])]
+
+    def run(self, output_names, feeds):
+        self.batches.append(sorted(feeds))
+        ids = feeds['input_ids'].astype(np.float32)
+        tokens = np.stack([ids, np.ones_like(ids)], axis=-1)
+        tokens[feeds['attention_mask'] == 0] = PAD
+        return [tokens]
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(huggingface_hub, 'hf_hub_download', lambda repo, filename: filename)
+    monkeypatch.setattr(tokenizers.Tokenizer, 'from_file', staticmethod(lambda path: FakeTokenizer()))
+    monkeypatch.setattr(onnxruntime, 'InferenceSession', FakeSession)
+    return OnnxBackend('model')
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def test_onnx_mean_pools_over_the_mask_and_normalizes(backend):
+    assert (backend.model_id, backend.dimension) == ('model', 2)
+    vectors = backend.encode(["a bbb", "cc", "dddd eeeee ffffff"], batch_size=2)
+
+    # "cc" is padded to two tokens in its batch; the padding does not move its mean.
+    np.testing.assert_allclose(vectors, [unit([2, 1]), unit([2, 1]), unit([5, 1])], rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    # Two batches, fed only the inputs the model declares.
+    assert backend.session.batches == [['attention_mask', 'input_ids']] * 2
+
+def test_onnx_encodes_nothing_as_an_empty_matrix(backend):
+    assert backend.encode([]).shape == (0, 2)
+    assert backend.session.batches == []
+
+def test_unknown_backend_name_is_rejected():
+    with pytest.raises(ValueError, match="Unknown EMBEDDING_BACKEND 'tensorflow'"):
+        load_embedding_backend('tensorflow')
@@ -0,0 +1,47 @@
+from services.events import EventBus, ProgressReporter, sse_message
+
+def test_subscriber_gets_snapshot_then_live_events():
+    bus = EventBus()
+    bus.publish('p1', 'stage', {'stage': 'download', 'state': 'started'})
+    bus.publish('p1', 'progress', {'stage': 'download', 'percent': 10})
+    bus.publish('p1', 'progress', {'stage': 'download', 'percent': 40})
+
+    subscriber, snapshot = bus.subscribe('p1')
+    assert [m['data'].get('percent') for m in snapshot] == [None, 40]
+
+    bus.publish('p1', 'job', {'status': 'done'})
+    bus.publish('p2', 'job', {'status': 'done'})
+    assert subscriber.get_nowait()['data'] == {'status': 'done'}
+    assert subscriber.empty()
+    assert sse_message({'event': 'job', 'data': {'status': 'done'}}) == 'event: job\ndata: {"status": "done"}\n\n'
+
+def test_slow_subscriber_drops_oldest_and_progress_is_deduplicated():
+    bus = EventBus(queue_size=2)
+    subscriber, _ = bus.subscribe('p1')
+    report = ProgressReporter(lambda event, data: bus.publish('p1', event, data), 'download')
+    for done in range(0, 1001, 5):
+        report(done, 1000) # 201 calls, one event per whole percent
+
+    events = [subscriber.get_nowait()['data']['percent'] for _ in range(2)]
+    assert events == [99, 100]
+    bus.unsubscribe('p1', subscriber)
+    assert bus.stats() == {'projects': 1, 'subscribers': 0}
+
+def test_events_route_streams_sse_until_the_job_finishes(storage, make_client, monkeypatch):
+    import app as app_module
+    bus = EventBus()
+    monkeypatch.setattr(app_module, 'event_bus', bus)
+    project_id = storage.create_project("demo")
+    bus.publish(project_id, 'stage', {'stage': 'download', 'state': 'started'})
+    client = make_client()
+
+    response = client.get(f'/projects/{project_id}/events')
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    chunks = response.response
+    # The latest state first, then live events until the job's outcome.
+    assert next(chunks) == b'event: stage\ndata: {"stage": "download", "state": "started"}\n\n'
+    bus.publish(project_id, 'job', {'status': 'done'})
+    assert [chunk for chunk in chunks if chunk.startswith(b'event:')] == [b'event: job\ndata: {"status": "done"}\n\n']
+    assert bus.stats()['subscribers'] == 0
+
+    assert client.get('/projects/missing/events').status_code == 404
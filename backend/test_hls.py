@@ -0,0 +1,29 @@
+from services.hls import parse_playlist, window_playlist
+
+PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:6
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:6.000000,
+seg_00000.m4s
+#EXTINF:6.000000,
+seg_00001.m4s
+#EXTINF:4.500000,
+seg_00002.m4s
+#EXT-X-ENDLIST
+"""
+
+def test_parse_playlist_accumulates_start_times():
+    assert parse_playlist(PLAYLIST) == [
+        (0.0, 6.0, "seg_00000.m4s"), (6.0, 6.0, "seg_00001.m4s"), (12.0, 4.5, "seg_00002.m4s")
+    ]
+
+def test_window_playlist_keeps_only_overlapping_segments():
+    playlist = window_playlist(parse_playlist(PLAYLIST), 7, 12, uri_prefix="hls/")
+    assert "hls/seg_00001.m4s" in playlist
+    assert "seg_00000.m4s" not in playlist and "seg_00002.m4s" not in playlist
+    assert '#EXT-X-MAP:URI="hls/init.mp4"' in playlist
+    assert "#EXT-X-START:TIME-OFFSET=1.000,PRECISE=YES" in playlist
+    assert playlist.rstrip().endswith("#EXT-X-ENDLIST")
+    assert window_playlist(parse_playlist(PLAYLIST), 20, 30) is None
@@ -0,0 +1,172 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pytest
+from types import SimpleNamespace
+from config import VideoSegment
+import services.ingest as ingest_module
+from services.ingest import IngestPipeline
+from services.jobs import run_steps
+
+# Stands in for the Gemini event loop: analyses complete off the ingest thread.
+gemini = ThreadPoolExecutor(max_workers=4)
+
+class FakeVideoProcessor:
+    def __init__(self, upload_folder, proxy_available=True, download_secs=0.3):
+        self.upload_folder = upload_folder
+        self.proxy_available = proxy_available
+        self.download_secs = download_secs
+        self.thumbnail_source = None
+        self.proxy_sources = []
+        self.proxy_seen_by_thumbnails = None
+        self.probed = []
+        self.split_index = None
+
+    def probe_url(self, url):
+        return {'id': 'abc', 'extractor_key': 'Youtube'}
+
+    def download_video(self, url, output_dir, info, progress=None):
+        time.sleep(self.download_secs)
+        return f"{output_dir}/full.mp4"
+
+    def download_ai_proxy(self, url, output_dir, info, progress=None):
+        self.proxy_sources.append(url)
+        if not self.proxy_available:
+            return None
+        proxy_path = f"{output_dir}/proxy_480p_full.mp4"
+        open(proxy_path, 'wb').close()
+        return proxy_path
+
+    def get_ai_proxy(self, path, progress=None):
+        self.proxy_sources.append(path)
+        return path
+
+    def media_index(self, path):
+        self.probed.append(path)
+        return SimpleNamespace(duration=60.0)
+
+    def split_video(self, path, window_secs, overlap_secs, index=None):
+        self.split_index = index
+        return [(0.0, f"{path}.window000.mp4"), (25.0, f"{path}.window001.mp4")]
+
+    def extract_thumbnails(self, path, timestamps, progress=None):
+        self.thumbnail_source = path
+        time.sleep(0.2)
+        self.proxy_seen_by_thumbnails = os.path.exists(path)
+        return [b'jpeg' for _ in timestamps]
+
+class FakeAIEngine:
+    model_id = 'fake'
+
+    def analysis_key(self, content_id):
+        return content_id
+
+    def analyze_video(self, path, timings, on_phase=None):
+        return gemini.submit(self._analyze)
+
+    def analyze_windows(self, windows, timings, on_window=None):
+        return self.analyze_video(windows[0][1], timings)
+
+    def _analyze(self):
+        time.sleep(0.3)
+        return [VideoSegment(start_time='00:01', end_time='00:05', description='a cat', key_elements=[])]
+
+    def get_embeddings(self, texts):
+        time.sleep(0.2)
+        return [[1.0, 0.0] for _ in texts]
+
+class FailingEmbeddingsAIEngine(FakeAIEngine):
+    def get_embeddings(self, texts):
+        raise RuntimeError("embedding failed")
+
+class FakeStorage:
+    def __init__(self, duplicate=None):
+        self.project = {}
+        self.indexed = None
+        self.duplicate = duplicate
+
+    def get_project(self, project_id):
+        return self.project
+
+    def find_analyzed_project(self, source_key, exclude_id=None):
+        return self.duplicate
+
+    def copy_segments(self, source_project_id, project_id):
+        # The duplicate's index is gone (e.g. built with another model): nothing to reuse.
+        return 0
+
+    def update_project_source(self, project_id, source_key):
+        self.project['source_key'] = source_key
+
+    def update_project_media(self, project_id, name=None, video_filename=None):
+        self.project['video_filename'] = video_filename
+
+    def update_project_status(self, project_id, status, expected=None):
+        self.project['status'] = status
+
+    def add_segments(self, project_id, segments, embeddings, model_id):
+        self.indexed = (self.project['video_filename'], len(segments), model_id)
+
+class FakeThumbnails:
+    def put(self, data):
+        return 'hash'
+
+@contextmanager
+def stage(name):
+    yield
+
+def run(tmp_path, proxy_available=True, download_secs=0.3, ai_engine=None, duplicate=None):
+    processor = FakeVideoProcessor(str(tmp_path), proxy_available, download_secs)
+    storage = FakeStorage(duplicate)
+    pipeline = IngestPipeline(processor, ai_engine or FakeAIEngine(), storage, FakeThumbnails())
+    started = time.monotonic()
+    run_steps(pipeline.run({'project_id': 'p1', 'kind': 'url', 'source': 'https://youtu.be/abc'}, stage))
+    return time.monotonic() - started, processor, storage
+
+def test_url_ingest_overlaps_download_with_analysis(tmp_path):
+    elapsed, processor, storage = run(tmp_path)
+    # download 0.3 || (analyze 0.3 -> thumbnails 0.2 || embed 0.2); sequential would be 1.0s.
+    assert elapsed < 0.75
+    assert processor.thumbnail_source.endswith('proxy_480p_full.mp4')
+    assert storage.indexed == (str(tmp_path / 'p1' / 'full.mp4'), 1, 'fake')
+
+def test_url_ingest_without_low_res_rendition_uses_full_download(tmp_path):
+    elapsed, processor, storage = run(tmp_path, proxy_available=False)
+    assert processor.thumbnail_source.endswith('full.mp4')
+    assert storage.indexed[0].endswith('full.mp4')
+
+def test_failed_job_waits_for_thumbnails_but_not_the_download(tmp_path):
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        run(tmp_path, download_secs=2.0, ai_engine=FailingEmbeddingsAIEngine())
+    # analyze 0.3 + thumbnails 0.2, well before the 2s download would finish
+    assert time.monotonic() - started < 1.5
+
+def test_failed_job_removes_proxy_only_after_thumbnails(tmp_path):
+    processor = FakeVideoProcessor(str(tmp_path), download_secs=0.1)
+    pipeline = IngestPipeline(processor, FailingEmbeddingsAIEngine(), FakeStorage(), FakeThumbnails())
+    with pytest.raises(RuntimeError):
+        run_steps(pipeline.run({'project_id': 'p1', 'kind': 'url', 'source': 'https://youtu.be/abc'}, stage))
+    assert processor.proxy_seen_by_thumbnails is True
+    assert not os.path.exists(processor.thumbnail_source)
+
+def test_url_duplicate_without_reusable_index_transcodes_linked_file(tmp_path):
+    original = tmp_path / 'p0' / 'full.mp4'
+    original.parent.mkdir()
+    original.write_bytes(b'video')
+
+    elapsed, processor, storage = run(tmp_path, duplicate={'id': 'p0', 'video_filename': str(original)})
+    linked = str(tmp_path / 'p1' / 'full.mp4')
+    # No low-res download: the proxy comes from the file already on disk.
+    assert processor.proxy_sources == [linked]
+    assert storage.indexed == (linked, 1, 'fake')
+
+def test_proxy_is_probed_once_for_windowing_and_clamping(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_module, 'ANALYSIS_WINDOW_MIN_SECS', 30)
+    elapsed, processor, storage = run(tmp_path)
+
+    proxy_path = processor.thumbnail_source
+    assert processor.probed.count(proxy_path) == 1
+    assert processor.split_index is not None and processor.split_index.duration == 60.0
+    assert storage.indexed[1] == 1
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+import pytest
+import services.jobs as jobs_module
+from services.jobs import JobQueue, JobStore
+
+@pytest.fixture(autouse=True)
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs_module, 'DB_PATH', str(tmp_path))
+    monkeypatch.setattr(jobs_module, 'STAGE_CONCURRENCY', {})
+    return str(tmp_path)
+
+def wait_for(queue, job_ids, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = [queue.get(job_id) for job_id in job_ids]
+        if all(job['status'] in ('done', 'failed') for job in jobs):
+            return jobs
+        time.sleep(0.01)
+    raise AssertionError("jobs did not finish")
+
+def store(db_path):
+    return JobStore(os.path.join(db_path, 'projects.db'))
+
+def queued_job(job_id, **fields):
+    now = datetime.now().isoformat()
+    return {"id": job_id, "project_id": f"p-{job_id}", "kind": "url", "source": "s",
+            "status": "queued", "timings": {}, "created_at": now, "updated_at": now, **fields}
+
+def test_submit_runs_job_and_records_timings():
+    def handler(job, stage):
+        with stage('analyze'):
+            pass
+        return {"gemini_upload": 1.23456}
+
+    queue = JobQueue(handler, workers=2)
+    job_id = queue.submit('project', 'url', 'https://example.com/v.mp4')
+    [job] = wait_for(queue, [job_id])
+
+    assert job['status'] == 'done' and job['stage'] is None
+    assert set(job['timings']) == {'analyze', 'gemini_upload'}
+    assert job['timings']['gemini_upload'] == 1.235
+    assert 'owner' not in job
+    assert queue.counts() == {'queued': 0, 'running': 0}
+
+def test_failed_job_keeps_error():
+    def handler(job, stage):
+        raise RuntimeError("boom")
+
+    queue = JobQueue(handler, workers=1)
+    [job] = wait_for(queue, [queue.submit('project', 'url', 's')])
+    assert job['status'] == 'failed' and job['error'] == 'boom'
+
+def test_stale_running_job_of_dead_process_is_resumed_once(db_path):
+    runs = []
+    jobs = store(db_path)
+    jobs.insert(queued_job('a'))
+    assert jobs.claim('a', 'dead-host:1:x')
+    jobs._conn().execute("UPDATE jobs SET heartbeat_at = ?", (time.time() - 3600,))
+
+    queue = JobQueue(lambda job, stage: runs.append(job['id']), workers=2)
+    queue.start()
+    [job] = wait_for(queue, ['a'])
+    assert job['status'] == 'done'
+    assert runs == ['a']
+
+def test_running_job_with_fresh_heartbeat_is_left_alone(db_path):
+    jobs = store(db_path)
+    jobs.insert(queued_job('a'))
+    jobs.claim('a', 'other-host:1:x')
+
+    JobQueue(lambda job, stage: None).start()
+    assert jobs.get('a')['status'] == 'running'
+
+def test_queues_sharing_a_database_run_each_job_once(db_path):
+    runs = []
+    lock = threading.Lock()
+
+    def handler(job, stage):
+        time.sleep(0.01)
+        with lock:
+            runs.append(job['id'])
+
+    jobs = store(db_path)
+    job_ids = [f"job-{i}" for i in range(12)]
+    for job_id in job_ids:
+        jobs.insert(queued_job(job_id))
+
+    queues = [JobQueue(handler, workers=3) for _ in range(2)]
+    for queue in queues:
+        queue.start()
+    wait_for(queues[0], job_ids)
+
+    assert sorted(runs) == sorted(job_ids)
+    # Either process reports any job.
+    assert queues[1].get(job_ids[0])['status'] == 'done'
+
+def test_stage_limit_caps_concurrency(monkeypatch):
+    monkeypatch.setattr(jobs_module, 'STAGE_CONCURRENCY', {'analyze': 1})
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def handler(job, stage):
+        with stage('analyze'):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    queue = JobQueue(handler, workers=4)
+    job_ids = [queue.submit(f'p{i}', 'url', 's') for i in range(4)]
+    assert all(job['status'] == 'done' for job in wait_for(queue, job_ids))
+    assert peak[0] == 1
+
+def test_job_waiting_on_a_future_frees_its_worker():
+    analyses = {}
+
+    def handler(job, stage):
+        if job['project_id'] == 'quick':
+            return {}
+        with stage('analyze'):
+            analyses[job['project_id']] = Future()
+            segments = yield analyses[job['project_id']]
+        if not segments:
+            raise RuntimeError("no segments")
+        return {"segments": len(segments)}
+
+    queue = JobQueue(handler, workers=1)
+    waiting = [queue.submit(name, 'url', 's') for name in ('a', 'b')]
+    # Both analyses are pending at once, and the only worker is free for another job.
+    [quick] = wait_for(queue, [queue.submit('quick', 'url', 's')])
+    assert quick['status'] == 'done' and set(analyses) == {'a', 'b'}
+    assert [queue.get(job_id)['stage'] for job_id in waiting] == ['analyze', 'analyze']
+
+    analyses['a'].set_result(['s1', 's2'])
+    analyses['b'].set_exception(RuntimeError("Gemini deadline"))
+    a, b = wait_for(queue, waiting)
+    assert a['status'] == 'done' and a['timings']['segments'] == 2 and 'analyze' in a['timings']
+    assert b['status'] == 'failed' and b['error'] == 'Gemini deadline'
+
+def test_finished_jobs_are_pruned_after_retention(db_path):
+    jobs = store(db_path)
+    old = (datetime.now() - timedelta(days=30)).isoformat()
+    jobs.insert(queued_job('old-done', status='done', updated_at=old))
+    jobs.insert(queued_job('old-queued', updated_at=old))
+    jobs.insert(queued_job('new-done', status='done'))
+
+    assert jobs.prune(retention_days=7) == 1
+    assert jobs.get('old-done') is None
+    assert jobs.get('old-queued') and jobs.get('new-done')
+
+def test_legacy_jobs_json_is_imported_and_unfinished_jobs_queued(db_path):
+    now = datetime.now().isoformat()
+    legacy = {
+        job_id: {"id": job_id, "project_id": "p", "kind": "url", "source": "s", "status": status,
+                 "stage": "analyze", "error": None, "timings": {"download": 1.0}, "created_at": now, "updated_at": now}
+        for job_id, status in [('r', 'running'), ('d', 'done')]
+    }
+    json_path = os.path.join(db_path, 'jobs.json')
+    with open(json_path, 'w') as f:
+        json.dump(legacy, f)
+
+    jobs = JobStore(os.path.join(db_path, 'projects.db'), legacy_json_path=json_path)
+    assert jobs.get('r')['status'] == 'queued' and jobs.get('r')['stage'] is None
+    assert jobs.get('d')['timings'] == {"download": 1.0}
+    assert not os.path.exists(json_path) and os.path.exists(f"{json_path}.imported")
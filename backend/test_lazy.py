@@ -0,0 +1,29 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from services.lazy import LazyService
+
+def test_builds_once_under_concurrency():
+    calls = []
+    gate = threading.Event()
+
+    def factory():
+        calls.append(1)
+        gate.wait(5)
+        return object()
+
+    service = LazyService('test', factory)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(service.get) for _ in range(8)]
+        gate.set()
+        instances = {id(f.result()) for f in futures}
+
+    assert len(calls) == 1 and len(instances) == 1
+    assert service.loaded
+
+def test_failed_or_disabled_build_yields_none():
+    def broken():
+        raise RuntimeError('no model')
+
+    assert LazyService('broken', broken).get() is None
+    assert LazyService('off', object, enabled=False).get() is None
+    assert not LazyService('off', object, enabled=False).loaded
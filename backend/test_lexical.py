@@ -0,0 +1,20 @@
+from services.lexical import tokenize, BM25Index
+from services.ranking import reciprocal_rank_fusion
+
+def test_tokenize_keeps_part_numbers_whole_and_split():
+    assert tokenize("Replace the XJ-9000 valve") == ["replace", "the", "xj9000", "xj", "9000", "valve"]
+
+def test_bm25_prefers_rare_exact_terms():
+    index = BM25Index()
+    index.add(
+        ["a", "b", "c"],
+        ["a man walks into the kitchen", "close up of the XJ-9000 label", "the man leaves the kitchen"]
+    )
+    assert index.search("xj9000 label", 3)[0][0] == "b"
+    assert [doc_id for doc_id, _ in index.search("kitchen", 3)] in (["a", "c"], ["c", "a"])
+    assert BM25Index.from_dict(index.to_dict()).search("xj-9000", 1)[0][0] == "b"
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([(["a", "b", "c"], 1.0), (["c", "b", "d"], 1.0)])
+    assert [doc_id for doc_id, _ in fused][:2] in (["b", "c"], ["c", "b"])
+    assert fused[-1][0] in ("a", "d")
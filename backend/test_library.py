@@ -0,0 +1,69 @@
+from datetime import datetime
+from config import VideoSegment
+
+class FakeEngine:
+    model_id = 'fake'
+
+    def get_embedding(self, text, model_id=None):
+        return [1.0, 0.0]
+
+def seed(storage):
+    """Three projects created in January, February and March, one segment each."""
+    project_ids = {}
+    for month, name in enumerate(["jan", "feb", "mar"], start=1):
+        project_id = storage.create_project(name)
+        storage.projects.update(project_id, created_at=datetime(2026, month, 15).isoformat())
+        segment = VideoSegment(start_time="00:00", end_time="00:05", description=f"{name} scene", key_elements=[])
+        storage.add_segments(project_id, [segment], [[1.0, 0.1 * month]], 'fake')
+        project_ids[name] = project_id
+    return project_ids
+
+def descriptions(results):
+    return sorted(result['description'] for result in results)
+
+def test_library_query_filters_by_project_and_date(storage):
+    project_ids = seed(storage)
+    query = [1.0, 0.0]
+
+    assert descriptions(storage.query_library(query, n_results=10)) == ["feb scene", "jan scene", "mar scene"]
+    assert descriptions(storage.query_library(query, n_results=10, project_ids=[project_ids["feb"]])) == ["feb scene"]
+    assert descriptions(storage.query_library(query, n_results=10, created_after=datetime(2026, 2, 1))) == \
+        ["feb scene", "mar scene"]
+    assert descriptions(storage.query_library(
+        query, n_results=10, project_ids=[project_ids["jan"], project_ids["mar"]],
+        created_after=datetime(2026, 2, 1), created_before=datetime(2026, 12, 31)
+    )) == ["mar scene"]
+    results = storage.query_library(query, n_results=1)
+    assert results[0]['project_id'] == project_ids["jan"]
+
+def test_backfill_adds_projects_missing_from_the_library(storage):
+    project_ids = seed(storage)
+    # As if "feb" had been indexed before the library collection existed.
+    storage._delete_from_libraries(project_ids["feb"])
+    assert descriptions(storage.query_library([1.0, 0.0], n_results=10)) == ["jan scene", "mar scene"]
+
+    assert storage.backfill_library() == 1
+    assert descriptions(storage.query_library([1.0, 0.0], n_results=10, created_after=datetime(2026, 2, 1),
+                                              created_before=datetime(2026, 2, 28))) == ["feb scene"]
+    assert storage.backfill_library() == 0
+
+def test_library_scope_over_the_api(storage, make_client):
+    seed(storage)
+    client = make_client(ai_engine=FakeEngine())
+
+    response = client.post('/query', json={'query': 'scene', 'scope': 'library', 'created_before': '2026-02-01',
+                                           'top_k': 5})
+    assert response.status_code == 200
+    assert descriptions(response.get_json()) == ["jan scene"]
+    response = client.post('/query', json={'query': 'scene', 'scope': 'library', 'created_after': 'last week'})
+    assert response.status_code == 400
+
+def test_library_query_rejects_malformed_project_ids(storage, make_client):
+    project_ids = seed(storage)
+    client = make_client(ai_engine=FakeEngine())
+
+    for malformed in (project_ids["jan"], [project_ids["jan"], 7], {"id": project_ids["jan"]}):
+        response = client.post('/query', json={'query': 'scene', 'scope': 'library', 'project_ids': malformed})
+        assert response.status_code == 400
+    response = client.post('/query', json={'query': 'scene', 'scope': 'library', 'project_ids': [project_ids["jan"]]})
+    assert descriptions(response.get_json()) == ["jan scene"]
@@ -0,0 +1,25 @@
+import numpy as np
+from services.media_index import MediaIndex, media_index_path
+
+def make_index():
+    streams = [{"codec_type": "video", "codec_name": "h264"}, {"codec_type": "audio", "codec_name": "aac"}]
+    return MediaIndex([0.0, 2.0, 4.0, 6.0], [48, 9000, 18000, 27000], 7.5, streams)
+
+def test_keyframe_lookup():
+    index = make_index()
+    assert index.keyframe_before(3.9) == 2.0
+    assert index.keyframe_before(4.0) == 4.0
+    assert index.keyframe_after(4.0) == 6.0
+    assert index.keyframe_after(6.5) is None
+    assert index.codecs() == {"video": "h264", "audio": "aac"}
+
+def test_save_load_round_trip_and_staleness(tmp_path):
+    path = media_index_path(str(tmp_path / "video.mp4"))
+    make_index().save(path, np.array([100, 1], dtype=np.int64))
+
+    loaded = MediaIndex.load(path, np.array([100, 1], dtype=np.int64))
+    assert loaded.duration == 7.5
+    assert loaded.keyframe_positions.tolist() == [48, 9000, 18000, 27000]
+    assert loaded.codecs()["video"] == "h264"
+    # A replaced source file invalidates the index
+    assert MediaIndex.load(path, np.array([200, 1], dtype=np.int64)) is None
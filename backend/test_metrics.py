@@ -0,0 +1,28 @@
+from services.metrics import Registry, NOOP
+
+def test_render_exposition_format():
+    registry = Registry(enabled=True)
+    stages = registry.histogram('stage_seconds', 'Stage time.', ['stage'], buckets=(0.1, 1))
+    stages.labels('download').observe(0.05)
+    stages.labels('download').observe(0.5)
+    stages.labels('download').observe(5)
+    registry.counter('clips_total', 'Clips.').inc(2)
+    registry.callback('gauge', 'jobs', 'Jobs by status.', lambda: {'queued': 3, 'running': 1}, ['status'])
+
+    lines = registry.render().splitlines()
+    assert '# TYPE stage_seconds histogram' in lines
+    assert 'stage_seconds_bucket{stage="download",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="download",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="download",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="download"} 5.55' in lines
+    assert 'stage_seconds_count{stage="download"} 3' in lines
+    assert 'clips_total 2.0' in lines
+    assert 'jobs{status="queued"} 3' in lines
+
+def test_disabled_registry_hands_out_noops():
+    registry = Registry(enabled=False)
+    metric = registry.histogram('stage_seconds', 'Stage time.', ['stage'])
+    assert metric is NOOP
+    with metric.labels('download').time():
+        pass
+    assert registry.render() == '\n'
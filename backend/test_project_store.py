@@ -0,0 +1,69 @@
+import json
+import os
+from services.project_store import ProjectStore
+
+def project(i, status="ready"):
+    return {"id": f"p{i}", "name": f"video {i}", "status": status,
+            "created_at": f"2026-01-{i + 1:02d}T00:00:00", "video_filename": f"v{i}.mp4"}
+
+def test_legacy_projects_json_is_imported_once(tmp_path):
+    json_path = str(tmp_path / 'projects.json')
+    with open(json_path, 'w') as f:
+        json.dump({
+            "a": {"id": "a", "name": "old", "status": "ready", "created_at": "2025-01-01T00:00:00"},
+            "b": {"id": "b", "created_at": "2025-01-02T00:00:00", "video_filename": None},
+        }, f)
+
+    store = ProjectStore(str(tmp_path / 'projects.db'), legacy_json_path=json_path)
+    assert store.get("a")["name"] == "old"
+    assert store.get("b")["status"] == "ready" and store.get("b")["video_filename"] == ""
+    assert not os.path.exists(json_path) and os.path.exists(f"{json_path}.imported")
+
+    # Reopening does not import again or lose rows.
+    store = ProjectStore(str(tmp_path / 'projects.db'), legacy_json_path=json_path)
+    assert store.count() == 2
+
+def test_set_status_compare_and_set(tmp_path):
+    store = ProjectStore(str(tmp_path / 'projects.db'))
+    store.create(project(0, status="uploading"))
+
+    assert store.set_status("p0", "processing", expected="uploading") is True
+    # A second (duplicate) completion of the same upload loses the race.
+    assert store.set_status("p0", "processing", expected="uploading") is False
+    assert store.get("p0")["status"] == "processing"
+    assert store.set_status("p0", "ready") is True
+    assert store.set_status("missing", "ready") is False
+
+def test_list_is_newest_first_and_paginated(tmp_path):
+    store = ProjectStore(str(tmp_path / 'projects.db'))
+    for i in range(5):
+        store.create(project(i, status="ready" if i % 2 else "failed"))
+
+    assert [p["id"] for p in store.list()] == ["p4", "p3", "p2", "p1", "p0"]
+    assert [p["id"] for p in store.list(limit=2, offset=1)] == ["p3", "p2"]
+    assert [p["id"] for p in store.list(limit=10, offset=4)] == ["p0"]
+    assert [p["id"] for p in store.list(status="ready")] == ["p3", "p1"]
+    assert store.count() == 5 and store.count(status="failed") == 3
+
+def test_projects_endpoint_reports_total_count(storage, make_client):
+    for i in range(3):
+        storage.create_project(f"video {i}")
+    client = make_client()
+
+    response = client.get('/projects?limit=2&offset=0')
+    assert len(response.get_json()) == 2
+    assert response.headers['X-Total-Count'] == '3'
+    assert len(client.get('/projects?limit=2&offset=2').get_json()) == 1
+
+def test_import_race_lost_to_another_process(tmp_path, monkeypatch):
+    json_path = str(tmp_path / 'projects.json')
+    with open(json_path, 'w') as f:
+        json.dump({"a": {"id": "a", "name": "old", "status": "ready", "created_at": "2025-01-01T00:00:00"}}, f)
+    db_path = str(tmp_path / 'projects.db')
+
+    ProjectStore(db_path, legacy_json_path=json_path)
+    # A second worker saw the file, but the first imported and renamed it before the open.
+    monkeypatch.setattr(os.path, 'exists', lambda path: True)
+    store = ProjectStore(db_path, legacy_json_path=json_path)
+    assert store.get("a")["name"] == "old" and store.count() == 1
+
@@ -0,0 +1,101 @@
+from config import VideoSegment
+
+class FakeEngine:
+    model_id = 'fake'
+
+    def __init__(self):
+        self.batches = []
+
+    def get_embedding(self, text, model_id=None):
+        return [1.0, 0.0, 0.0]
+
+    def get_query_embeddings(self, texts, model_id=None):
+        self.batches.append((list(texts), model_id))
+        return [[0.0, 0.0, 1.0] if 'drill' in text else [1.0, 0.0, 0.0] for text in texts]
+
+def seed(storage):
+    project_id = storage.create_project("demo")
+    scenes = [f"a person walks through scene {i}" for i in range(6)]
+    segments = [
+        VideoSegment(start_time=f"{i * 2}:00", end_time=f"{i * 2}:10", description=text, key_elements=[])
+        for i, text in enumerate(scenes + ["close-up of the XJ-9000 drill"])
+    ]
+    # The generic scenes sit right on the query's embedding; the part number is far from it.
+    embeddings = [[1.0, 0.1 * i, 0.0] for i in range(6)] + [[0.0, 0.0, 1.0]]
+    storage.add_segments(project_id, segments, embeddings, 'fake')
+    return project_id
+
+def test_exact_term_hit_survives_rerank_in_hybrid_mode(storage, make_client):
+    project_id = seed(storage)
+    client = make_client(ai_engine=FakeEngine())
+
+    for diversity in (1.0, 0.7):
+        response = client.post('/query', json={
+            'project_id': project_id, 'query': 'XJ-9000', 'mode': 'hybrid', 'top_k': 3, 'diversity': diversity
+        })
+        assert response.status_code == 200
+        results = response.get_json()
+        assert results[0]['description'] == "close-up of the XJ-9000 drill"
+        assert 'relevance' not in results[0] and 'embedding' not in results[0]
+
+def test_lexical_mode_keeps_bm25_order(storage, make_client):
+    project_id = seed(storage)
+    client = make_client(ai_engine=FakeEngine())
+
+    # Every scene matches "walks", but only one matches the rarer "drill": BM25 ranks it first.
+    response = client.post('/query', json={
+        'project_id': project_id, 'query': 'walks drill', 'mode': 'lexical', 'top_k': 3, 'diversity': 1.0
+    })
+    results = response.get_json()
+    assert len(results) == 3
+    assert results[0]['description'] == "close-up of the XJ-9000 drill"
+
+def test_batch_query_embeds_once_and_answers_in_order(storage, make_client, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'QUERY_BATCH_MAX', 3)
+    project_id = seed(storage)
+    engine = FakeEngine()
+    client = make_client(ai_engine=engine)
+
+    response = client.post('/query/batch', json={'project_id': project_id, 'queries': ['a drill', 'someone walking']})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [item['query'] for item in body] == ['a drill', 'someone walking']
+    assert body[0]['results'][0]['description'] == "close-up of the XJ-9000 drill"
+    assert body[1]['results'][0]['description'] == "a person walks through scene 0"
+    assert engine.batches == [(['a drill', 'someone walking'], 'fake')]
+
+    # Same retrieval and rerank as /query: modes, top_k and min_score apply to every query.
+    response = client.post('/query/batch', json={
+        'project_id': project_id, 'queries': ['XJ-9000', 'walks drill'], 'mode': 'lexical', 'top_k': 2
+    })
+    body = response.get_json()
+    assert [len(item['results']) for item in body] == [1, 2]
+    assert body[0]['results'][0]['description'] == "close-up of the XJ-9000 drill"
+    assert 'embedding' not in body[0]['results'][0] and 'relevance' not in body[0]['results'][0]
+    response = client.post('/query/batch', json={'project_id': project_id, 'queries': ['walks'], 'min_score': 2})
+    assert response.get_json() == [{'query': 'walks', 'results': []}]
+
+    assert client.post('/query/batch', json={'project_id': project_id, 'queries': ['q'], 'mode': 'fuzzy'}).status_code == 400
+    assert client.post('/query/batch', json={'project_id': project_id, 'queries': ['q'], 'top_k': 0}).status_code == 400
+    assert client.post('/query/batch', json={'project_id': project_id, 'queries': ['q'] * 4}).status_code == 400
+    assert client.post('/query/batch', json={'project_id': project_id, 'queries': 'q'}).status_code == 400
+    assert client.post('/query/batch', json={'project_id': 'missing', 'queries': ['q']}).status_code == 404
+
+def test_min_score_is_a_cosine_floor_in_every_mode(storage, make_client):
+    project_id = seed(storage)
+    client = make_client(ai_engine=FakeEngine())
+
+    for mode in ('hybrid', 'lexical', 'vector'):
+        response = client.post('/query', json={
+            'project_id': project_id, 'query': 'walks drill', 'mode': mode, 'top_k': 10, 'min_score': 0.9
+        })
+        assert response.status_code == 200
+        results = response.get_json()
+        assert results and all(r['score'] >= 0.9 for r in results)
+        # The part number hit is far from the query's embedding (cosine 0).
+        assert "close-up of the XJ-9000 drill" not in [r['description'] for r in results]
+
+    # Without min_score the lexical hit is kept.
+    response = client.post('/query', json={'project_id': project_id, 'query': 'drill', 'mode': 'hybrid', 'top_k': 10})
+    assert "close-up of the XJ-9000 drill" in [r['description'] for r in response.get_json()]
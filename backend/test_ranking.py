@@ -0,0 +1,34 @@
+from services.ranking import merge_adjacent, mmr, rerank
+
+def result(id, start, end, score, embedding=None, project_id="p"):
+    return {"id": id, "project_id": project_id, "start_time": start, "end_time": end,
+            "score": score, "keywords": [id], "embedding": embedding}
+
+def test_merge_adjacent_joins_overlapping_and_touching_ranges():
+    merged = merge_adjacent([
+        result("b", "00:20", "00:30", 0.9),
+        result("a", "00:10", "00:21", 0.5),
+        result("c", "00:31", "00:40", 0.4),
+        result("d", "01:00", "01:10", 0.8),
+        result("e", "00:25", "00:35", 0.3, project_id="q"),
+    ], gap=1)
+    spans = {(m["project_id"], m["start_time"], m["end_time"]) for m in merged}
+    assert spans == {("p", "00:10", "00:40"), ("p", "01:00", "01:10"), ("q", "00:25", "00:35")}
+    joined = next(m for m in merged if m["start_time"] == "00:10")
+    assert joined["id"] == "b" and joined["score"] == 0.9
+    assert joined["segment_ids"] == ["a", "b", "c"] and joined["keywords"] == ["a", "b", "c"]
+
+def test_mmr_skips_near_duplicates():
+    results = [
+        result("a", "00:00", "00:05", 0.9, [1.0, 0.0]),
+        result("b", "01:00", "01:05", 0.89, [1.0, 0.01]),
+        result("c", "02:00", "02:05", 0.7, [0.0, 1.0]),
+    ]
+    assert [r["id"] for r in mmr(results, 2, diversity=0.5)] == ["a", "c"]
+    assert [r["id"] for r in mmr(results, 2, diversity=1.0)] == ["a", "b"]
+
+def test_rerank_applies_threshold_and_strips_embeddings():
+    results = [result("a", "00:00", "00:05", 0.9, [1.0, 0.0]), result("b", "01:00", "01:05", 0.1, [0.0, 1.0])]
+    reranked = rerank(results, top_k=5, min_score=0.2)
+    assert [r["id"] for r in reranked] == ["a"]
+    assert "embedding" not in reranked[0]
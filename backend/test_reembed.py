@@ -0,0 +1,51 @@
+import pytest
+import services.storage as storage_module
+from config import VideoSegment
+from services.storage import StorageService
+
+def segment(i):
+    return VideoSegment(start_time=f"00:00:{i:02d}", end_time=f"00:00:{i + 1:02d}",
+                        description=f"segment {i}", key_elements=[])
+
+def new_model(texts):
+    return [[1.0, float(len(text)), 0.0, 0.5] for text in texts]
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, 'DB_PATH', str(tmp_path))
+    service = StorageService()
+    project_id = service.create_project("demo")
+    service.add_segments(project_id, [segment(i) for i in range(5)], [[1.0, 0.0, float(i)] for i in range(5)], 'old')
+    return service, project_id
+
+def test_interrupted_reembed_resumes_and_switches(storage):
+    service, project_id = storage
+    calls = []
+
+    def flaky(texts):
+        calls.append(len(texts))
+        if len(calls) == 2:
+            raise RuntimeError("interrupted")
+        return new_model(texts)
+
+    with pytest.raises(RuntimeError):
+        service.reembed_project(project_id, flaky, 'new', 4, batch_size=2)
+    # Still served from the old index with the old model.
+    assert service.project_model(project_id) == 'old'
+    assert len(service.query(project_id, [1.0, 0.0, 0.0], n_results=5)) == 5
+
+    assert service.reembed_project(project_id, flaky, 'new', 4, batch_size=2) == 3
+    assert calls == [2, 2, 2, 1]
+    assert service.project_model(project_id) == 'new'
+    assert len(service.query(project_id, [1.0, 9.0, 0.0, 0.5], n_results=5)) == 5
+    assert service.reembed_project(project_id, flaky, 'new', 4) is None
+
+def test_library_switches_after_every_project(storage):
+    service, project_id = storage
+    assert service.library_model() == 'old'
+    assert not service.switch_library('new')
+
+    service.reembed_project(project_id, new_model, 'new', 4)
+    assert service.switch_library('new')
+    assert service.library_model() == 'new'
+    assert {r['project_id'] for r in service.query_library([1.0, 9.0, 0.0, 0.5], n_results=5)} == {project_id}
@@ -0,0 +1,58 @@
+import base64
+import hashlib
+import os
+from config import VideoSegment
+from services.thumbnails import ThumbnailStore
+
+JPEG = b'\xff\xd8thumbnail\xff\xd9'
+DIGEST = hashlib.sha256(JPEG).hexdigest()
+
+def test_put_is_content_addressed_and_idempotent(tmp_path):
+    store = ThumbnailStore(str(tmp_path))
+    assert store.put(JPEG) == DIGEST
+    assert store.put(JPEG) == DIGEST
+
+    path = store.path(DIGEST)
+    assert path == os.path.join(str(tmp_path), DIGEST[:2], f"{DIGEST}.jpg")
+    with open(path, 'rb') as f:
+        assert f.read() == JPEG
+    assert os.listdir(os.path.dirname(path)) == [f"{DIGEST}.jpg"]
+
+def test_path_rejects_malformed_and_missing_digests(tmp_path):
+    store = ThumbnailStore(str(tmp_path))
+    assert store.path('../../etc/passwd') is None
+    assert store.path(DIGEST.upper()) is None
+    assert store.path('') is None and store.path(None) is None
+    assert store.path(DIGEST) is None
+
+def test_migrate_moves_inline_thumbnails_into_the_store(storage, tmp_path):
+    store = ThumbnailStore(str(tmp_path / 'thumbnails'))
+    project_id = storage.create_project("demo")
+    inline = "data:image/jpeg;base64," + base64.b64encode(JPEG).decode()
+    segments = [
+        VideoSegment(start_time="00:00", end_time="00:05", description="inline", key_elements=[], thumbnail=inline),
+        VideoSegment(start_time="00:05", end_time="00:10", description="stored", key_elements=[], thumbnail=DIGEST),
+        VideoSegment(start_time="00:10", end_time="00:15", description="none", key_elements=[]),
+    ]
+    storage.add_segments(project_id, segments, [[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]], 'fake')
+
+    assert storage.migrate_thumbnails(store) == 1
+    assert store.path(DIGEST)
+    results = {r['description']: r['thumbnail'] for r in storage.query(project_id, [1.0, 0.0], n_results=3)}
+    assert results == {"inline": f"/thumbnails/{DIGEST}", "stored": f"/thumbnails/{DIGEST}", "none": ""}
+    # Safe to re-run.
+    assert storage.migrate_thumbnails(store) == 0
+
+def test_thumbnail_route_serves_immutable_jpeg(make_client, tmp_path, monkeypatch):
+    import app as app_module
+    store = ThumbnailStore(str(tmp_path / 'thumbnails'))
+    store.put(JPEG)
+    monkeypatch.setattr(app_module, 'thumbnail_store', store)
+    client = make_client()
+
+    response = client.get(f'/thumbnails/{DIGEST}')
+    assert response.status_code == 200 and response.data == JPEG
+    assert response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert client.get(f'/thumbnails/{DIGEST}', headers={'If-None-Match': f'"{DIGEST}"'}).status_code == 304
+    assert client.get('/thumbnails/not-a-digest').status_code == 404
@@ -0,0 +1,16 @@
+from services.timecode import parse_time, format_time, window_bounds
+
+def test_parse_time():
+    assert parse_time("01:30") == 90
+    assert parse_time("1:02:03") == 3723
+    assert parse_time("12.5") == 12.5
+
+def test_format_time_round_trips():
+    assert format_time(90) == "01:30"
+    assert format_time(3723) == "1:02:03"
+    assert parse_time(format_time(4000)) == 4000
+
+def test_window_bounds_split_overlaps_at_midpoint():
+    # 600s windows every 570s: each 30s overlap is split at its middle
+    bounds = window_bounds([0, 570, 1140], 600)
+    assert bounds == [(0.0, 585.0), (585.0, 1155.0), (1155.0, float('inf'))]
@@ -0,0 +1,100 @@
+import hashlib
+import io
+import os
+import pytest
+from services.uploads import UploadManager, OffsetMismatch, UploadTooLarge
+
+DATA = bytes(range(256)) * 40
+
+class FakeProxyProcess:
+    def __init__(self):
+        self.stdin = io.BytesIO()
+
+class FakeVideoProcessor:
+    """Records streamed proxy transcodes instead of running ffmpeg."""
+    def __init__(self, stream_proxy=True):
+        self.stream_proxy = stream_proxy
+        self.aborted = []
+
+    def start_ai_proxy_stream(self, path, size):
+        return FakeProxyProcess() if self.stream_proxy else None
+
+    def abort_ai_proxy_stream(self, path):
+        self.aborted.append(path)
+
+@pytest.fixture
+def upload(tmp_path):
+    """Returns (manager, session, project_dir) for a new upload of DATA."""
+    def make(max_bytes=10 * len(DATA), **kwargs):
+        manager = UploadManager(FakeVideoProcessor(**kwargs), max_bytes)
+        path = str(tmp_path / 'video.mp4')
+        return manager, manager.create('upload-1', path, len(DATA)), str(tmp_path)
+    return make
+
+def test_chunks_append_hash_and_feed_the_proxy(upload):
+    manager, session, _ = upload()
+
+    assert manager.append(session, 0, io.BytesIO(DATA[:4000]), 4000) is False
+    assert session.offset == 4000
+    assert manager.append(session, 4000, io.BytesIO(DATA[4000:])) is True
+
+    assert session.proxy_process.stdin.getvalue() == DATA
+    assert manager.finish(session) == hashlib.sha256(DATA).hexdigest()
+    with open(session.path, 'rb') as f:
+        assert f.read() == DATA
+
+def test_offset_mismatch_is_rejected(upload):
+    manager, session, _ = upload()
+    manager.append(session, 0, io.BytesIO(DATA[:100]))
+
+    with pytest.raises(OffsetMismatch, match="expected 100"):
+        manager.append(session, 50, io.BytesIO(DATA[50:200]))
+    assert session.offset == 100
+
+def test_size_limits(upload):
+    with pytest.raises(UploadTooLarge):
+        upload(max_bytes=len(DATA) - 1)
+
+    manager, session, _ = upload()
+    # Declared length over the size, and a body longer than its (missing) length.
+    with pytest.raises(UploadTooLarge):
+        manager.append(session, 0, io.BytesIO(DATA + b'x'), len(DATA) + 1)
+    manager.append(session, 0, io.BytesIO(DATA[:100]))
+    with pytest.raises(UploadTooLarge):
+        manager.append(session, 100, io.BytesIO(DATA[100:] + b'extra'))
+    assert session.offset == 100
+
+def test_resume_in_another_process(upload):
+    manager, session, project_dir = upload()
+    manager.append(session, 0, io.BytesIO(DATA[:3000]))
+
+    # A second worker process has no session in memory: it restores it from the manifest.
+    other = UploadManager(FakeVideoProcessor(), manager.max_bytes)
+    resumed = other.get('upload-1', project_dir)
+    assert resumed.offset == 3000
+    assert other.append(resumed, 3000, io.BytesIO(DATA[3000:6000])) is False
+
+    # The first worker sees the new offset, and its proxy stream now has a gap.
+    assert session.offset == 6000
+    with pytest.raises(OffsetMismatch):
+        manager.append(session, 3000, io.BytesIO(DATA[3000:]))
+    assert manager.append(session, 6000, io.BytesIO(DATA[6000:])) is True
+    assert session.proxy_process is None
+    assert manager.video_processor.aborted == [session.path]
+    assert manager.finish(session) == hashlib.sha256(DATA).hexdigest()
+    assert not os.path.exists(os.path.join(project_dir, '.upload.json'))
+
+def test_idle_sessions_expire_and_stop_their_proxy(upload):
+    manager, session, project_dir = upload()
+    manager.append(session, 0, io.BytesIO(DATA[:100]))
+    assert manager.expire_idle() == 0
+
+    session.touched_at -= manager.idle_secs + 1
+    assert manager.expire_idle() == 1
+    assert manager.video_processor.aborted == [session.path]
+
+    # Still resumable, without a proxy stream.
+    resumed = manager.get('upload-1', project_dir)
+    assert resumed is not session and resumed.proxy_process is None
+    assert manager.append(resumed, 100, io.BytesIO(DATA[100:])) is True
+    assert manager.finish(resumed) == hashlib.sha256(DATA).hexdigest()
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+import pytest
+import services.video_processor as video_processor_module
+from services.media_index import MediaIndex
+from services.video_processor import VideoProcessor
+
+def make_index(pix_fmt='yuv420p', profile='High'):
+    streams = [
+        {"codec_type": "video", "codec_name": "h264", "pix_fmt": pix_fmt, "profile": profile},
+        {"codec_type": "audio", "codec_name": "aac"},
+    ]
+    return MediaIndex([0.0, 4.0, 8.0], [48, 9000, 18000], 12.0, streams)
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """A VideoProcessor over tmp_path whose ffmpeg runs are recorded instead of executed."""
+    monkeypatch.setattr(video_processor_module, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(video_processor_module, 'CLIP_FOLDER', str(tmp_path / 'clips'))
+    processor = VideoProcessor()
+    processor.index = make_index()
+    processor.runs = []
+
+    def run_ffmpeg(args, progress=None, input_path=None):
+        if '-f' in args and args[args.index('-f') + 1] == 'concat':
+            with open(args[args.index('-i') + 1]) as f:
+                processor.concat_list = f.read()
+        processor.runs.append(args)
+        open(args[-1], 'wb').close()
+
+    monkeypatch.setattr(processor, 'media_index', lambda path: processor.index)
+    monkeypatch.setattr(processor, '_run_ffmpeg', run_ffmpeg)
+    return processor
+
+def test_smart_cut_matches_source_profile_and_lists_absolute_parts(processor, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert processor._copy_clip('video.mp4', 2.0, 10.0, 'out.mp4', 'smart') is True
+
+    head, tail, concat = processor.runs
+    assert head[head.index('-profile:v') + 1] == 'high' and head[head.index('-pix_fmt') + 1] == 'yuv420p'
+    assert head[head.index('-t') + 1] == '2.0'
+    assert tail[tail.index('-c') + 1] == 'copy'
+    # Relative output paths still give absolute concat entries.
+    entries = [line.split("'")[1] for line in processor.concat_list.splitlines()]
+    assert len(entries) == 2 and all(entry.startswith('/') for entry in entries)
+
+@pytest.mark.parametrize('pix_fmt, profile', [('yuv422p', 'High 4:2:2'), ('yuv420p10le', 'High 10'), ('yuv420p', None)])
+def test_smart_cut_falls_back_when_head_cannot_match(processor, pix_fmt, profile, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor.index = make_index(pix_fmt, profile)
+    assert processor._copy_clip('video.mp4', 2.0, 10.0, 'out.mp4', 'smart') is False
+    assert processor.runs == []
+
+def test_create_clip_keeps_exact_times(processor, tmp_path):
+    source = tmp_path / 'video.mp4'
+    source.write_bytes(b'video')
+
+    name = processor.create_clip(str(source), 65, 70.4, mode='exact')
+    assert '_65.000_70.400_' in name
+    assert processor.runs[0][processor.runs[0].index('-ss') + 1] == '65.0'
+    assert processor.runs[0][processor.runs[0].index('-t') + 1] == str(70.4 - 65)
+    # The same instant written differently shares a clip; a different fraction does not.
+    assert name == processor.create_clip(str(source), '01:05', '70.4', mode='exact')
+    assert len(processor.runs) == 1
+    assert processor.create_clip(str(source), 65.4, 70.4, mode='exact') != name
+    assert len(processor.runs) == 2
+
+def test_smart_cut_gets_fractional_start(processor, tmp_path):
+    source = tmp_path / 'video.mp4'
+    source.write_bytes(b'video')
+
+    processor.create_clip(str(source), 2.6, 10, mode='smart')
+    head = processor.runs[0]
+    assert head[head.index('-ss') + 1] == '2.6' and head[head.index('-t') + 1] == str(4.0 - 2.6)
+
+def jpeg(tag):
+    return b'\xff\xd8' + tag + b'\xff\xd9'
+
+def test_split_jpegs():
+    frames = [jpeg(b'one'), jpeg(b'two\xff\x00'), jpeg(b'three')]
+    assert video_processor_module._split_jpegs(b''.join(frames)) == frames
+    # Leading noise and a truncated last frame are dropped.
+    assert video_processor_module._split_jpegs(b'noise' + frames[0] + b'\xff\xd8cut') == frames[:1]
+    assert video_processor_module._split_jpegs(b'') == []
+
+def test_thumbnails_are_extracted_in_batches_in_order(processor, monkeypatch):
+    monkeypatch.setattr(video_processor_module, 'THUMBNAIL_BATCH_SIZE', 2)
+    calls, progress = [], []
+
+    def run(cmd, capture_output, check):
+        timestamps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-ss']
+        calls.append(timestamps)
+        return SimpleNamespace(stdout=b''.join(jpeg(ts.encode()) for ts in timestamps))
+
+    monkeypatch.setattr(video_processor_module.subprocess, 'run', run)
+    frames = processor.extract_thumbnails('video.mp4', ['00:01', '00:03', '00:05', '00:30', '00:07'],
+                                          lambda done, total: progress.append((done, total)))
+
+    # One ffmpeg per batch; a time past the end (12s) is clamped to the last frame.
+    assert sorted(calls) == [['1.0', '3.0'], ['5.0', '11.9'], ['7.0']]
+    assert frames == [jpeg(b'1.0'), jpeg(b'3.0'), jpeg(b'5.0'), jpeg(b'11.9'), jpeg(b'7.0')]
+    assert progress[-1] == (5, 5)
+
+def test_broken_batch_is_retried_one_timestamp_at_a_time(processor, monkeypatch):
+    def run(cmd, capture_output, check):
+        timestamps = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-ss']
+        if '2.0' in timestamps and len(timestamps) > 1:
+            # One undecodable frame makes the whole batch come up short.
+            return SimpleNamespace(stdout=jpeg(b'x'))
+        if timestamps == ['2.0']:
+            raise video_processor_module.subprocess.CalledProcessError(1, cmd)
+        return SimpleNamespace(stdout=b''.join(jpeg(ts.encode()) for ts in timestamps))
+
+    monkeypatch.setattr(video_processor_module.subprocess, 'run', run)
+    assert processor._extract_frames('video.mp4', ['1.0', '2.0', '3.0']) == [jpeg(b'1.0'), None, jpeg(b'3.0')]
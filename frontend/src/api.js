@@ -2,9 +2,19 @@ import axios from 'axios';
 
 export const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://127.0.0.1:5001';
 
+const PROJECTS_PAGE_SIZE = 500;
+
+// /projects is paginated; fetch pages until X-Total-Count projects have arrived.
 export const getProjects = async () => {
-  const response = await axios.get(`${API_BASE_URL}/projects`);
-  return response.data;
+  const projects = [];
+  for (;;) {
+    const response = await axios.get(`${API_BASE_URL}/projects`, {
+      params: { limit: PROJECTS_PAGE_SIZE, offset: projects.length },
+    });
+    projects.push(...response.data);
+    const total = Number(response.headers['x-total-count']);
+    if (!response.data.length || projects.length >= total) return projects;
+  }
 };
 
 export const getProject = async (projectId) => {
@@ -22,17 +32,48 @@ export const processVideo = async (url) => {
   return response.data;
 };
 
+const UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024;
+
+// Resumable chunked upload: bytes stream straight into the project directory on the server.
 export const uploadVideo = async (file) => {
-  const formData = new FormData();
-  formData.append('file', file);
-  const response = await axios.post(`${API_BASE_URL}/upload`, formData, {
-    headers: {
-      'Content-Type': 'multipart/form-data',
-    },
-  });
-  return response.data;
+  const { data: session } = await axios.post(`${API_BASE_URL}/uploads`, { filename: file.name, size: file.size });
+  let offset = session.offset;
+  for (;;) {
+    const chunk = file.slice(offset, offset + UPLOAD_CHUNK_BYTES);
+    const response = await axios.patch(`${API_BASE_URL}/uploads/${session.upload_id}`, chunk, {
+      headers: {
+        'Content-Type': 'application/offset+octet-stream',
+        'Upload-Offset': offset,
+      },
+    });
+    if (response.status === 200) return response.data;
+    offset = Number(response.headers['upload-offset']);
+  }
 };
 
+// Follows an ingest over Server-Sent Events: `onProgress` gets each stage/progress event,
+// and the promise settles with the final job event.
+export const watchIngest = (projectId, onProgress) => new Promise((resolve, reject) => {
+  const source = new EventSource(`${API_BASE_URL}/projects/${projectId}/events`);
+  const forward = (e) => onProgress?.({ type: e.type, ...JSON.parse(e.data) });
+  source.addEventListener('stage', forward);
+  source.addEventListener('progress', forward);
+  source.addEventListener('job', (e) => {
+    const job = JSON.parse(e.data);
+    if (job.status === 'done') {
+      source.close();
+      resolve(job);
+    } else if (job.status === 'failed') {
+      source.close();
+      reject(new Error(job.error || 'Processing failed'));
+    }
+  });
+  // Dropped connections reconnect on their own; a closed source means the stream was refused.
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) reject(new Error('Lost connection to the server'));
+  };
+});
+
 export const queryVideo = async (projectId, query) => {
   const response = await axios.post(`${API_BASE_URL}/query`, { project_id: projectId, query });
   return response.data;
@@ -184,7 +184,7 @@ const ProjectDetail = () => {
                             <div key={item.id} onClick={() => handleResultClick(item)} className="group bg-panel/50 backdrop-blur-sm rounded-xl overflow-hidden cursor-pointer hover:-translate-y-1 hover:shadow-glow transition-all duration-500 border border-border-subtle/50 hover:border-accent-primary/30">
                                 <div className="relative aspect-video bg-black/40 overflow-hidden flex items-center justify-center">
                                     {item.thumbnail ? (
-                                        <img src={item.thumbnail} alt={item.keywords?.[0]} className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105 opacity-80 group-hover:opacity-100" />
+                                        <img src={new URL(item.thumbnail, API_BASE_URL).toString()} alt={item.keywords?.[0]} className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-105 opacity-80 group-hover:opacity-100" />
                                     ) : (
                                         <div className="text-text-muted opacity-20"><IconPlay /></div>
                                     )}
@@ -3,7 +3,7 @@ import { Link, useNavigate } from 'react-router-dom';
 import Header from '../layout/Header';
 import LoadingScreen from '../layout/LoadingScreen';
 import { IconTrash, IconFilm } from '../icons/Icons';
-import { getProjects, processVideo, uploadVideo, deleteProject } from '../../api';
+import { getProjects, processVideo, uploadVideo, deleteProject, watchIngest } from '../../api';
 
 const ProjectList = () => {
   const [projects, setProjects] = useState([]);
@@ -11,6 +11,7 @@ const ProjectList = () => {
   const [videoUrl, setVideoUrl] = useState('');
   const [isValidUrl, setIsValidUrl] = useState(false);
   const [processing, setProcessing] = useState(false);
+  const [progress, setProgress] = useState(null);
   const fileInputRef = useRef(null);
   const navigate = useNavigate();
 
@@ -38,8 +39,10 @@ const ProjectList = () => {
     const trimmedUrl = videoUrl.trim();
     if (!trimmedUrl || !isValidUrl) return;
     setProcessing(true);
+    setProgress(null);
     try {
       const res = await processVideo(trimmedUrl);
+      await watchIngest(res.project_id, setProgress);
       navigate(`/project/${res.project_id}`);
     } catch (error) {
       console.error(error);
@@ -52,8 +55,10 @@ const ProjectList = () => {
     const file = e.target.files?.[0];
     if (!file) return;
     setProcessing(true);
+    setProgress(null);
     try {
       const res = await uploadVideo(file);
+      await watchIngest(res.project_id, setProgress);
       navigate(`/project/${res.project_id}`);
     } catch (error) {
       console.error(error);
@@ -74,7 +79,7 @@ const ProjectList = () => {
   if (processing) return (
       <div className="flex flex-col min-h-screen">
           <Header />
-          <LoadingScreen />
+          <LoadingScreen progress={progress} />
       </div>
   );
 
@@ -1,7 +1,17 @@
 import React, { useState, useEffect } from 'react';
 
-const LoadingScreen = () => {
+// Ingest stages (see /projects/<id>/events) shown under each step.
+const STAGE_STEPS = { resolve: 0, download: 0, probe: 0, proxy: 1, analyze: 2, thumbnails: 3, embed: 3, index: 3, package: 3 };
+
+const progressLabel = (progress) => {
+    if (progress?.type !== 'progress') return null;
+    if (progress.phase) return `Gemini ${progress.phase}...`;
+    return progress.percent != null ? `${progress.percent}%` : null;
+};
+
+const LoadingScreen = ({ progress }) => {
     const [step, setStep] = useState(0);
+    const live = progress != null;
     const steps = [
         { label: 'Retrieving source', sub: 'Fetching...' },
         { label: 'Optimizing proxy', sub: 'Compressing...' },
@@ -9,12 +19,22 @@ const LoadingScreen = () => {
         { label: 'Vector Indexing', sub: 'Finalizing...' }
     ];
 
+    // Live events drive the steps; without them (no stream yet), advance on a timer.
     useEffect(() => {
+        if (live) return undefined;
         const interval = setInterval(() => {
             setStep(prev => (prev < steps.length - 1 ? prev + 1 : prev));
         }, 5000);
         return () => clearInterval(interval);
-    }, [steps.length]);
+    }, [live, steps.length]);
+
+    useEffect(() => {
+        const current = STAGE_STEPS[progress?.stage];
+        // Stages overlap (the full download runs alongside analysis), so never step back.
+        if (current != null) setStep(prev => Math.max(prev, current));
+    }, [progress]);
+
+    const detail = STAGE_STEPS[progress?.stage] === step ? progressLabel(progress) : null;
 
     return (
         <div className="flex-1 flex flex-col items-center justify-center py-20 animate-fade-in">
@@ -25,7 +45,7 @@ const LoadingScreen = () => {
                         <div className={`w-2 h-2 rounded-full transition-colors duration-500 ${index <= step ? 'bg-accent-primary' : 'bg-border-subtle'}`}></div>
                         <div className="flex-1 flex justify-between items-baseline">
                             <h3 className={`font-serif text-lg leading-none ${index === step ? 'text-text-main' : 'text-text-muted'}`}>{s.label}</h3>
-                            {index === step && <span className="text-xs font-mono text-accent-primary animate-pulse">{s.sub}</span>}
+                            {index === step && <span className="text-xs font-mono text-accent-primary animate-pulse">{detail || s.sub}</span>}
                         </div>
                     </div>
                 ))}